@@ -1,9 +1,28 @@
-from fastapi import APIRouter, Depends
-from core.schemas.content import ContentSchema
-from core.services.content_service import get_contents
+import uuid
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from core.dependencies import get_page_db, get_tenant_id
+from core.services import content_service
+from core.utils.pagination import DEFAULT_LIMIT, MAX_LIMIT, dumps, ndjson_response
 
 router = APIRouter()
 
-@router.get("/", response_model=list[ContentSchema])
-def list_contents():
-    return get_contents()
+@router.get("/")
+def list_contents(
+    tenant_id: uuid.UUID = Depends(get_tenant_id),
+    cursor: Optional[str] = Query(None, description="`next_cursor` della pagina precedente"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    fields: Optional[str] = Query(None, description=f"Campi separati da virgola: {', '.join(content_service.CONTENT_FIELDS)}"),
+    format: str = Query("json", pattern="^(json|ndjson)$", description="ndjson: stream di tutti i contenuti dopo `cursor`"),
+    db=Depends(get_page_db),
+):
+    """Contenuti del tenant, paginati per keyset (`next_cursor`) o in stream NDJSON"""
+    try:
+        if format == "ndjson":
+            from core.database import SessionLocal
+            return ndjson_response(SessionLocal, lambda session: content_service.iter_contents(session, tenant_id, cursor, fields))
+        page = content_service.list_contents(db, tenant_id, cursor, limit, fields)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return Response(dumps(page.to_dict()), media_type="application/json")
@@ -0,0 +1,17 @@
+"""
+🐞 Endpoint di debug (montati solo fuori produzione o con DEBUG)
+"""
+from fastapi import APIRouter, Query
+
+from core.startup_profiler import profiler
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+
+@router.get("/startup")
+async def startup_timeline(
+    min_import_ms: float = Query(1.0, ge=0, description="Nasconde dall'albero gli import più veloci"),
+    top: int = Query(25, ge=1, le=500, description="Numero di moduli più lenti (tempo self)"),
+):
+    """Timeline gerarchica del boot: fasi, plugin, connessioni e import"""
+    return profiler.report(min_import_ms=min_import_ms, top=top)
@@ -1,89 +1,63 @@
-@router.get("/health/plugins")
-async def plugin_health_check():
-    """Check specifico per ogni plugin."""
-    plugin_status = {}
-    for plugin_name in settings.ENABLED_PLUGINS:
-        try:
-            # Test plugin-specific health
-            if plugin_name == "gdpr_plugin":
-                db = SessionLocal()
-                db.execute(text("SELECT COUNT(*) FROM consents"))
-                db.close()
-                plugin_status[plugin_name] = {"status": "healthy", "tables": "accessible"}
-            elif plugin_name == "security_plugin":
-                r = redis.Redis.from_url(settings.REDIS_URL)
-                r.ping()
-                plugin_status[plugin_name] = {"status": "healthy", "redis": "accessible"}
-            else:
-                plugin_status[plugin_name] = {"status": "unknown"}
-        except Exception as e:
-            plugin_status[plugin_name] = {"status": "unhealthy", "error": str(e)}
-    return {"plugins": plugin_status}
-
-from fastapi import APIRouter
+from fastapi import APIRouter, Query, Request
 from fastapi.responses import JSONResponse
-from datetime import datetime
 import time
-from sqlalchemy import text
-import redis
-from core.config import settings
-from core.database import SessionLocal
+from core.config_snapshot import get_settings
+from core.health_prober import HEALTHY, UNHEALTHY, get_health_prober
 import logging
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.get("/health")
-async def health_check():
-    """HOTFIX: Health check completo."""
-    start_time = time.time()
-    checks = {
-        "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat(),
+
+def _plugin_statuses(request: Request) -> dict:
+    """Stato dei plugin dal manager (in memoria, nessuna I/O)"""
+    manager = getattr(request.app.state, "plugin_manager", None)
+    if manager is None:
+        return {p: "unknown" for p in get_settings().ENABLED_PLUGINS}
+    return {name: status.value for name, status in manager.plugin_status.items()}
+
+
+def _health_response(snapshot: dict, request: Request, start_time: float, include_plugins: bool = False) -> JSONResponse:
+    settings = get_settings()
+    content = {
+        "status": snapshot["status"],
+        "timestamp": snapshot["checked_at"],
         "version": settings.VERSION,
-        "environment": settings.ENVIRONMENT
+        "environment": settings.ENVIRONMENT,
+        # Formato storico: "healthy"/"unhealthy" per dipendenza
+        **{name: result["status"] for name, result in snapshot["checks"].items()},
+        "checks": snapshot["checks"],
+        "plugins": _plugin_statuses(request),
+        **({"age_s": snapshot["age_s"]} if "age_s" in snapshot else {}),
     }
-    # Database check
-    try:
-        db = SessionLocal()
-        db.execute(text("SELECT 1"))
-        db.close()
-        checks["database"] = "healthy"
-    except Exception as e:
-        logger.error(f"Database health check failed: {e}")
-        checks["database"] = "unhealthy"
-        checks["status"] = "degraded"
-    # Redis check
-    try:
-        r = redis.Redis.from_url(settings.REDIS_URL)
-        r.ping()
-        checks["redis"] = "healthy"
-    except Exception as e:
-        logger.error(f"Redis health check failed: {e}")
-        checks["redis"] = "unhealthy"
-        checks["status"] = "degraded"
-    # Plugin checks
-    checks["plugins"] = {}
-    from fastapi import Request
-    # Simulate plugin manager presence
-    # In real app, use app.state.plugin_manager.plugins
-    checks["plugins"] = {p: "loaded" for p in getattr(settings, 'ENABLED_PLUGINS', [])}
-    checks["response_time_ms"] = round((time.time() - start_time) * 1000, 2)
-    status_code = 200 if checks["status"] == "healthy" else 503
-    return JSONResponse(content=checks, status_code=status_code)
+    healthy = snapshot["status"] == HEALTHY
+    if include_plugins:
+        content["plugin_health"] = snapshot.get("plugins", {})
+        healthy = healthy and all(r["status"] != UNHEALTHY for r in content["plugin_health"].values())
+        content["status"] = HEALTHY if healthy else "degraded"
+    content["response_time_ms"] = round((time.time() - start_time) * 1000, 2)
+    return JSONResponse(content=content, status_code=200 if healthy else 503)
+
+
+@router.get("/health")
+async def health_check(request: Request):
+    """Health check dallo snapshot in cache (aggiornato in background)."""
+    start_time = time.time()
+    snapshot = await get_health_prober().get_snapshot()
+    return _health_response(snapshot, request, start_time)
+
 
 @router.get("/health/deep")
-async def deep_health_check():
-    """HOTFIX: Deep health check (per monitoring)."""
-    plugin_health = {}
-    # Test GDPR plugin
-    try:
-        plugin_health["gdpr"] = "healthy"
-    except Exception:
-        plugin_health["gdpr"] = "unhealthy"
-    # Test Security plugin
-    try:
-        plugin_health["security"] = "healthy"
-    except Exception:
-        plugin_health["security"] = "unhealthy"
-    return {"plugin_health": plugin_health}
+async def deep_health_check(request: Request):
+    """Deep health check (per monitoring): giro nuovo di dipendenze e plugin, in parallelo con timeout."""
+    start_time = time.time()
+    snapshot = await get_health_prober().check_now()
+    return _health_response(snapshot, request, start_time, include_plugins=True)
+
+
+@router.get("/health/plugins")
+async def plugin_health_check(fresh: bool = Query(False, description="Forza un nuovo giro di check")):
+    """`health_check()` di ogni plugin: risultati in cache, o nuovi con `fresh=true`."""
+    prober = get_health_prober()
+    snapshot = await prober.check_now() if fresh else await prober.get_snapshot()
+    return {"plugins": snapshot.get("plugins", {}), "checked_at": snapshot["checked_at"]}
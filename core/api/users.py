@@ -1,9 +1,28 @@
-from fastapi import APIRouter, Depends
-from core.schemas.user import UserSchema
-from core.services.user_service import get_users
+import uuid
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from core.dependencies import get_page_db, get_tenant_id
+from core.services import user_service
+from core.utils.pagination import DEFAULT_LIMIT, MAX_LIMIT, dumps, ndjson_response
 
 router = APIRouter()
 
-@router.get("/", response_model=list[UserSchema])
-def list_users():
-    return get_users()
+@router.get("/")
+def list_users(
+    tenant_id: uuid.UUID = Depends(get_tenant_id),
+    cursor: Optional[str] = Query(None, description="`next_cursor` della pagina precedente"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    fields: Optional[str] = Query(None, description=f"Campi separati da virgola: {', '.join(user_service.USER_FIELDS)}"),
+    format: str = Query("json", pattern="^(json|ndjson)$", description="ndjson: stream di tutti gli utenti dopo `cursor`"),
+    db=Depends(get_page_db),
+):
+    """Utenti del tenant, paginati per keyset (`next_cursor`) o in stream NDJSON"""
+    try:
+        if format == "ndjson":
+            from core.database import SessionLocal
+            return ndjson_response(SessionLocal, lambda session: user_service.iter_users(session, tenant_id, cursor, fields))
+        page = user_service.list_users(db, tenant_id, cursor, limit, fields)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return Response(dumps(page.to_dict()), media_type="application/json")
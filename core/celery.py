@@ -4,11 +4,18 @@ Celery application instance for stack-gdpr-template
 import os
 from celery import Celery
 from core.config import settings
+from core.request_context import install_celery_propagation
 
 celery_app = Celery(
     "stack_gdpr_template",
     broker=settings.CELERY_BROKER_URL or settings.REDIS_URL,
     backend=settings.CELERY_RESULT_BACKEND or settings.REDIS_URL,
+    include=[
+        "plugins.gdpr_plugin.tasks.export_jobs",
+        "plugins.gdpr_plugin.tasks.erasure",
+        "plugins.gdpr_plugin.tasks.key_rotation",
+        "plugins.gdpr_plugin.tasks.audit_checkpoints",
+    ],
 )
 
 celery_app.conf.update(
@@ -20,6 +27,9 @@ celery_app.conf.update(
     beat_schedule=getattr(settings, "CELERY_BEAT_SCHEDULE", {}),
 )
 
+# request_id/user_id della richiesta d'origine negli header dei task
+install_celery_propagation()
+
 # Optional: autodiscover tasks in core and plugins
 celery_app.autodiscover_tasks([
     "core",
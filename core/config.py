@@ -48,6 +48,11 @@ class Settings(BaseSettings):
             return [x.strip() for x in v.split(',') if x.strip()]
         return v
     PLUGIN_CONFIG_PATH: str = Field(default="config/plugin_configs", description="Path configurazioni plugin")
+    PLUGIN_LAZY_LOADING: bool = Field(default=False, description="Import dei plugin con route_prefixes alla prima richiesta")
+    PLUGIN_LAZY_WARMUP_DELAY: Optional[float] = Field(
+        default=None,
+        description="Secondi dopo lo startup per caricare in background i plugin lazy (None: solo on-demand)"
+    )
     
     # ===== DATABASE CONFIGURATION =====
     DATABASE_URL: str = Field(
@@ -87,11 +92,35 @@ class Settings(BaseSettings):
         default_factory=lambda: secrets.token_urlsafe(32),
         description="Chiave crittografia dati GDPR"
     )
+    GDPR_PSEUDONYMIZATION_KEY: Optional[str] = Field(
+        default=None,
+        description="Master key pseudonimi HMAC (default: GDPR_ENCRYPTION_KEY)"
+    )
+    GDPR_MASTER_KEY_ID: str = Field(default="m1", description="Id della master key che cifra le data key dei tenant")
+    GDPR_PREVIOUS_ENCRYPTION_KEYS: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Master key precedenti {kid: chiave}, valide in lettura durante la rotazione"
+    )
+    GDPR_BLIND_INDEX_KEY: Optional[str] = Field(
+        default=None,
+        description="Chiave HMAC dei blind index (default: GDPR_ENCRYPTION_KEY, da separare in produzione)"
+    )
+    GDPR_KEY_CACHE_TTL: float = Field(default=300.0, description="Secondi di cache della data key attiva")
+    GDPR_KEY_ROTATION_CHUNK_SIZE: int = Field(default=1000, description="Righe per chunk nella re-encryption")
+    GDPR_KEY_ROTATION_WORKERS: int = Field(default=2, description="Processi worker per la re-encryption (thread nei worker Celery prefork)")
+    GDPR_KEY_ROTATION_MAX_ROWS_PER_SECOND: int = Field(default=0, description="Throttle re-encryption (0 = nessun limite)")
     GDPR_RETENTION_DAYS: int = Field(default=1095, description="Giorni retention dati (3 anni default)")
     GDPR_CONSENT_EXPIRY_DAYS: int = Field(default=365, description="Scadenza consensi (1 anno)")
     GDPR_AUDIT_ENABLED: bool = Field(default=True, description="Abilita audit trail GDPR")
+    GDPR_AUDIT_SIGNING_KEY: Optional[str] = Field(
+        default=None,
+        description="Seed Ed25519 (hex/base64, 32 byte) per firmare i checkpoint di audit (default: derivato con HKDF da GDPR_ENCRYPTION_KEY)"
+    )
+    GDPR_AUDIT_CHECKPOINT_INTERVAL: float = Field(default=3600.0, description="Secondi tra due checkpoint Merkle dell'audit log")
     GDPR_AUTO_ANONYMIZE: bool = Field(default=True, description="Anonimizzazione automatica dati scaduti")
-    GDPR_EXPORT_FORMAT: str = Field(default="json", description="Formato export dati (json/csv/xml)")
+    GDPR_ERASURE_BATCH_SIZE: int = Field(default=1000, description="Interessati per UPDATE nel batch di erasure")
+    GDPR_EXPORT_FORMAT: str = Field(default="json", description="Formato export di default (json/ndjson/csv/xml/csv_zip/parquet), validato all'avvio del plugin GDPR")
+    GDPR_EXPORT_COMPRESSION: str = Field(default="gzip", description="Compressione export di default (none/gzip/zstd; negli archivi zip zstd diventa deflate)")
     
     # Data Protection Officer (DPO) contacts
     DPO_EMAIL: Optional[str] = Field(default=None, description="Email Data Protection Officer")
@@ -123,11 +152,27 @@ class Settings(BaseSettings):
     LOG_FILE_PATH: str = Field(default="logs/app.log", description="Path file log")
     LOG_MAX_SIZE: int = Field(default=100, description="Dimensione max file log (MB)")
     LOG_BACKUP_COUNT: int = Field(default=5, description="Numero backup file log")
+    LOG_JSON: bool = Field(default=True, description="Log strutturati JSON (False: testo semplice)")
+    LOG_DEBUG_SAMPLE_RATE: float = Field(default=1.0, description="Frazione di log DEBUG mantenuti (0-1)")
+    LOG_SECURITY_SAMPLE_RATE: float = Field(default=1.0, description="Frazione di security event INFO/DEBUG mantenuti (0-1)")
     
     # ===== MONITORING & ANALYTICS =====
     METRICS_ENABLED: bool = Field(default=True, description="Abilita metriche")
     METRICS_ENDPOINT: str = Field(default="/metrics", description="Endpoint metriche Prometheus")
+    GDPR_PERF_MONITOR_ENABLED: bool = Field(default=True, description="Latenze p50/p95/p99 delle API GDPR (indipendente da METRICS_ENABLED)")
+    GDPR_PERF_FLUSH_INTERVAL: float = Field(default=5.0, description="Secondi tra due flush delle latenze GDPR su Redis")
+    GDPR_PERF_RETENTION_MINUTES: int = Field(default=1440, description="Minuti di latenze GDPR conservati in Redis")
+    GDPR_PERF_SLO_P95_MS: Dict[str, float] = Field(
+        default_factory=lambda: {"*": 500.0, "* /api/gdpr/export*": 2000.0, "* /api/gdpr/delet*": 2000.0},
+        description="SLO p95 (ms) per operazione GDPR: pattern fnmatch su 'METHOD /route', vince il più specifico"
+    )
+    STARTUP_PROFILE_PATH: Optional[str] = Field(
+        default="logs/startup_profile.json",
+        description="File JSON con la timeline di avvio (None: non salvato)"
+    )
+    STARTUP_WARM_CONNECTIONS: bool = Field(default=True, description="Connessione a DB e Redis durante il boot")
     HEALTH_CHECK_INTERVAL: int = Field(default=30, description="Intervallo health check (secondi)")
+    HEALTH_CHECK_TIMEOUT: float = Field(default=2.0, description="Timeout di ogni dipendenza negli health check (secondi)")
     
     # ===== CELERY CONFIGURATION (Background Tasks) =====
     CELERY_BROKER_URL: Optional[str] = Field(default=None, description="URL broker Celery")
@@ -305,6 +350,7 @@ class Settings(BaseSettings):
                 'audit_enabled': self.GDPR_AUDIT_ENABLED,
                 'auto_anonymize': self.GDPR_AUTO_ANONYMIZE,
                 'export_format': self.GDPR_EXPORT_FORMAT,
+                'export_compression': self.GDPR_EXPORT_COMPRESSION,
                 'export_dir': self.GDPR_EXPORT_DIR,
                 'export_retention_hours': self.GDPR_EXPORT_RETENTION_HOURS,
                 'dpo_email': self.DPO_EMAIL,
@@ -357,6 +403,18 @@ class Settings(BaseSettings):
             'gdpr-audit-cleanup': {
                 'task': 'plugins.gdpr_plugin.tasks.audit_cleanup.cleanup_old_audit_logs',
                 'schedule': 604800.0,  # Weekly
+            },
+            'gdpr-export-cleanup': {
+                'task': 'plugins.gdpr_plugin.tasks.export_jobs.cleanup_expired_exports',
+                'schedule': 3600.0,  # Hourly
+            },
+            'gdpr-erasure-batch': {
+                'task': 'plugins.gdpr_plugin.tasks.erasure.process_pending_erasures',
+                'schedule': 86400.0,  # Daily (nightly batch)
+            },
+            'gdpr-audit-checkpoint': {
+                'task': 'plugins.gdpr_plugin.tasks.audit_checkpoints.create_audit_checkpoints',
+                'schedule': self.GDPR_AUDIT_CHECKPOINT_INTERVAL,  # Hourly (default)
             }
         })
         
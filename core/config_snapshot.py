@@ -0,0 +1,287 @@
+"""
+🧊 Snapshot immutabile della configurazione
+
+- `get_settings()`: vista congelata di `Settings` (classe con `__slots__`,
+  liste → tuple, dict → mapping read-only), costruita una volta sola
+- `get_plugin_config(name)`: sezione tipizzata da `config/plugin_configs/*.yml`,
+  parsata una volta e tenuta in memoria
+- `reload_settings()`: ricostruisce snapshot e sezioni solo se `.env`,
+  variabili d'ambiente o file YAML sono cambiati (confronto stat, niente parsing),
+  e aggiorna sul posto anche il `settings` globale di `core.config`
+
+Nessuna I/O sul percorso delle richieste: il reload è esplicito.
+"""
+import logging
+import os
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import yaml
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+logger = logging.getLogger(__name__)
+
+
+def freeze(value):
+    """Copia immutabile (ricorsiva) di liste, set e dict"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
+def thaw(value):
+    if isinstance(value, Mapping):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+# ===== SETTINGS =====
+
+class FrozenSettings:
+    """Base delle snapshot: attributi in slot, assegnazione vietata"""
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Settings snapshot immutabile: {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Settings snapshot immutabile: {name}")
+
+    def __repr__(self):
+        return f"<FrozenSettings {len(self.__slots__)} campi>"
+
+    @classmethod
+    def from_settings(cls, settings) -> "FrozenSettings":
+        values = settings.model_dump()
+        snapshot_class = _snapshot_class(tuple(values))
+        snapshot = object.__new__(snapshot_class)
+        for name, value in values.items():
+            object.__setattr__(snapshot, name, freeze(value))
+        return snapshot
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: thaw(getattr(self, name)) for name in self.__slots__}
+
+    # Stesse proprietà calcolate di Settings
+    @property
+    def is_development(self) -> bool:
+        return self.ENVIRONMENT == 'development'
+
+    @property
+    def is_production(self) -> bool:
+        return self.ENVIRONMENT == 'production'
+
+    @property
+    def gdpr_enabled(self) -> bool:
+        return 'gdpr' in self.ENABLED_PLUGINS
+
+    @property
+    def security_enabled(self) -> bool:
+        return 'security' in self.ENABLED_PLUGINS
+
+
+_snapshot_classes: Dict[Tuple[str, ...], type] = {}
+
+
+def _snapshot_class(fields: Tuple[str, ...]) -> type:
+    # Una classe per insieme di campi (extra="allow" può aggiungerne dall'env)
+    if fields not in _snapshot_classes:
+        _snapshot_classes[fields] = type("SettingsSnapshot", (FrozenSettings,), {"__slots__": fields})
+    return _snapshot_classes[fields]
+
+
+# ===== PLUGIN CONFIG (YAML) =====
+
+class PluginConfigSection(BaseModel):
+    """Sezione `<plugin>:` di un file in `config/plugin_configs`"""
+    model_config = ConfigDict(frozen=True, extra="allow", validate_default=True)
+
+    name: str
+    enabled: bool = False
+    features: Mapping[str, bool] = Field(default_factory=dict)
+    settings: Mapping[str, Any] = Field(default_factory=dict)
+
+    @field_validator("features", "settings", mode="after")
+    @classmethod
+    def _freeze(cls, value):
+        return freeze(dict(value))
+
+    def feature(self, name: str, default: bool = False) -> bool:
+        return self.enabled and self.features.get(name, default)
+
+
+def _stat_key(path: Path) -> Tuple[int, int, int]:
+    stat = path.stat()
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class PluginConfigStore:
+    """Sezioni YAML in memoria; `refresh()` riparsa solo i file cambiati"""
+
+    def __init__(self, path="config/plugin_configs"):
+        self.path = Path(path)
+        self._sections: Dict[str, PluginConfigSection] = {}
+        self._files: Dict[Path, Tuple[Tuple[int, int, int], List[str]]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _scan(self) -> Dict[Path, Tuple[int, int, int]]:
+        if not self.path.is_dir():
+            return {}
+        stamps = {}
+        for pattern in ("*.yml", "*.yaml"):
+            for config_file in self.path.glob(pattern):
+                try:
+                    stamps[config_file] = _stat_key(config_file)
+                except OSError:
+                    continue
+        return stamps
+
+    def _parse(self, config_file: Path) -> Dict[str, PluginConfigSection]:
+        with open(config_file, encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+        if not isinstance(data, dict):
+            raise ValueError(f"{config_file}: atteso un mapping plugin → configurazione")
+        return {
+            name: PluginConfigSection(name=name, **(section or {}))
+            for name, section in data.items()
+        }
+
+    def refresh(self) -> List[str]:
+        """Ricarica i file aggiunti/modificati/rimossi; ritorna le sezioni cambiate"""
+        with self._lock:
+            stamps = self._scan()
+            files = dict(self._files)
+            sections = dict(self._sections)
+            changed: List[str] = []
+
+            for config_file in set(files) - set(stamps):
+                for name in files.pop(config_file)[1]:
+                    sections.pop(name, None)
+                    changed.append(name)
+
+            for config_file, stamp in stamps.items():
+                if config_file in files and files[config_file][0] == stamp:
+                    continue
+                try:
+                    parsed = self._parse(config_file)
+                except (OSError, ValueError, yaml.YAMLError) as e:
+                    # File non valido: resta la versione precedente
+                    logger.error(f"❌ Configurazione plugin non valida: {e}")
+                    continue
+                for name in files.get(config_file, (None, []))[1]:
+                    if name not in parsed:
+                        sections.pop(name, None)
+                        changed.append(name)
+                sections.update(parsed)
+                changed.extend(parsed)
+                files[config_file] = (stamp, list(parsed))
+
+            # Swap atomico: i lettori vedono il dict vecchio o quello nuovo
+            self._files, self._sections, self._loaded = files, sections, True
+            return sorted(set(changed))
+
+    def get(self, name: str) -> Optional[PluginConfigSection]:
+        """Sezione del plugin (`gdpr` o `gdpr_plugin`), senza I/O dopo il primo load"""
+        if not self._loaded:
+            self.refresh()
+        sections = self._sections
+        return sections.get(name) or sections.get(name.removesuffix("_plugin"))
+
+    def all(self) -> Dict[str, PluginConfigSection]:
+        if not self._loaded:
+            self.refresh()
+        return dict(self._sections)
+
+
+# ===== SNAPSHOT CORRENTE =====
+
+_lock = threading.Lock()
+_current: Optional[FrozenSettings] = None
+_env_stamp = None
+_plugin_configs: Optional[PluginConfigStore] = None
+
+
+def _environment_stamp(settings_class) -> tuple:
+    """Cosa può cambiare i valori di Settings: file .env e variabili d'ambiente"""
+    env_file = Path(settings_class.model_config.get("env_file") or ".env")
+    try:
+        file_stamp = _stat_key(env_file)
+    except OSError:
+        file_stamp = None
+    fields = settings_class.model_fields
+    return file_stamp, tuple(sorted((k, v) for k, v in os.environ.items() if k in fields))
+
+
+def get_settings() -> FrozenSettings:
+    """Snapshot corrente (costruita dal `settings` globale al primo accesso)"""
+    global _current, _env_stamp
+    snapshot = _current
+    if snapshot is None:
+        from core.config import settings
+        with _lock:
+            if _current is None:
+                _env_stamp = _environment_stamp(type(settings))
+                _current = FrozenSettings.from_settings(settings)
+            snapshot = _current
+    return snapshot
+
+
+def get_plugin_configs() -> PluginConfigStore:
+    global _plugin_configs
+    if _plugin_configs is None:
+        path = get_settings().PLUGIN_CONFIG_PATH  # fuori dal lock: get_settings lo usa
+        with _lock:
+            if _plugin_configs is None:
+                _plugin_configs = PluginConfigStore(path)
+    return _plugin_configs
+
+
+def get_plugin_config(name: str) -> Optional[PluginConfigSection]:
+    return get_plugin_configs().get(name)
+
+
+def _update_in_place(target, source) -> None:
+    """Copia i valori di `source` nell'istanza `target` (stessi riferimenti per chi l'ha importata)"""
+    target.__dict__.update(source.__dict__)
+    object.__setattr__(target, "__pydantic_extra__", source.__pydantic_extra__)
+    object.__setattr__(target, "__pydantic_fields_set__", set(source.__pydantic_fields_set__))
+
+
+def reload_settings(force: bool = False) -> bool:
+    """
+    🔄 Nuova snapshot se `.env`/ambiente sono cambiati (o `force`), poi
+    refresh delle sezioni YAML. Ritorna True se è cambiato qualcosa.
+
+    Anche il `settings` globale di `core.config` riceve i nuovi valori:
+    `get_settings()` e `settings` non divergono dopo un reload.
+    """
+    global _current, _env_stamp, _plugin_configs
+    from core.config import Settings, settings
+    get_settings()
+    changed = False
+    stamp = _environment_stamp(Settings)
+    if force or stamp != _env_stamp:
+        values = Settings()
+        values.setup_celery_beat_schedule()
+        fresh = FrozenSettings.from_settings(values)
+        with _lock:
+            _update_in_place(settings, values)
+            _current, _env_stamp = fresh, stamp
+        changed = True
+        logger.info("🔄 Settings ricaricati")
+    configs = get_plugin_configs()
+    if configs.path != Path(_current.PLUGIN_CONFIG_PATH):
+        configs = _plugin_configs = PluginConfigStore(_current.PLUGIN_CONFIG_PATH)
+        changed = True
+    if configs.refresh():
+        changed = True
+    return changed
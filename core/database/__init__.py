@@ -1 +1,16 @@
 # core.database package init
+from core.database.base import (
+    Base, BaseModel, PluginRegistry, PersonalDataRegistry, PersonalDataSource, DatabaseFactory
+)
+
+
+def __getattr__(name):
+    # engine/SessionLocal leggono settings: import lazy per non richiedere
+    # la configurazione a chi usa solo i modelli (es. test, tools)
+    if name in ("engine", "SessionLocal"):
+        from core.database import session
+        return getattr(session, name)
+    raise AttributeError(f"module 'core.database' has no attribute {name!r}")
+
+
+__all__ = ['Base', 'BaseModel', 'PluginRegistry', 'PersonalDataRegistry', 'PersonalDataSource', 'DatabaseFactory', 'engine', 'SessionLocal']
@@ -6,6 +6,8 @@ from sqlalchemy import create_engine, MetaData, Column, DateTime, Boolean
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.pool import StaticPool
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
 import uuid
 from datetime import datetime
 
@@ -22,11 +24,68 @@ naming_convention = {
 }
 Base.metadata.naming_convention = naming_convention
 
+# ✅ GDPR: Personal data registry
+@dataclass
+class PersonalDataSource:
+    """Tabella con dati personali: `subject_column` collega le righe all'interessato"""
+    name: str
+    model: Any
+    subject_column: str
+    plugin_name: Optional[str] = None
+    anonymize: Any = None  # strategie per colonna o "delete" (vedi gdpr_plugin.utils.anonymization)
+
+
+class PersonalDataRegistry:
+    """
+    Registry dei modelli con dati personali (export Art. 15/20).
+
+    I modelli si registrano dichiarando `__gdpr_subject__` (BaseModel) oppure
+    via `PluginRegistry.register_table(..., subject_column=...)`.
+    """
+    _sources: Dict[str, PersonalDataSource] = {}
+
+    @classmethod
+    def register(cls, model, subject_column: str, name: Optional[str] = None,
+                 plugin_name: Optional[str] = None, anonymize: Any = None) -> PersonalDataSource:
+        name = name or getattr(model, "__gdpr_export_name__", None) or model.__tablename__
+        anonymize = anonymize if anonymize is not None else getattr(model, "__anonymize__", None)
+        source = PersonalDataSource(name=name, model=model, subject_column=subject_column,
+                                    plugin_name=plugin_name, anonymize=anonymize)
+        cls._sources[name] = source
+        return source
+
+    @classmethod
+    def get_sources(cls) -> List[PersonalDataSource]:
+        """Sorgenti in ordine di registrazione"""
+        return list(cls._sources.values())
+
+
+def register_personal_data_model(model) -> None:
+    """Hook `__init_subclass__` dei BaseModel: registra i modelli con `__gdpr_subject__`"""
+    subject_column = getattr(model, "__gdpr_subject__", None)
+    if subject_column and "__tablename__" in model.__dict__:
+        PersonalDataRegistry.register(model, subject_column)
+
+
+_anonymizer: Optional[Callable[[Any, str], None]] = None
+
+
+def register_anonymizer(anonymizer: Optional[Callable[[Any, str], None]]) -> None:
+    """Funzione usata da `BaseModel.anonymize`, registrata dal plugin GDPR (il core non importa i plugin)"""
+    global _anonymizer
+    _anonymizer = anonymizer
+
+
 class BaseModel(Base):
     """
     🎯 Base model con GDPR compliance integrata
     """
     __abstract__ = True
+
+    # ✅ GDPR: colonna che collega la riga all'interessato (es. "user_id"), None = nessun dato personale
+    __gdpr_subject__: Optional[str] = None
+    # ✅ GDPR: strategie di erasure per colonna, es. {"email": "hash", "name": "pseudonym"} o "delete"
+    __anonymize__: Any = None
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -44,9 +103,15 @@ class BaseModel(Base):
         self.deleted_at = datetime.utcnow()
         self.is_deleted = True
     
-    def anonymize(self):
-        """GDPR anonymization hook - override in models"""
-        pass
+    def anonymize(self, secret: str = ""):
+        """GDPR anonymization hook: applica le strategie `__anonymize__` (override per logiche custom)"""
+        if _anonymizer is None:
+            raise RuntimeError("Nessun anonymizer registrato: il plugin GDPR non è caricato")
+        _anonymizer(self, secret)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        register_personal_data_model(cls)
 
 # ✅ Plugin Registration System  
 class PluginRegistry:
@@ -54,11 +119,15 @@ class PluginRegistry:
     _tables = {}
     
     @classmethod
-    def register_table(cls, plugin_name: str, table_class):
-        """Registra tabella plugin per migrations"""
+    def register_table(cls, plugin_name: str, table_class, subject_column: Optional[str] = None,
+                       anonymize: Any = None):
+        """Registra tabella plugin per migrations (e, con `subject_column`, per export/erasure GDPR)"""
         if plugin_name not in cls._tables:
             cls._tables[plugin_name] = []
         cls._tables[plugin_name].append(table_class)
+        subject_column = subject_column or getattr(table_class, "__gdpr_subject__", None)
+        if subject_column:
+            PersonalDataRegistry.register(table_class, subject_column, plugin_name=plugin_name, anonymize=anonymize)
     
     @classmethod
     def get_plugin_tables(cls, plugin_name: str):
@@ -87,4 +156,4 @@ class DatabaseFactory:
         return sessionmaker(bind=engine, expire_on_commit=False)
 
 # ✅ Export - Single source of truth
-__all__ = ['Base', 'BaseModel', 'PluginRegistry', 'DatabaseFactory']
+__all__ = ['Base', 'BaseModel', 'PluginRegistry', 'PersonalDataRegistry', 'PersonalDataSource', 'DatabaseFactory']
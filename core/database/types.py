@@ -0,0 +1,624 @@
+"""
+🔐 Tipi colonna cifrati - Envelope encryption AES-GCM (GDPR Art. 32)
+
+Nel core perché i modelli core (es. `User.email`) li usano senza caricare
+il plugin GDPR; `plugins.gdpr_plugin.utils.encryption` li ri-esporta.
+
+- ogni tenant ha una data key (DEK) casuale a 256 bit, salvata in
+  `gdpr_data_keys` (tabella del plugin GDPR, letta solo a runtime da
+  `SQLKeyStore`) solo cifrata ("wrapped") con la master key
+- i valori sono cifrati con AES-GCM sotto la DEK: formato
+  `v2:<kid>:<base64(nonce + ciphertext + tag)>`; l'AAD lega il ciphertext
+  a kid, tenant della data key e `tabella.colonna` (un valore copiato in
+  un'altra colonna non si decifra). `v1` (AAD = kid) resta leggibile
+- `EncryptedString` usa la data key del tenant della riga (`tenant_id`
+  letto in `before_flush`), o quella fissata sulla colonna
+- le DEK vengono unwrappate una volta e i cipher AESGCM restano in cache
+  per kid: cifrare un campo costa una sola operazione AES-GCM
+- API batch e `EncryptedString` (TypeDecorator) per colonne cifrate
+  in modo trasparente
+- rotazione online: più master key (keyring) e più data key per tenant
+  restano valide in lettura, le nuove scritture usano la chiave attiva
+  (vedi `plugins/gdpr_plugin/services/key_rotation_service.py`)
+- blind index: HMAC con chiave in una colonna indicizzata accanto al campo
+  cifrato, aggiornata in automatico, per ricerche di uguaglianza in O(log n)
+
+    email = Column(EncryptedString(blind_index="email_bidx"), nullable=False)
+    email_bidx = Column(String(64), unique=True, index=True)
+
+    db.query(User).filter(User.email_bidx == blind_index_for(User.email, "a@b.c"))
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from sqlalchemy import Column, Table, Text, event, inspect
+from sqlalchemy.orm import Mapper, Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.types import TypeDecorator
+
+FORMAT_VERSION = "v1"  # AAD = kid (valori senza contesto)
+BOUND_FORMAT_VERSION = "v2"  # AAD = kid | tenant | tabella.colonna
+NONCE_SIZE = 12
+TAG_SIZE = 16
+DEFAULT_MASTER_KID = "m1"
+BLIND_INDEX_LENGTH = 32  # caratteri hex (128 bit)
+
+
+def field_aad(kid: str, tenant_id: Optional[str], context: str) -> bytes:
+    """AAD dei ciphertext v2: kid, tenant della data key e `tabella.colonna`"""
+    return f"{kid}|{tenant_id or '*'}|{context}".encode()
+
+
+class Ciphertext(str):
+    """Ciphertext già calcolato per una riga: `EncryptedString` lo scrive così com'è"""
+
+
+class EncryptionError(Exception):
+    """Ciphertext non valido, chiave sconosciuta o autenticazione fallita"""
+
+
+def derive_master_key(secret: Union[str, bytes], kid: str = DEFAULT_MASTER_KID) -> bytes:
+    """Master key a 256 bit da GDPR_ENCRYPTION_KEY (HKDF-SHA256, una chiave per kid)"""
+    raw = secret.encode() if isinstance(secret, str) else secret
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None,
+                info=f"gdpr-master-key:{kid}".encode()).derive(raw)
+
+
+# ===== KEY STORES =====
+
+class MemoryKeyStore:
+    """Data key in memoria (test, tool, processi senza DB)"""
+
+    def __init__(self):
+        self._keys: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, kid: str) -> Optional[Dict[str, Any]]:
+        return self._keys.get(kid)
+
+    def get_active(self, tenant_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        active = [k for k in self._keys.values() if k["tenant_id"] == tenant_id and k["active"]]
+        return active[-1] if active else None
+
+    def add(self, record: Dict[str, Any]) -> None:
+        self._keys[record["kid"]] = dict(record)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [dict(record) for record in self._keys.values()]
+
+    def update(self, kid: str, values: Dict[str, Any]) -> None:
+        self._keys[kid].update(values)
+
+
+class SQLKeyStore:
+    """Data key nella tabella `gdpr_data_keys`, con una sessione propria per operazione"""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    @staticmethod
+    def _as_record(row) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        return {"kid": row.kid, "tenant_id": row.tenant_id, "master_kid": row.master_kid,
+                "wrapped_key": row.wrapped_key, "active": row.active}
+
+    def get(self, kid: str) -> Optional[Dict[str, Any]]:
+        from plugins.gdpr_plugin.models.encryption_key import DataEncryptionKey
+        with self.session_factory() as db:
+            return self._as_record(db.query(DataEncryptionKey).filter_by(kid=kid).first())
+
+    def get_active(self, tenant_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        from plugins.gdpr_plugin.models.encryption_key import DataEncryptionKey
+        with self.session_factory() as db:
+            row = db.query(DataEncryptionKey).filter_by(tenant_id=tenant_id, active=True) \
+                .order_by(DataEncryptionKey.created_at.desc()).first()
+            return self._as_record(row)
+
+    def add(self, record: Dict[str, Any]) -> None:
+        from plugins.gdpr_plugin.models.encryption_key import DataEncryptionKey
+        with self.session_factory() as db:
+            db.add(DataEncryptionKey(**record))
+            db.commit()
+
+    def list(self) -> List[Dict[str, Any]]:
+        from plugins.gdpr_plugin.models.encryption_key import DataEncryptionKey
+        with self.session_factory() as db:
+            return [self._as_record(row) for row in db.query(DataEncryptionKey).order_by(DataEncryptionKey.created_at)]
+
+    def update(self, kid: str, values: Dict[str, Any]) -> None:
+        from plugins.gdpr_plugin.models.encryption_key import DataEncryptionKey
+        with self.session_factory() as db:
+            db.query(DataEncryptionKey).filter_by(kid=kid).update(values)
+            db.commit()
+
+
+# ===== SERVICE =====
+
+class FieldEncryptionService:
+    """
+    Cifratura di campi con envelope encryption.
+
+    Args:
+        master_keys: {master_kid: chiave a 32 byte}, anche quelle precedenti
+        active_master_kid: master key usata per wrappare le nuove DEK
+        key_store: MemoryKeyStore / SQLKeyStore
+        active_key_ttl: secondi di cache della DEK attiva (None = per sempre);
+            dopo una rotazione gli altri processi passano alla nuova chiave
+            entro questo intervallo
+    """
+
+    def __init__(self, master_keys: Dict[str, bytes], active_master_kid: str, key_store=None,
+                 active_key_ttl: Optional[float] = None):
+        if active_master_kid not in master_keys:
+            raise ValueError(f"Master key attiva non presente: {active_master_kid}")
+        self._masters = {kid: AESGCM(key) for kid, key in master_keys.items()}
+        self.active_master_kid = active_master_kid
+        self.key_store = key_store if key_store is not None else MemoryKeyStore()
+        self._ciphers: Dict[str, AESGCM] = {}
+        self._tenants: Dict[str, Optional[str]] = {}
+        self._active: Dict[Optional[str], Tuple[str, AESGCM, float]] = {}
+        self.active_key_ttl = active_key_ttl
+        self._lock = threading.Lock()
+
+    # --- data keys ---
+
+    def _unwrap_key(self, record: Dict[str, Any]) -> bytes:
+        master = self._masters.get(record["master_kid"])
+        if master is None:
+            raise EncryptionError(f"Master key sconosciuta: {record['master_kid']}")
+        blob = base64.b64decode(record["wrapped_key"])
+        try:
+            return master.decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], record["kid"].encode())
+        except Exception as e:
+            raise EncryptionError(f"Unwrap data key {record['kid']} fallito") from e
+
+    def _wrap_key(self, kid: str, data_key: bytes) -> str:
+        nonce = os.urandom(NONCE_SIZE)
+        wrapped = self._masters[self.active_master_kid].encrypt(nonce, data_key, kid.encode())
+        return base64.b64encode(nonce + wrapped).decode()
+
+    def _create_data_key(self, tenant_id: Optional[str]) -> Tuple[str, AESGCM]:
+        kid = secrets.token_hex(8)
+        data_key = AESGCM.generate_key(bit_length=256)
+        self.key_store.add({
+            "kid": kid, "tenant_id": tenant_id, "master_kid": self.active_master_kid,
+            "wrapped_key": self._wrap_key(kid, data_key), "active": True,
+        })
+        cipher = self._ciphers[kid] = AESGCM(data_key)
+        self._tenants[kid] = tenant_id
+        return kid, cipher
+
+    def data_key(self, kid: str) -> bytes:
+        """Materiale della data key in chiaro (per i worker di re-encryption, mai da persistere)"""
+        record = self.key_store.get(kid)
+        if record is None:
+            raise EncryptionError(f"Data key sconosciuta: {kid}")
+        self._tenants[kid] = record["tenant_id"]
+        return self._unwrap_key(record)
+
+    def key_tenant(self, kid: str) -> Optional[str]:
+        """Tenant a cui appartiene la data key (parte dell'AAD v2)"""
+        if kid not in self._tenants:
+            self.cipher_for_kid(kid)
+        return self._tenants[kid]
+
+    def cipher_for_kid(self, kid: str) -> AESGCM:
+        """Cipher in cache per kid (unwrap dalla key store al primo uso)"""
+        cipher = self._ciphers.get(kid)
+        if cipher is None:
+            cipher = self._ciphers[kid] = AESGCM(self.data_key(kid))
+        return cipher
+
+    def _is_fresh(self, active) -> bool:
+        return active is not None and (self.active_key_ttl is None
+                                       or time.monotonic() - active[2] < self.active_key_ttl)
+
+    def active_key(self, tenant_id: Any = None) -> Tuple[str, AESGCM]:
+        """(kid, cipher) della data key attiva del tenant, creata al primo uso"""
+        tenant = None if tenant_id is None else str(tenant_id)
+        active = self._active.get(tenant)
+        if not self._is_fresh(active):
+            with self._lock:
+                active = self._active.get(tenant)
+                if not self._is_fresh(active):
+                    record = self.key_store.get_active(tenant)
+                    if record is not None:
+                        kid, cipher = record["kid"], self.cipher_for_kid(record["kid"])
+                    else:
+                        kid, cipher = self._create_data_key(tenant)
+                    active = self._active[tenant] = (kid, cipher, time.monotonic())
+        return active[0], active[1]
+
+    # --- rotation ---
+
+    def rotate_data_key(self, tenant_id: Any = None) -> str:
+        """Nuova DEK attiva per il tenant; le precedenti restano valide in lettura"""
+        tenant = None if tenant_id is None else str(tenant_id)
+        with self._lock:
+            previous = [record for record in self.key_store.list()
+                        if record["tenant_id"] == tenant and record["active"]]
+            kid, cipher = self._create_data_key(tenant)
+            for record in previous:
+                self.key_store.update(record["kid"], {"active": False})
+            self._active[tenant] = (kid, cipher, time.monotonic())
+        return kid
+
+    def rewrap_data_keys(self) -> int:
+        """Rotazione della master key: ri-cifra le DEK con la master attiva (i dati non cambiano)"""
+        count = 0
+        for record in self.key_store.list():
+            if record["master_kid"] == self.active_master_kid:
+                continue
+            data_key = self._unwrap_key(record)
+            self.key_store.update(record["kid"], {"master_kid": self.active_master_kid,
+                                                  "wrapped_key": self._wrap_key(record["kid"], data_key)})
+            count += 1
+        return count
+
+    def forget_cached_keys(self) -> None:
+        """Svuota la cache (es. dopo una rotazione eseguita da un altro processo)"""
+        with self._lock:
+            self._ciphers.clear()
+            self._tenants.clear()
+            self._active.clear()
+
+    # --- values ---
+
+    def _seal_params(self, kid: str, context: Optional[str]) -> Tuple[str, bytes]:
+        """(prefisso, AAD) per cifrare con `kid`: v2 se c'è un contesto tabella.colonna"""
+        if context is None:
+            return f"{FORMAT_VERSION}:{kid}:", kid.encode()
+        return f"{BOUND_FORMAT_VERSION}:{kid}:", field_aad(kid, self.key_tenant(kid), context)
+
+    def encrypt(self, plaintext: Optional[str], tenant_id: Any = None,
+                context: Optional[str] = None) -> Optional[str]:
+        if plaintext is None:
+            return None
+        kid, cipher = self.active_key(tenant_id)
+        prefix, aad = self._seal_params(kid, context)
+        nonce = os.urandom(NONCE_SIZE)
+        sealed = cipher.encrypt(nonce, plaintext.encode("utf-8"), aad)
+        return prefix + base64.b64encode(nonce + sealed).decode()
+
+    @staticmethod
+    def parse(token: str) -> Tuple[str, bytes]:
+        """`v1|v2:<kid>:<b64>` → (kid, blob)"""
+        try:
+            version, kid, payload = token.split(":", 2)
+            if version not in (FORMAT_VERSION, BOUND_FORMAT_VERSION):
+                raise ValueError(version)
+            return kid, base64.b64decode(payload, validate=True)
+        except (ValueError, AttributeError) as e:
+            raise EncryptionError("Formato ciphertext non valido") from e
+
+    @staticmethod
+    def is_encrypted(value: Any) -> bool:
+        """Forma di un ciphertext: `v1|v2:<kid>:<b64>` con nonce e tag (un testo "v1:..." non basta)"""
+        if not isinstance(value, str) or not value.startswith((FORMAT_VERSION + ":", BOUND_FORMAT_VERSION + ":")):
+            return False
+        try:
+            kid, blob = FieldEncryptionService.parse(value)
+        except EncryptionError:
+            return False
+        return bool(kid) and len(blob) >= NONCE_SIZE + TAG_SIZE
+
+    def is_valid_token(self, value: Any) -> bool:
+        """Ciphertext di questo servizio: formato valido e kid presente nella key store"""
+        if not self.is_encrypted(value):
+            return False
+        try:
+            self.cipher_for_kid(value.split(":", 2)[1])
+        except EncryptionError:
+            return False
+        return True
+
+    def decrypt(self, token: Optional[str], context: Optional[str] = None) -> Optional[str]:
+        """`context` (tabella.colonna) è obbligatorio per i ciphertext v2"""
+        if token is None:
+            return None
+        kid, blob = self.parse(token)
+        if token.startswith(BOUND_FORMAT_VERSION + ":"):
+            if context is None:
+                raise EncryptionError(f"Ciphertext legato a una colonna: contesto mancante (kid {kid})")
+            aad = field_aad(kid, self.key_tenant(kid), context)
+        else:
+            aad = kid.encode()
+        try:
+            return self.cipher_for_kid(kid).decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], aad).decode("utf-8")
+        except EncryptionError:
+            raise
+        except Exception as e:
+            raise EncryptionError(f"Decifratura fallita (kid {kid})") from e
+
+    def encrypt_batch(self, values: Iterable[Optional[str]], tenant_id: Any = None,
+                      context: Optional[str] = None) -> List[Optional[str]]:
+        """Cifra una colonna: una lookup della chiave e un solo os.urandom per tutti i nonce"""
+        values = list(values)
+        kid, cipher = self.active_key(tenant_id)
+        prefix, aad = self._seal_params(kid, context)
+        nonces = os.urandom(NONCE_SIZE * len(values))
+        encrypt, b64 = cipher.encrypt, base64.b64encode
+        result = []
+        for i, value in enumerate(values):
+            if value is None:
+                result.append(None)
+                continue
+            nonce = nonces[i * NONCE_SIZE:(i + 1) * NONCE_SIZE]
+            result.append(prefix + b64(nonce + encrypt(nonce, value.encode("utf-8"), aad)).decode())
+        return result
+
+    def decrypt_batch(self, tokens: Iterable[Optional[str]], context: Optional[str] = None) -> List[Optional[str]]:
+        return [self.decrypt(token, context) for token in tokens]
+
+    @staticmethod
+    def key_id(token: Optional[str]) -> Optional[str]:
+        """kid di un ciphertext (None per valori non cifrati)"""
+        if not FieldEncryptionService.is_encrypted(token):
+            return None
+        return token.split(":", 2)[1]
+
+
+def master_keyring(active_secret: Union[str, bytes], active_kid: str,
+                   previous: Optional[Dict[str, str]] = None) -> Dict[str, bytes]:
+    """{kid: master key} con la chiave attiva e quelle precedenti ancora accettate in lettura"""
+    keys = {kid: derive_master_key(secret, kid) for kid, secret in (previous or {}).items()}
+    keys[active_kid] = derive_master_key(active_secret, active_kid)
+    return keys
+
+
+# ===== DEFAULT SERVICE =====
+
+_service: Optional[FieldEncryptionService] = None
+_service_lock = threading.Lock()
+
+
+def get_encryption_service() -> FieldEncryptionService:
+    """Servizio di default: master key da settings, data key nel DB dell'app"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                from core.config import settings
+                from core.database import SessionLocal
+                kid = settings.GDPR_MASTER_KEY_ID
+                _service = FieldEncryptionService(
+                    master_keyring(settings.GDPR_ENCRYPTION_KEY, kid, settings.GDPR_PREVIOUS_ENCRYPTION_KEYS),
+                    kid, SQLKeyStore(SessionLocal), active_key_ttl=settings.GDPR_KEY_CACHE_TTL,
+                )
+    return _service
+
+
+def set_encryption_service(service: Optional[FieldEncryptionService]) -> None:
+    """Sostituisce il servizio di default (test, tool, key ring custom)"""
+    global _service
+    _service = service
+
+
+def encrypt_data(data: Optional[str], tenant_id: Any = None) -> Optional[str]:
+    return get_encryption_service().encrypt(data, tenant_id)
+
+
+def decrypt_data(token: Optional[str]) -> Optional[str]:
+    return get_encryption_service().decrypt(token)
+
+
+# ===== BLIND INDEX =====
+
+def normalize_search_value(value: Any) -> str:
+    """Normalizzazione di default: spazi ai bordi e maiuscole non contano (email, nomi)"""
+    return str(value).strip().lower()
+
+
+class BlindIndex:
+    """
+    HMAC-SHA256 troncato per ricerche di uguaglianza su valori cifrati.
+
+    Una sottochiave (HKDF) per etichetta `tenant:tabella.colonna`: lo stesso
+    valore in colonne diverse non produce indici collegabili. I contesti
+    HMAC sono in cache e clonati per ogni valore.
+    """
+
+    def __init__(self, key: Union[str, bytes], length: int = BLIND_INDEX_LENGTH):
+        self._key = key.encode() if isinstance(key, str) else key
+        self.length = length
+        self._contexts: Dict[str, Any] = {}
+
+    @property
+    def key(self) -> bytes:
+        """Chiave radice (per i worker di re-encryption che ricalcolano l'indice, mai da persistere)"""
+        return self._key
+
+    def _context(self, label: str):
+        context = self._contexts.get(label)
+        if context is None:
+            subkey = HKDF(algorithm=hashes.SHA256(), length=32, salt=None,
+                          info=b"gdpr-blind-index:" + label.encode()).derive(self._key)
+            context = self._contexts[label] = hmac.new(subkey, digestmod=hashlib.sha256)
+        return context
+
+    def compute(self, value: Any, label: str,
+                normalizer: Callable[[Any], str] = normalize_search_value) -> Optional[str]:
+        if value is None:
+            return None
+        mac = self._context(label).copy()
+        mac.update(normalizer(value).encode("utf-8"))
+        return mac.hexdigest()[:self.length]
+
+    def batch(self, values: Iterable[Any], label: str,
+              normalizer: Callable[[Any], str] = normalize_search_value) -> List[Optional[str]]:
+        return [self.compute(value, label, normalizer) for value in values]
+
+
+_blind_index: Optional[BlindIndex] = None
+
+
+def get_blind_index() -> BlindIndex:
+    """Blind index di default: GDPR_BLIND_INDEX_KEY (fallback GDPR_ENCRYPTION_KEY)"""
+    global _blind_index
+    if _blind_index is None:
+        from core.config import settings
+        _blind_index = BlindIndex(settings.GDPR_BLIND_INDEX_KEY or settings.GDPR_ENCRYPTION_KEY)
+    return _blind_index
+
+
+def set_blind_index(index: Optional[BlindIndex]) -> None:
+    global _blind_index
+    _blind_index = index
+
+
+def blind_index_label(column) -> str:
+    tenant = getattr(column.type, "tenant_id", None)
+    return f"{tenant or '*'}:{column.table.name}.{column.name}"
+
+
+def blind_index_for(attribute, value: Any) -> Optional[str]:
+    """Valore da confrontare con la colonna blind index, es. `blind_index_for(User.email, email)`"""
+    column = attribute.property.columns[0] if hasattr(attribute, "property") else attribute
+    return get_blind_index().compute(value, blind_index_label(column), column.type.normalizer)
+
+
+class EncryptedString(TypeDecorator):
+    """
+    Colonna cifrata in modo trasparente (AES-GCM, envelope).
+
+        email = Column(EncryptedString(), nullable=False)
+
+    `tenant_id` fissa la data key della colonna; altrimenti, se la tabella
+    ha la colonna `tenant_column`, le scritture ORM usano la data key del
+    tenant della riga (default: chiave globale). I bulk insert/update Core
+    cifrano con la chiave della colonna: per dati di un tenant passare un
+    `Ciphertext` (`encrypt_for_column`).
+    `blind_index` è l'attributo (colonna indicizzata) che riceve l'HMAC del
+    valore a ogni assegnazione via ORM; i bulk insert/update Core devono
+    valorizzarlo con `blind_index_for`.
+    `context` (`tabella.colonna`, entra nell'AAD) viene assegnato quando la
+    colonna è aggiunta a una tabella.
+    """
+    impl = Text
+    cache_ok = True
+
+    def __init__(self, tenant_id: Optional[str] = None, blind_index: Optional[str] = None,
+                 normalizer: Callable[[Any], str] = normalize_search_value,
+                 tenant_column: Optional[str] = "tenant_id", context: Optional[str] = None, **kwargs):
+        self.tenant_id = tenant_id
+        self.blind_index = blind_index
+        self.normalizer = normalizer
+        self.tenant_column = tenant_column
+        self.context = context
+        super().__init__(**kwargs)
+
+    def row_tenant_column(self, table) -> Optional[str]:
+        """Colonna da cui leggere il tenant della riga (None: data key della colonna)"""
+        if self.tenant_id is None and self.tenant_column and self.tenant_column in table.c:
+            return self.tenant_column
+        return None
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return value
+        if isinstance(value, Ciphertext):
+            return str(value)  # cifrato per la riga in before_flush (o da encrypt_for_column)
+        return get_encryption_service().encrypt(value, self.tenant_id, self.context)
+
+    def process_result_value(self, value, dialect):
+        if not FieldEncryptionService.is_encrypted(value):
+            return value  # NULL, valori legacy in chiaro o già anonimizzati
+        return get_encryption_service().decrypt(value, self.context)
+
+
+def encrypt_for_column(column, value: Optional[str], tenant_id: Any = None) -> Optional[Ciphertext]:
+    """Ciphertext di `value` per `column` con la data key di `tenant_id` (scritture Core per tenant)"""
+    if value is None:
+        return None
+    return Ciphertext(get_encryption_service().encrypt(value, column.type.tenant_id or tenant_id,
+                                                       column.type.context))
+
+
+@event.listens_for(Column, "after_parent_attach")
+def _bind_encrypted_column(column, table):
+    """Contesto AAD `tabella.colonna`: copia del tipo, così ogni colonna ha il suo"""
+    if isinstance(column.type, EncryptedString) and isinstance(table, Table):
+        bound = column.type.copy()
+        bound.context = f"{table.name}.{column.name}"
+        column.type = bound
+
+
+def _attach_blind_index(class_, key: str, column) -> None:
+    label, target_attr = blind_index_label(column), column.type.blind_index
+    normalizer = column.type.normalizer
+
+    def update_blind_index(target, value, oldvalue, initiator):
+        if isinstance(value, Ciphertext):
+            return  # ciphertext già calcolato: l'indice va valorizzato dal chiamante
+        setattr(target, target_attr, get_blind_index().compute(value, label, normalizer))
+
+    event.listen(getattr(class_, key), "set", update_blind_index)
+
+
+_row_tenant_columns: "weakref.WeakKeyDictionary[Mapper, List[Tuple[str, str, Any]]]" = weakref.WeakKeyDictionary()
+_PENDING_PLAINTEXT = "gdpr_encrypted_plaintext"
+
+
+@event.listens_for(Mapper, "mapper_configured")
+def _setup_blind_indexes(mapper, class_):
+    """
+    Collega le colonne `EncryptedString(blind_index=...)` alla rispettiva
+    colonna indice e registra quelle cifrate con il tenant della riga.
+    """
+    row_tenant = []
+    for prop in mapper.column_attrs:
+        column = prop.columns[0]
+        if not isinstance(column.type, EncryptedString) or not isinstance(column.table, Table):
+            continue
+        tenant_column = column.type.row_tenant_column(column.table)
+        if tenant_column is not None:
+            tenant_prop = mapper.get_property_by_column(column.table.c[tenant_column])
+            row_tenant.append((prop.key, tenant_prop.key, column))
+        if column.type.blind_index:
+            if column.type.blind_index not in mapper.column_attrs:
+                raise ValueError(f"{class_.__name__}.{prop.key}: colonna blind index "
+                                 f"'{column.type.blind_index}' non definita")
+            _attach_blind_index(class_, prop.key, column)
+    if row_tenant:
+        _row_tenant_columns[mapper] = row_tenant
+
+
+@event.listens_for(Session, "before_flush")
+def _encrypt_with_row_tenant(session, flush_context, instances):
+    """Cifra i valori modificati con la data key del tenant della riga"""
+    pending = session.info.setdefault(_PENDING_PLAINTEXT, [])
+    for obj in list(session.new) + list(session.dirty):
+        state = inspect(obj)
+        for key, tenant_key, column in _row_tenant_columns.get(state.mapper, ()):
+            value = state.dict.get(key)
+            if not isinstance(value, str) or isinstance(value, Ciphertext) or not state.attrs[key].history.added:
+                continue
+            token = get_encryption_service().encrypt(value, getattr(obj, tenant_key), column.type.context)
+            state.dict[key] = Ciphertext(token)  # niente evento "set": il blind index resta quello del testo
+            pending.append((obj, key, value))
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _restore_plaintext(session, flush_context):
+    """Dopo il flush l'istanza torna a esporre il valore in chiaro"""
+    for obj, key, value in session.info.pop(_PENDING_PLAINTEXT, []):
+        set_committed_value(obj, key, value)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending_ciphertext(session, previous_transaction):
+    """Flush fallito: gli oggetti non ancora scritti riprendono il valore in chiaro"""
+    for obj, key, value in session.info.pop(_PENDING_PLAINTEXT, []):
+        state = inspect(obj)
+        if state.transient or state.pending:
+            state.dict[key] = value
@@ -1,5 +1,9 @@
+import uuid
+
 from core.database import SessionLocal
-from fastapi import Depends
+from fastapi import Depends, Header, Request
+
+TENANT_HEADER = "X-Tenant-ID"
 
 def get_db():
     db = SessionLocal()
@@ -7,3 +11,14 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_page_db(request: Request):
+    """Sessione solo per le risposte JSON: lo stream NDJSON (`format=ndjson`) apre la propria"""
+    if request.query_params.get("format") == "ndjson":
+        yield None
+        return
+    yield from get_db()
+
+def get_tenant_id(tenant_id: uuid.UUID = Header(..., alias=TENANT_HEADER)) -> uuid.UUID:
+    """Tenant della richiesta (header obbligatorio)"""
+    return tenant_id
@@ -67,17 +67,15 @@ class GDPRComplianceMonitor:
         pass
 
 # --- 3. Performance Monitoring for GDPR APIs ---
-class GDPRPerformanceMonitor:
-    def __init__(self):
-        self.redis = redis.Redis.from_url("redis://localhost:6379")
-    async def monitor_request(self, request: Request, call_next: Callable):
-        start_time = time.time()
-        response = await call_next(request)
-        process_time = time.time() - start_time
-        # ...existing code for logging and metrics...
-        return response
-    async def get_performance_report(self) -> Dict:
-        return {}
+# Modulo separato: il middleware di performance non deve importare questo
+# file (app Celery) al boot dei worker API
+from core.performance_monitor import (  # noqa: E402
+    GDPRPerformanceMonitor,
+    build_performance_report,
+    get_performance_metrics,
+    get_performance_monitor,
+    slo_threshold,
+)
 
 # --- 4. Automated Backup and Recovery ---
 class GDPRBackupManager:
@@ -112,10 +110,7 @@ async def get_compliance_dashboard():
     dashboard = GDPRComplianceDashboard()
     return await dashboard.get_real_time_metrics()
 
-@router.get("/monitoring/performance")
-async def get_performance_metrics():
-    monitor = GDPRPerformanceMonitor()
-    return await monitor.get_performance_report()
+router.add_api_route("/monitoring/performance", get_performance_metrics, methods=["GET"])
 
 @router.post("/backup/trigger")
 async def trigger_manual_backup(admin_id: str = Depends(lambda: "admin")):
@@ -0,0 +1,200 @@
+"""
+🩺 Health check in background con snapshot in cache
+
+Un task controlla DB, Redis (e altri check registrati) ogni
+`HEALTH_CHECK_INTERVAL` secondi, in parallelo e con timeout per dipendenza;
+`/health` serve l'ultimo snapshot senza I/O, `/health/deep` forza un giro.
+I provider (es. il plugin manager) aggiungono a ogni giro i check dei
+plugin (`BasePlugin.health_check()`), ognuno col proprio timeout.
+
+I check sincroni girano in thread: se un check è ancora appeso dal giro
+precedente il nuovo giro aspetta lo stesso future invece di aprire un altro
+thread (niente accumulo di thread bloccati su un DB irraggiungibile).
+"""
+import asyncio
+import inspect
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+HEALTHY = "healthy"
+UNHEALTHY = "unhealthy"
+
+# Un check è una callable (sync → thread, async → awaited) o `(callable, timeout)`
+Check = Union[Callable[[], Any], Tuple[Callable[[], Any], Optional[float]]]
+CheckProvider = Callable[[], Dict[str, Check]]
+
+
+def _consume_exception(future: asyncio.Future) -> None:
+    # Check scaduto e mai più atteso: evita "exception was never retrieved"
+    if not future.cancelled():
+        future.exception()
+
+
+class HealthProber:
+    def __init__(self, checks: Dict[str, Callable[[], Any]] = None, interval: float = None,
+                 timeout: float = None):
+        if checks is None or interval is None or timeout is None:
+            from core.config import settings
+            checks = default_checks(settings.REDIS_URL) if checks is None else checks
+            interval = settings.HEALTH_CHECK_INTERVAL if interval is None else interval
+            timeout = settings.HEALTH_CHECK_TIMEOUT if timeout is None else timeout
+        self.checks = checks
+        self.interval = interval
+        self.timeout = timeout
+        self.max_age = interval * 3
+        self.snapshot: Optional[Dict] = None
+        self._checked_at = 0.0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refresh: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self.providers: List[CheckProvider] = []
+
+    def add_provider(self, provider: CheckProvider) -> None:
+        """Sorgente di check aggiuntivi, letta a ogni giro (es. plugin caricati)"""
+        if provider not in self.providers:
+            self.providers.append(provider)
+
+    def remove_provider(self, provider: CheckProvider) -> None:
+        if provider in self.providers:
+            self.providers.remove(provider)
+
+    # ===== CHECK =====
+
+    async def _run_check(self, name: str, check: Callable[[], Any], timeout: float) -> Dict:
+        start = time.perf_counter()
+        future = self._inflight.get(name)
+        if future is None or future.done():
+            if inspect.iscoroutinefunction(check):
+                future = asyncio.ensure_future(check())
+            else:
+                future = asyncio.ensure_future(asyncio.to_thread(check))
+            future.add_done_callback(_consume_exception)
+            self._inflight[name] = future
+        try:
+            detail = await asyncio.wait_for(asyncio.shield(future), timeout)
+            result = {"status": HEALTHY, **(detail if isinstance(detail, dict) else {})}
+        except asyncio.TimeoutError:
+            result = {"status": UNHEALTHY, "error": f"timeout ({timeout}s)"}
+        except Exception as e:
+            result = {"status": UNHEALTHY, "error": str(e)}
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+
+    async def run_checks(self, checks: Dict[str, Check], timeout: float = None, prefix: str = "") -> Dict[str, Dict]:
+        """Esegue i check in parallelo, ognuno con il proprio timeout"""
+        default_timeout = self.timeout if timeout is None else timeout
+        jobs = []
+        for name, check in checks.items():
+            check, check_timeout = check if isinstance(check, tuple) else (check, None)
+            jobs.append(self._run_check(prefix + name, check, check_timeout or default_timeout))
+        results = await asyncio.gather(*jobs)
+        return dict(zip(checks, results))
+
+    def provider_checks(self) -> Dict[str, Check]:
+        checks: Dict[str, Check] = {}
+        for provider in self.providers:
+            try:
+                checks.update(provider())
+            except Exception as e:
+                logger.error(f"Health check provider fallito: {e}")
+        return checks
+
+    async def check_now(self) -> Dict:
+        """🔍 Giro completo (dipendenze e plugin in parallelo): aggiorna e ritorna lo snapshot"""
+        start = time.perf_counter()
+        results, plugins = await asyncio.gather(
+            self.run_checks(self.checks),
+            self.run_checks(self.provider_checks(), prefix="plugin:"),
+        )
+        healthy = all(r["status"] == HEALTHY for r in results.values())
+        for name, result in {**results, **plugins}.items():
+            if result["status"] == UNHEALTHY:
+                logger.error(f"Health check {name} fallito: {result.get('error')}")
+        self.snapshot = {
+            # Lo stato (e il 503 di /health) dipende solo dalle dipendenze core
+            "status": HEALTHY if healthy else "degraded",
+            "checked_at": datetime.utcnow().isoformat(),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+            "checks": results,
+            "plugins": plugins,
+        }
+        self._checked_at = time.monotonic()
+        return self.snapshot
+
+    async def get_snapshot(self) -> Dict:
+        """Snapshot in cache; se manca o è troppo vecchio un solo giro condiviso"""
+        if self.snapshot is None or time.monotonic() - self._checked_at > self.max_age:
+            if self._refresh is None or self._refresh.done():
+                self._refresh = asyncio.ensure_future(self.check_now())
+            await asyncio.shield(self._refresh)
+        return {**self.snapshot, "age_s": round(time.monotonic() - self._checked_at, 3)}
+
+    # ===== BACKGROUND =====
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.check_now()
+            except Exception as e:
+                logger.error(f"Health prober: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# ===== CHECK PREDEFINITI =====
+
+def check_database() -> Dict:
+    from sqlalchemy import text
+    from core.database import engine
+    # Connessione dal pool dell'engine, non una sessione nuova per probe
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    return {}
+
+
+_redis_clients: Dict[str, Any] = {}
+
+
+def redis_client(url: str, timeout: float = 2.0):
+    """Client Redis condiviso dai check (un pool per URL)"""
+    if url not in _redis_clients:
+        import redis
+        from core.metrics import watch_redis_pool
+        client = redis.Redis.from_url(url, socket_connect_timeout=timeout, socket_timeout=timeout)
+        watch_redis_pool("health", client.connection_pool)
+        _redis_clients[url] = client
+    return _redis_clients[url]
+
+
+def default_checks(redis_url: str) -> Dict[str, Callable[[], Any]]:
+    def check_redis() -> Dict:
+        redis_client(redis_url).ping()
+        return {}
+
+    return {"database": check_database, "redis": check_redis}
+
+
+_health_prober: Optional[HealthProber] = None
+
+
+def get_health_prober() -> HealthProber:
+    global _health_prober
+    if _health_prober is None:
+        _health_prober = HealthProber()
+    return _health_prober
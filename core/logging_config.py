@@ -1,58 +1,184 @@
+import atexit
+import copy
 import logging
 import json
+import os
+import queue
+import random
 import sys
-from datetime import datetime
-from core.config import settings
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from core.request_context import plugin_var, request_id_var, user_id_var
+
+try:
+    import orjson
+except ImportError:  # opzionale: fallback su json
+    orjson = None
+
+
+def _dumps(data: dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(data, default=str).decode()
+    return json.dumps(data, default=str, separators=(",", ":"))
+
+
+# Campi opzionali dei record (extra=...) copiati nel JSON se presenti
+_CONTEXT_FIELDS = ("request_id", "user_id", "plugin", "duration_ms")
+_GDPR_FIELDS = ("gdpr_operation", "data_subject_id")
+_SECURITY_FIELDS = ("security_event", "source_ip", "user_agent")
+
 
 class StructuredFormatter(logging.Formatter):
     """HOTFIX: Logging strutturato per monitoring."""
+
+    def __init__(self, static_fields: Optional[dict] = None):
+        super().__init__()
+        # Campi statici (servizio, ambiente, pid) calcolati una volta sola
+        self.static_fields = static_fields or {}
+        self._last_second = None
+        self._last_prefix = ""
+
+    def _timestamp(self, created: float) -> str:
+        """ISO 8601 UTC da record.created; la parte al secondo è in cache"""
+        second = int(created)
+        if second != self._last_second:
+            self._last_second = second
+            self._last_prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+        return f"{self._last_prefix}.{int((created - second) * 1_000_000):06d}"
+
     def format(self, record):
         log_entry = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": self._timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
             "module": record.module,
             "function": record.funcName,
-            "line": record.lineno
+            "line": record.lineno,
+            **self.static_fields,
         }
-        # Request correlation ID
-        if hasattr(record, 'request_id'):
-            log_entry["request_id"] = record.request_id
-        # User context
-        if hasattr(record, 'user_id'):
-            log_entry["user_id"] = record.user_id
-        # Plugin context
-        if hasattr(record, 'plugin'):
-            log_entry["plugin"] = record.plugin
+        # Request correlation ID / user / plugin / performance
+        for name in _CONTEXT_FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                log_entry[name] = value
         # GDPR context
         if hasattr(record, 'gdpr_operation'):
-            log_entry["gdpr_operation"] = record.gdpr_operation
-            log_entry["data_subject_id"] = getattr(record, 'data_subject_id', None)
+            for name in _GDPR_FIELDS:
+                log_entry[name] = getattr(record, name, None)
         # Security context
         if hasattr(record, 'security_event'):
-            log_entry["security_event"] = record.security_event
-            log_entry["source_ip"] = getattr(record, 'source_ip', None)
-            log_entry["user_agent"] = getattr(record, 'user_agent', None)
-        # Exception handling
+            for name in _SECURITY_FIELDS:
+                log_entry[name] = getattr(record, name, None)
+        # Exception handling (exc_text: già renderizzato dal QueueHandler)
         if record.exc_info:
             log_entry["exception"] = self.formatException(record.exc_info)
-        # Performance metrics
-        if hasattr(record, 'duration_ms'):
-            log_entry["duration_ms"] = record.duration_ms
-        return json.dumps(log_entry)
+        elif record.exc_text:
+            log_entry["exception"] = record.exc_text
+        return _dumps(log_entry)
+
+
+class ContextFilter(logging.Filter):
+    """Aggiunge request_id/user_id/plugin dai contextvars (se non già passati come extra)"""
+
+    def filter(self, record):
+        if getattr(record, "request_id", None) is None:
+            record.request_id = request_id_var.get()
+        if getattr(record, "user_id", None) is None:
+            record.user_id = user_id_var.get()
+        if getattr(record, "plugin", None) is None:
+            record.plugin = plugin_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Campionamento dei record ad alto volume: DEBUG e security event sotto
+    WARNING vengono tenuti con probabilità `debug_rate` / `security_rate`.
+    WARNING ed ERROR non vengono mai scartati.
+    """
+
+    def __init__(self, debug_rate: float = 1.0, security_rate: float = 1.0):
+        super().__init__()
+        self.debug_rate = debug_rate
+        self.security_rate = security_rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        if hasattr(record, "security_event"):
+            rate = self.security_rate
+        elif record.levelno <= logging.DEBUG:
+            rate = self.debug_rate
+        else:
+            return True
+        return rate >= 1.0 or random.random() < rate
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    QueueHandler che non formatta nel thread chiamante: risolve solo
+    messaggio ed eccezione (non serializzabili in modo sicuro più tardi);
+    il JSON viene prodotto dal QueueListener in background.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: Optional[QueueListener] = None
+
+
+def shutdown_logging():
+    """Svuota la coda e ferma il listener (chiamata anche da atexit)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
 
 def setup_logging():
-    """HOTFIX: Setup logging sicuro."""
+    """HOTFIX: Setup logging sicuro, non bloccante (QueueHandler + QueueListener)."""
+    from core.config import settings
+    shutdown_logging()
+    global _listener
     root_logger = logging.getLogger()
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setFormatter(StructuredFormatter())
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if settings.LOG_JSON:
+        stream_handler.setFormatter(StructuredFormatter({
+            "service": settings.PROJECT_NAME,
+            "environment": settings.ENVIRONMENT,
+            "pid": os.getpid(),
+        }))
+    else:
+        stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = ContextQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(settings.LOG_DEBUG_SAMPLE_RATE, settings.LOG_SECURITY_SAMPLE_RATE))
+    queue_handler.addFilter(ContextFilter())
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
     if settings.ENVIRONMENT == "production":
-        logging.basicConfig(level=logging.WARNING, handlers=[handler])
+        level = logging.WARNING
     else:
-        logging.basicConfig(level=logging.INFO, handlers=[handler])
+        level = getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO)
+    root_logger.setLevel(level)
+    root_logger.addHandler(queue_handler)
     logging.getLogger("plugins.gdpr_plugin").setLevel(logging.INFO)
     logging.getLogger("plugins.security_plugin").setLevel(logging.WARNING)
     return logging.getLogger(__name__)
+
+
+atexit.register(shutdown_logging)
@@ -3,26 +3,35 @@
 Versione: 2.0.0 - WSL FIXED
 """
 
-from fastapi import FastAPI, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from contextlib import asynccontextmanager
-import logging
-import sys
-from pathlib import Path
-
-# Core imports
-from core.config import settings
-
-# Core API (always available)
-from core.api.health import router as health_router
-
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
+# Profilo di avvio: primo import, così misura anche quelli successivi
+from core.startup_profiler import profiler
+profiler.start_import_tracking()
+
+with profiler.span("imports.framework"):
+    from fastapi import FastAPI, Request
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import JSONResponse
+    from contextlib import asynccontextmanager
+    import asyncio
+    import logging
+    from pathlib import Path
+
+# Core imports (validazione Settings all'import di core.config)
+with profiler.span("settings"):
+    from core.config import settings
+    from core.config_snapshot import get_settings
+
+with profiler.span("imports.core"):
+    # Core API (always available)
+    from core.api.health import router as health_router
+
+    # Configure logging (non bloccante: QueueHandler + listener in background)
+    from core.logging_config import setup_logging
+    from core.request_context import REQUEST_ID_HEADER, RequestContextMiddleware
+    from core.metrics import MetricsMiddleware, metrics_endpoint, watch_db_engine
+
+with profiler.span("logging"):
+    setup_logging()
 
 logger = logging.getLogger(__name__)
 
@@ -36,16 +45,37 @@ async def lifespan(app: FastAPI):
     logger.info(f"🔌 Enabled Plugins: {settings.ENABLED_PLUGINS}")
     
     # Try to initialize plugin system
-    try:
-        from plugins.secure_plugin_manager import SecurePluginManager
-        plugin_manager = SecurePluginManager(app)
-        await plugin_manager.load_enabled_plugins(settings.ENABLED_PLUGINS)
-        app.state.plugin_manager = plugin_manager
-        logger.info("✅ Secure plugin system initialized successfully")
-    except Exception as e:
-        logger.warning(f"⚠️ Plugin system not available: {e}")
-        # Load plugins manually as fallback
-        await load_plugins_fallback(app)
+    with profiler.span("lifespan"):
+        if settings.STARTUP_WARM_CONNECTIONS:
+            await warm_connections()
+        
+        with profiler.span("plugins", enabled=list(settings.ENABLED_PLUGINS), lazy=settings.PLUGIN_LAZY_LOADING):
+            try:
+                from plugins.secure_plugin_manager import SecurePluginManager
+                from core.config_snapshot import get_plugin_configs
+                plugin_manager = SecurePluginManager(app, plugin_configs=get_plugin_configs())
+                await plugin_manager.load_enabled_plugins(settings.ENABLED_PLUGINS, lazy=settings.PLUGIN_LAZY_LOADING)
+                app.state.plugin_manager = plugin_manager
+                if settings.PLUGIN_LAZY_LOADING and settings.PLUGIN_LAZY_WARMUP_DELAY is not None:
+                    app.state.plugin_warmup = asyncio.create_task(plugin_manager.warm_up(settings.PLUGIN_LAZY_WARMUP_DELAY))
+                logger.info("✅ Secure plugin system initialized successfully")
+            except Exception as e:
+                logger.warning(f"⚠️ Plugin system not available: {e}")
+                # Load plugins manually as fallback
+                await load_plugins_fallback(app)
+    
+    # Health check in background: /health serve lo snapshot in cache
+    from core.health_prober import get_health_prober
+    if hasattr(app.state, 'plugin_manager'):
+        get_health_prober().add_provider(app.state.plugin_manager.health_checks)
+    get_health_prober().start()
+    
+    profiler.mark_ready()
+    if settings.STARTUP_PROFILE_PATH:
+        try:
+            await asyncio.to_thread(profiler.write_report, settings.STARTUP_PROFILE_PATH)
+        except OSError as e:
+            logger.warning(f"⚠️ Profilo di avvio non salvato: {e}")
     
     logger.info("🎉 Application startup completed successfully")
     
@@ -53,10 +83,35 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("🔄 Shutting down application...")
+    if hasattr(app.state, 'plugin_warmup'):
+        app.state.plugin_warmup.cancel()
+    await get_health_prober().stop()
     if hasattr(app.state, 'plugin_manager'):
+        get_health_prober().remove_provider(app.state.plugin_manager.health_checks)
         await app.state.plugin_manager.cleanup_all()
     logger.info("👋 Application shutdown completed")
 
+def _ping_database():
+    from sqlalchemy import text
+    from core.database import engine
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+def _ping_redis():
+    import redis
+    redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=2, socket_timeout=2).ping()
+
+async def warm_connections(timeout: float = 5.0):
+    """Prima connessione a DB e Redis durante il boot (tempi nel profilo di avvio)"""
+    for name, ping in (("db.connect", _ping_database), ("redis.connect", _ping_redis)):
+        with profiler.span(name) as span:
+            try:
+                await asyncio.wait_for(asyncio.to_thread(ping), timeout)
+            except Exception as e:
+                # Non bloccante: l'health check segnalerà il servizio non raggiungibile
+                span.attrs["error"] = f"{type(e).__name__}: {e}"
+                logger.warning(f"⚠️ {name} fallita all'avvio: {e}")
+
 async def load_plugins_fallback(app: FastAPI):
     """Fallback plugin loading without SecurePluginManager"""
     logger.info("🔌 Loading plugins in fallback mode...")
@@ -85,26 +140,9 @@ async def load_plugins_fallback(app: FastAPI):
                 "last_updated": "2024-01-01T10:00:00"
             }
             
-        @gdpr_router.get("/export")
-        async def export_user_data(user_id: int, format: str = "json"):
-            """Export user data (GDPR Article 20)"""
-            from datetime import datetime
-            return {
-                "user_id": user_id,
-                "export_format": format,
-                "user_profile": {
-                    "id": user_id,
-                    "email": f"user{user_id}@demo.com",
-                    "name": f"Demo User {user_id}",
-                    "created_at": "2024-01-01T10:00:00"
-                },
-                "consents": [
-                    {"type": "marketing", "accepted": True, "timestamp": "2024-01-01T10:00:00"},
-                    {"type": "analytics", "accepted": False, "timestamp": "2024-01-01T10:00:00"}
-                ],
-                "exported_at": datetime.now().isoformat(),
-                "gdpr_notice": "This export contains all personal data as per GDPR Article 20."
-            }
+        # Export (job, polling, download), cancellazione e audit: router reale del plugin
+        from plugins.gdpr_plugin.api.router import router as gdpr_api_router
+        gdpr_router.include_router(gdpr_api_router)
             
         @gdpr_router.post("/consent")
         async def create_consent(user_id: int, consent_type: str, accepted: bool):
@@ -193,18 +231,50 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[REQUEST_ID_HEADER],
 )
 
+# Middleware dei plugin (slot del manager, sostituibili con reload_plugin)
+from plugins.plugin_slots import PluginMiddlewareDispatcher
+app.add_middleware(PluginMiddlewareDispatcher)
+
+# Lazy loading: il primo accesso a un prefisso di un plugin LAZY lo carica
+from plugins.secure_plugin_manager import LazyPluginMiddleware
+app.add_middleware(LazyPluginMiddleware)
+
+# Metriche Prometheus: latenza per route templata, richieste in corso, pool
+if settings.METRICS_ENABLED:
+    from core.database import engine
+    watch_db_engine("default", engine)
+    app.add_middleware(MetricsMiddleware, skip_paths=(settings.METRICS_ENDPOINT,))
+    app.add_route(settings.METRICS_ENDPOINT, metrics_endpoint, include_in_schema=False)
+
+# Latenze p50/p95/p99 delle API GDPR (sketch per minuto aggregati in Redis).
+# Solo l'endpoint di performance: il resto del router ops è ancora scheletro.
+if settings.GDPR_PERF_MONITOR_ENABLED:
+    from starlette.middleware.base import BaseHTTPMiddleware
+    from core.performance_monitor import get_performance_metrics, get_performance_monitor
+    app.add_middleware(BaseHTTPMiddleware, dispatch=get_performance_monitor().monitor_request)
+    app.add_api_route("/api/gdpr/ops/monitoring/performance", get_performance_metrics, methods=["GET"], tags=["GDPR Operations"])
+
+# Correlation ID (aggiunto per ultimo: è il middleware più esterno)
+app.add_middleware(RequestContextMiddleware)
+
 # Include core health router
 app.include_router(health_router)
 
+# Timeline di avvio (solo fuori produzione o in debug)
+if settings.DEBUG or settings.ENVIRONMENT != "production":
+    from core.api.debug import router as debug_router
+    app.include_router(debug_router)
+
 # Root endpoint
 @app.get("/")
 async def root():
     return {
         "message": f"🛡️ {settings.PROJECT_NAME} - GDPR Compliant",
         "template": settings.PROJECT_TEMPLATE,
-        "plugins": settings.ENABLED_PLUGINS,
+        "plugins": list(get_settings().ENABLED_PLUGINS),
         "docs": "/docs",
         "health": "/health"
     }
@@ -217,7 +287,7 @@ async def global_exception_handler(request: Request, exc: Exception):
         status_code=500,
         content={
             "error": "Internal Server Error",
-            "detail": str(exc) if settings.DEBUG else "An error occurred"
+            "detail": str(exc) if get_settings().DEBUG else "An error occurred"
         }
     )
 
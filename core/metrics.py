@@ -0,0 +1,181 @@
+"""
+📊 Metriche Prometheus (prometheus_client opzionale)
+
+- `MetricsMiddleware` (ASGI puro): latenza per route *templata*
+  (`/users/{user_id}`, mai il path reale → cardinalità limitata), richieste
+  in corso, dimensione delle risposte
+- pool DB (SQLAlchemy) e Redis registrati con `watch_db_engine` /
+  `watch_redis_pool`, aggiornati al più una volta al secondo
+- contatori dei blocchi di sicurezza (`record_security_block`)
+
+Multi-worker (uvicorn/gunicorn): impostare `PROMETHEUS_MULTIPROC_DIR` prima
+dell'avvio; `/metrics` aggrega i file di tutti i worker.
+Senza prometheus_client ogni funzione è un no-op.
+"""
+import os
+import time
+from typing import Dict, Optional
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        CollectorRegistry,
+        Counter,
+        Gauge,
+        Histogram,
+        generate_latest,
+        multiprocess,
+    )
+except ImportError:  # opzionale
+    CollectorRegistry = None
+
+UNMATCHED_ROUTE = "<unmatched>"
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+_POOL_REFRESH_SECONDS = 1.0
+
+_db_engines: Dict[str, object] = {}
+_redis_pools: Dict[str, object] = {}
+_last_pool_refresh = 0.0
+
+if CollectorRegistry is not None:
+    REQUEST_LATENCY = Histogram(
+        "http_request_duration_seconds", "Latenza delle richieste HTTP",
+        ["method", "route", "status"], buckets=_LATENCY_BUCKETS,
+    )
+    RESPONSE_SIZE = Histogram(
+        "http_response_size_bytes", "Dimensione del body delle risposte",
+        ["method", "route"], buckets=_SIZE_BUCKETS,
+    )
+    IN_FLIGHT = Gauge(
+        "http_requests_in_progress", "Richieste HTTP in corso",
+        ["method"], multiprocess_mode="livesum",
+    )
+    SECURITY_BLOCKS = Counter(
+        "security_blocked_requests_total", "Richieste bloccate dai middleware di sicurezza",
+        ["reason"],
+    )
+    DB_POOL = Gauge(
+        "db_pool_connections", "Connessioni del pool SQLAlchemy",
+        ["pool", "state"], multiprocess_mode="livesum",
+    )
+    REDIS_POOL = Gauge(
+        "redis_pool_connections", "Connessioni del pool Redis",
+        ["pool", "state"], multiprocess_mode="livesum",
+    )
+
+
+def metrics_available() -> bool:
+    return CollectorRegistry is not None
+
+
+def watch_db_engine(name: str, engine) -> None:
+    _db_engines[name] = engine
+
+
+def watch_redis_pool(name: str, pool) -> None:
+    _redis_pools[name] = pool
+
+
+def record_security_block(reason: str) -> None:
+    """Rate limit, bot, IP bloccato...: `reason` è un valore di un insieme chiuso"""
+    if CollectorRegistry is not None:
+        SECURITY_BLOCKS.labels(reason=reason).inc()
+
+
+def refresh_pool_metrics(force: bool = False) -> None:
+    """Legge lo stato dei pool registrati (throttled: al più 1/s per processo)"""
+    global _last_pool_refresh
+    if CollectorRegistry is None:
+        return
+    now = time.monotonic()
+    if not force and now - _last_pool_refresh < _POOL_REFRESH_SECONDS:
+        return
+    _last_pool_refresh = now
+    for name, engine in _db_engines.items():
+        pool = engine.pool
+        # StaticPool/NullPool non espongono i contatori
+        for state, reader in (("size", "size"), ("checked_out", "checkedout"), ("overflow", "overflow"), ("checked_in", "checkedin")):
+            if hasattr(pool, reader):
+                DB_POOL.labels(pool=name, state=state).set(getattr(pool, reader)())
+    for name, pool in _redis_pools.items():
+        created = getattr(pool, "_created_connections", 0)
+        idle = len(getattr(pool, "_available_connections", ()))
+        REDIS_POOL.labels(pool=name, state="created").set(created)
+        REDIS_POOL.labels(pool=name, state="idle").set(idle)
+        REDIS_POOL.labels(pool=name, state="in_use").set(len(getattr(pool, "_in_use_connections", ())))
+
+
+def route_template(scope) -> str:
+    """Path templato della route risolta da Starlette (o `<unmatched>`)"""
+    # FastAPI recente: i router inclusi tengono il path senza prefisso,
+    # quello completo è nel contesto effettivo della route
+    route = (scope.get("fastapi") or {}).get("effective_route_context") or scope.get("route")
+    path = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if not path:
+        return UNMATCHED_ROUTE
+    # Dentro un Mount il path della route è relativo al root_path
+    return scope.get("root_path", "") + path
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: nessun lavoro per-richiesta oltre a due letture di clock"""
+
+    def __init__(self, app, skip_paths=("/metrics",)):
+        self.app = app
+        self.skip_paths = frozenset(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if CollectorRegistry is None or scope["type"] != "http" or scope["path"] in self.skip_paths:
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        in_flight = IN_FLIGHT.labels(method=method)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight.dec()
+            route = route_template(scope)
+            REQUEST_LATENCY.labels(method=method, route=route, status=str(status)).observe(elapsed)
+            RESPONSE_SIZE.labels(method=method, route=route).observe(size)
+            refresh_pool_metrics()
+
+
+def render_metrics() -> Optional[bytes]:
+    """Esposizione testuale; in multiprocess aggrega i file dei worker"""
+    if CollectorRegistry is None:
+        return None
+    refresh_pool_metrics(force=True)
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+
+async def metrics_endpoint(request):
+    from starlette.responses import Response
+    payload = render_metrics()
+    if payload is None:
+        return Response("prometheus_client non installato\n", status_code=503, media_type="text/plain")
+    return Response(payload, media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead(pid: int) -> None:
+    """Hook gunicorn `child_exit`: rimuove i gauge live del worker terminato"""
+    if CollectorRegistry is not None and os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
@@ -1,18 +1,29 @@
-from sqlalchemy import Column, DateTime, String
+from sqlalchemy import Column, DateTime, String, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base
 import uuid
 import datetime
+from core.database.base import register_personal_data_model
 
 Base = declarative_base()
 
 class BaseModel(Base):
     __abstract__ = True
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    # NOT NULL: è la prima colonna del cursore keyset (created_at, id)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     tenant_id = Column(UUID(as_uuid=True), nullable=False, index=True)
 
+    # GDPR: colonna che collega la riga all'interessato (vedi PersonalDataRegistry)
+    __gdpr_subject__ = None
+    # GDPR: strategie di erasure per colonna (vedi gdpr_plugin.utils.anonymization)
+    __anonymize__ = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        register_personal_data_model(cls)
+
     @classmethod
     def for_tenant(cls, session, tenant_id):
         return session.query(cls).filter_by(tenant_id=tenant_id)
@@ -1,7 +1,9 @@
-from sqlalchemy import Column, String, Text
+from sqlalchemy import Column, Index, String, Text
 from core.models.base import BaseModel
 
 class Content(BaseModel):
     __tablename__ = "contents"
+    # Paginazione keyset per tenant: WHERE tenant_id = ? AND (created_at, id) > cursore
+    __table_args__ = (Index("ix_contents_tenant_created_id", "tenant_id", "created_at", "id"),)
     title = Column(String, nullable=False)
     body = Column(Text, nullable=False)
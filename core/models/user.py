@@ -1,7 +1,16 @@
-from sqlalchemy import Column, String
+from sqlalchemy import Column, Index, String
 from core.models.base import BaseModel
+from core.database.types import EncryptedString
 
 class User(BaseModel):
     __tablename__ = "users"
-    email = Column(String, unique=True, index=True, nullable=False)
+    # Paginazione keyset per tenant: WHERE tenant_id = ? AND (created_at, id) > cursore
+    __table_args__ = (Index("ix_users_tenant_created_id", "tenant_id", "created_at", "id"),)
+    __gdpr_subject__ = "id"
+    __gdpr_export_name__ = "user_profile"
+    # Email cifrata: pseudonimo (ri-cifrato), un hash lavorerebbe sul ciphertext
+    __anonymize__ = {"email": "pseudonym", "email_bidx": "null", "name": "pseudonym"}
+    # 🔐 Email cifrata (AES-GCM); ricerche e unicità tramite il blind index
+    email = Column(EncryptedString(blind_index="email_bidx"), nullable=False)
+    email_bidx = Column(String(64), unique=True, index=True)
     name = Column(String, nullable=False)
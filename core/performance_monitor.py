@@ -0,0 +1,174 @@
+"""
+⏱️ Monitoraggio performance delle API GDPR
+
+Latenze per operazione in sketch per minuto aggregati in Redis; report
+p50/p95/p99 con flag SLO su `/api/gdpr/ops/monitoring/performance`.
+"""
+import asyncio
+import fnmatch
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+import redis
+from fastapi import HTTPException, Query, Request
+
+from core.metrics import route_template
+from core.utils.latency_sketch import LatencySketch
+
+logger = logging.getLogger(__name__)
+
+PERF_KEY_PREFIX = "gdpr:perf"
+PERF_QUANTILES = (0.5, 0.95, 0.99)
+PERF_REDIS_TIMEOUT = 2.0
+
+
+def slo_threshold(operation: str, slo_p95_ms: Dict[str, float]) -> Optional[float]:
+    """Soglia p95 del pattern fnmatch più specifico (più lungo) che corrisponde"""
+    matches = [pattern for pattern in slo_p95_ms if fnmatch.fnmatchcase(operation, pattern)]
+    return slo_p95_ms[max(matches, key=len)] if matches else None
+
+
+def build_performance_report(sketches: Dict[str, LatencySketch], slo_p95_ms: Dict[str, float], window_minutes: int) -> Dict:
+    operations = {}
+    for operation, sketch in sorted(sketches.items()):
+        q = sketch.quantiles(PERF_QUANTILES)
+        threshold = slo_threshold(operation, slo_p95_ms)
+        operations[operation] = {
+            "count": sketch.count,
+            "p50_ms": round(q[0.5], 2),
+            "p95_ms": round(q[0.95], 2),
+            "p99_ms": round(q[0.99], 2),
+            "slo_p95_ms": threshold,
+            "slo_breached": threshold is not None and q[0.95] > threshold,
+        }
+    return {
+        "window_minutes": window_minutes,
+        "generated_at": datetime.utcnow().isoformat(),
+        "operations": operations,
+        "slo_breaches": [op for op, stats in operations.items() if stats["slo_breached"]],
+    }
+
+
+class GDPRPerformanceMonitor:
+    """
+    Latenze per operazione GDPR ("METHOD /route/{templata}") in sketch per
+    minuto. Ogni worker accumula in memoria e ogni `flush_interval` secondi
+    somma i bucket in Redis (HINCRBY): i worker si fondono da soli.
+    Il flush gira in background (uno alla volta), mai dentro una richiesta.
+    """
+
+    def __init__(self, redis_client=None, route_prefix: str = "/api/gdpr", flush_interval: float = None,
+                 retention_minutes: int = None, slo_p95_ms: Dict[str, float] = None):
+        if None in (redis_client, flush_interval, retention_minutes, slo_p95_ms):
+            from core.config import settings
+            redis_client = redis_client or redis.Redis.from_url(
+                settings.REDIS_URL, socket_connect_timeout=PERF_REDIS_TIMEOUT, socket_timeout=PERF_REDIS_TIMEOUT)
+            flush_interval = settings.GDPR_PERF_FLUSH_INTERVAL if flush_interval is None else flush_interval
+            retention_minutes = retention_minutes or settings.GDPR_PERF_RETENTION_MINUTES
+            slo_p95_ms = settings.GDPR_PERF_SLO_P95_MS if slo_p95_ms is None else slo_p95_ms
+        self.redis = redis_client
+        self.route_prefix = route_prefix
+        self.flush_interval = flush_interval
+        self.retention_minutes = retention_minutes
+        self.slo_p95_ms = slo_p95_ms
+        self._pending: Dict[tuple, LatencySketch] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def record(self, operation: str, duration_ms: float, now: float = None) -> None:
+        minute = int((now or time.time()) // 60)
+        with self._lock:
+            sketch = self._pending.get((operation, minute))
+            if sketch is None:
+                sketch = self._pending[(operation, minute)] = LatencySketch()
+            sketch.add(duration_ms)
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        ttl = (self.retention_minutes + 2) * 60
+        pipe = self.redis.pipeline(transaction=False)
+        for (operation, minute), sketch in pending.items():
+            key = f"{PERF_KEY_PREFIX}:{minute}:{operation}"
+            for bucket, n in sketch.buckets.items():
+                pipe.hincrby(key, bucket, n)
+            pipe.expire(key, ttl)
+            pipe.sadd(f"{PERF_KEY_PREFIX}:{minute}:ops", operation)
+            pipe.expire(f"{PERF_KEY_PREFIX}:{minute}:ops", ttl)
+        pipe.execute()
+
+    async def monitor_request(self, request: Request, call_next: Callable):
+        start_time = time.perf_counter()
+        try:
+            return await call_next(request)
+        finally:
+            # Anche le richieste fallite (eccezione non gestita) contano nelle latenze
+            process_time = time.perf_counter() - start_time
+            route = route_template(request.scope)
+            if route.startswith(self.route_prefix):
+                self.record(f"{request.method} {route}", process_time * 1000)
+                if time.monotonic() - self._last_flush >= self.flush_interval:
+                    self.schedule_flush()
+
+    def schedule_flush(self) -> None:
+        """Flush in background; nessun nuovo flush finché il precedente è in corso"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._background_flush())
+
+    async def _background_flush(self) -> None:
+        try:
+            await asyncio.to_thread(self.flush)
+        except Exception as e:
+            # Fail open: le metriche non devono mai rompere le richieste
+            logger.warning(f"GDPR performance flush failed: {e}")
+
+    def window_sketches(self, window_minutes: int) -> Dict[str, LatencySketch]:
+        """Fonde i minuti [now - window, now] di tutti i worker"""
+        current = int(time.time() // 60)
+        minutes = range(current - window_minutes + 1, current + 1)
+        pipe = self.redis.pipeline(transaction=False)
+        for minute in minutes:
+            pipe.smembers(f"{PERF_KEY_PREFIX}:{minute}:ops")
+        keys = [
+            (op.decode() if isinstance(op, bytes) else op, minute)
+            for minute, ops in zip(minutes, pipe.execute())
+            for op in ops
+        ]
+        pipe = self.redis.pipeline(transaction=False)
+        for operation, minute in keys:
+            pipe.hgetall(f"{PERF_KEY_PREFIX}:{minute}:{operation}")
+        sketches: Dict[str, LatencySketch] = {}
+        for (operation, _), counts in zip(keys, pipe.execute()):
+            sketches.setdefault(operation, LatencySketch()).merge_counts(counts)
+        return sketches
+
+    async def get_performance_report(self, window_minutes: int = 5) -> Dict:
+        window_minutes = max(1, min(window_minutes, self.retention_minutes))
+        await asyncio.to_thread(self.flush)
+        sketches = await asyncio.to_thread(self.window_sketches, window_minutes)
+        return build_performance_report(sketches, self.slo_p95_ms, window_minutes)
+
+
+_performance_monitor: Optional[GDPRPerformanceMonitor] = None
+
+
+def get_performance_monitor() -> GDPRPerformanceMonitor:
+    global _performance_monitor
+    if _performance_monitor is None:
+        _performance_monitor = GDPRPerformanceMonitor()
+    return _performance_monitor
+
+
+async def get_performance_metrics(window_minutes: int = Query(5, ge=1, le=1440)):
+    """p50/p95/p99 per operazione GDPR sulla finestra richiesta, con flag SLO"""
+    try:
+        return await get_performance_monitor().get_performance_report(window_minutes)
+    except redis.RedisError:
+        raise HTTPException(503, "Performance metrics store unavailable")
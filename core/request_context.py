@@ -0,0 +1,160 @@
+"""
+Request context condiviso via contextvars.
+
+`request_id` e `user_id` seguono la richiesta attraverso await e task
+asyncio; il logging li aggiunge a ogni record senza doverli passare come
+`extra`.
+
+- `RequestContextMiddleware` (ASGI puro) legge o genera `X-Request-ID` e
+  lo restituisce nella risposta
+- `install_celery_propagation` inoltra il contesto negli header dei task
+  Celery: i job in background loggano con l'ID della richiesta d'origine
+"""
+import re
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+REQUEST_ID_HEADER = "X-Request-ID"
+USER_ID_HEADER = "user-id"
+_USER_ID_HEADER_RAW = USER_ID_HEADER.encode("latin-1")
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+user_id_var: ContextVar[Optional[str]] = ContextVar("user_id", default=None)
+plugin_var: ContextVar[Optional[str]] = ContextVar("plugin", default=None)
+
+
+def get_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+def get_user_id() -> Optional[str]:
+    return user_id_var.get()
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+def get_context() -> Dict[str, str]:
+    """Campi valorizzati del contesto corrente"""
+    context = {}
+    for name, var in (("request_id", request_id_var), ("user_id", user_id_var), ("plugin", plugin_var)):
+        value = var.get()
+        if value is not None:
+            context[name] = value
+    return context
+
+
+def set_request_context(request_id: Optional[str] = None, user_id: Optional[str] = None) -> tuple:
+    """Imposta il contesto; restituisce i token per `reset_request_context`"""
+    return request_id_var.set(request_id), user_id_var.set(None if user_id is None else str(user_id))
+
+
+def reset_request_context(tokens: tuple) -> None:
+    request_token, user_token = tokens
+    user_id_var.reset(user_token)
+    request_id_var.reset(request_token)
+
+
+@contextmanager
+def request_context(request_id: Optional[str] = None, user_id: Optional[str] = None):
+    """Contesto per job e script: `with request_context(request_id=job_id): ...`"""
+    tokens = set_request_context(request_id, user_id)
+    try:
+        yield
+    finally:
+        reset_request_context(tokens)
+
+
+@contextmanager
+def plugin_context(plugin: str):
+    """Log emessi durante load/init di un plugin con il campo `plugin`"""
+    token = plugin_var.set(plugin)
+    try:
+        yield
+    finally:
+        plugin_var.reset(token)
+
+
+# ===== ASGI =====
+
+class RequestContextMiddleware:
+    """
+    Middleware ASGI: request_id dall'header `X-Request-ID` (se valido) o
+    generato, user_id dall'header `user-id`. Il contesto vale per tutta la
+    richiesta ed è esposto anche in `request.state.request_id`.
+    """
+
+    def __init__(self, app, header_name: str = REQUEST_ID_HEADER):
+        self.app = app
+        self.header_name = header_name.lower().encode("latin-1")
+        self._response_header = header_name.encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+
+        request_id = user_id = None
+        for name, value in scope.get("headers", ()):
+            if name == self.header_name:
+                candidate = value.decode("latin-1")
+                if _VALID_REQUEST_ID.match(candidate):
+                    request_id = candidate
+            elif name == _USER_ID_HEADER_RAW:
+                user_id = value.decode("latin-1")[:128]
+        request_id = request_id or new_request_id()
+        scope.setdefault("state", {})["request_id"] = request_id
+        header = (self._response_header, request_id.encode("latin-1"))
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [header]
+            await send(message)
+
+        tokens = set_request_context(request_id, user_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            reset_request_context(tokens)
+
+
+# ===== CELERY =====
+
+def _inject_task_headers(headers=None, **kwargs):
+    """before_task_publish: contesto corrente negli header del messaggio"""
+    if headers is None:
+        return
+    request_id, user_id = request_id_var.get(), user_id_var.get()
+    if request_id is not None:
+        headers.setdefault("request_id", request_id)
+    if user_id is not None:
+        headers.setdefault("user_id", user_id)
+
+
+def _enter_task_context(task_id=None, task=None, **kwargs):
+    """task_prerun: ripristina il contesto della richiesta d'origine (o usa il task id)"""
+    request = getattr(task, "request", None)
+    request_id = getattr(request, "request_id", None) or task_id
+    user_id = getattr(request, "user_id", None)
+    if request is not None:
+        request._request_context_tokens = set_request_context(request_id, user_id)
+
+
+def _exit_task_context(task=None, **kwargs):
+    request = getattr(task, "request", None)
+    tokens = getattr(request, "_request_context_tokens", None)
+    if tokens is not None:
+        reset_request_context(tokens)
+        request._request_context_tokens = None
+
+
+def install_celery_propagation() -> None:
+    """Collega i signal Celery (idempotente: weak=False + dispatch_uid)"""
+    from celery import signals
+    signals.before_task_publish.connect(_inject_task_headers, weak=False, dispatch_uid="request_context.publish")
+    signals.task_prerun.connect(_enter_task_context, weak=False, dispatch_uid="request_context.prerun")
+    signals.task_postrun.connect(_exit_task_context, weak=False, dispatch_uid="request_context.postrun")
@@ -25,8 +25,9 @@ class GDPRRequestValidator:
         return user_id
     
     @staticmethod
-    def validate_export_format(format: str):
-        allowed = ['json', 'csv', 'xml']
+    def validate_export_format(format: str, allowed=('json', 'csv', 'xml')):
+        """`allowed`: formati registrati (es. `export_service.available_formats()` dal plugin GDPR)"""
+        allowed = list(allowed)
         if format not in allowed:
             raise HTTPException(400, f"Format must be one of: {allowed}")
         return format
@@ -54,36 +55,34 @@ class GDPRRateLimitor:
 
 # 3. Tamper-Proof Audit Logs
 class TamperProofAuditLog:
-    def __init__(self):
-        self.last_hash = "0" * 64  # Genesis hash
+    """Catena di hash persistita per tenant (vedi gdpr_plugin.services.audit_service)"""
+    def __init__(self, tenant_id: str = None):
+        self.tenant_id = tenant_id
+        self.last_hash = "0" * 64  # Genesis hash, aggiornato dopo ogni append
     def log_gdpr_operation(self, operation: str, user_id: str, details: dict):
-        timestamp = datetime.utcnow().isoformat()
-        log_entry = {
-            "timestamp": timestamp,
-            "operation": operation,
-            "user_id": user_id,
-            "details": details,
-            "previous_hash": self.last_hash
-        }
-        entry_string = json.dumps(log_entry, sort_keys=True)
-        current_hash = hashlib.sha256(entry_string.encode()).hexdigest()
-        log_entry["hash"] = current_hash
-        self._store_audit_log(log_entry)
-        self.last_hash = current_hash
+        from plugins.gdpr_plugin.services.audit_service import log_audit_event
+        log_entry = log_audit_event(operation, user_id, details, tenant_id=self.tenant_id)
+        self.last_hash = log_entry["entry_hash"]
         return log_entry
-    def _store_audit_log(self, log_entry):
-        # Implement DB or file storage here
-        pass
 
 # 4. Database Encryption at Rest
 class GDPRDataEncryption:
-    def __init__(self):
-        key = os.getenv("GDPR_ENCRYPTION_KEY").encode()
-        self.cipher = Fernet(key)
+    """Envelope encryption AES-GCM (vedi core.database.types); legge ancora i token Fernet legacy"""
+    def __init__(self, tenant_id: str = None):
+        from core.database.types import get_encryption_service
+        self.service = get_encryption_service()
+        self.tenant_id = tenant_id
     def encrypt_sensitive_data(self, data: str) -> str:
-        return self.cipher.encrypt(data.encode()).decode()
+        return self.service.encrypt(data, self.tenant_id)
     def decrypt_sensitive_data(self, encrypted_data: str) -> str:
-        return self.cipher.decrypt(encrypted_data.encode()).decode()
+        if self.service.is_encrypted(encrypted_data):
+            return self.service.decrypt(encrypted_data)
+        key = os.getenv("GDPR_ENCRYPTION_KEY").encode()
+        return Fernet(key).decrypt(encrypted_data.encode()).decode()
+    def encrypt_batch(self, values: list) -> list:
+        return self.service.encrypt_batch(values, self.tenant_id)
+    def decrypt_batch(self, values: list) -> list:
+        return [self.decrypt_sensitive_data(v) if v is not None else None for v in values]
 
 # 5. Admin 2FA for Critical Operations
 class GDPRAdminSecurity:
@@ -1,8 +1,16 @@
 from core.models.content import Content
-from core.database import SessionLocal
+from core.schemas.content import ContentSchema
+from core.utils.pagination import keyset_chunks, keyset_page, parse_fields
 
-def get_contents():
-    db = SessionLocal()
-    contents = db.query(Content).all()
-    db.close()
-    return contents
+CONTENT_FIELDS = ("id", "title", "body", "created_at", "updated_at")
+CONTENT_DEFAULT_FIELDS = tuple(ContentSchema.model_fields)
+
+def list_contents(db, tenant_id, cursor=None, limit=50, fields=None):
+    """Pagina keyset dei contenuti del tenant (solo le colonne richieste)"""
+    fields = parse_fields(fields, CONTENT_FIELDS, CONTENT_DEFAULT_FIELDS)
+    return keyset_page(Content.for_tenant(db, tenant_id), Content, fields, cursor, limit)
+
+def iter_contents(db, tenant_id, cursor=None, fields=None, chunk_size=1000):
+    """Tutti i contenuti del tenant a blocchi (export/stream NDJSON)"""
+    fields = parse_fields(fields, CONTENT_FIELDS, CONTENT_DEFAULT_FIELDS)
+    return keyset_chunks(Content.for_tenant(db, tenant_id), Content, fields, cursor, chunk_size)
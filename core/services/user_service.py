@@ -1,8 +1,22 @@
 from core.models.user import User
-from core.database import SessionLocal
+from core.schemas.user import UserSchema
+from core.utils.pagination import keyset_chunks, keyset_page, parse_fields
+from core.database.types import blind_index_for
 
-def get_users():
-    db = SessionLocal()
-    users = db.query(User).all()
-    db.close()
-    return users
+# Campi selezionabili con `fields` (mai il blind index)
+USER_FIELDS = ("id", "email", "name", "created_at", "updated_at")
+USER_DEFAULT_FIELDS = tuple(UserSchema.model_fields)
+
+def list_users(db, tenant_id, cursor=None, limit=50, fields=None):
+    """Pagina keyset degli utenti del tenant (solo le colonne richieste)"""
+    fields = parse_fields(fields, USER_FIELDS, USER_DEFAULT_FIELDS)
+    return keyset_page(User.for_tenant(db, tenant_id), User, fields, cursor, limit)
+
+def iter_users(db, tenant_id, cursor=None, fields=None, chunk_size=1000):
+    """Tutti gli utenti del tenant a blocchi (export/stream NDJSON)"""
+    fields = parse_fields(fields, USER_FIELDS, USER_DEFAULT_FIELDS)
+    return keyset_chunks(User.for_tenant(db, tenant_id), User, fields, cursor, chunk_size)
+
+def get_user_by_email(db, email: str):
+    """Lookup per email cifrata: uguaglianza sul blind index (indice unico)"""
+    return db.query(User).filter(User.email_bidx == blind_index_for(User.email, email)).first()
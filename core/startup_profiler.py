@@ -0,0 +1,217 @@
+"""
+⏱️ Profilo di avvio: timeline gerarchica del boot
+
+- `span(name, **attrs)`: fase del boot (annidabile, anche tra task asyncio:
+  il padre è la span attiva nel contesto che crea il task)
+- import dei moduli: `builtins.__import__` avvolto finché l'app non è pronta,
+  con tempo cumulativo e "self" (al netto dei sotto-import) per modulo
+- `report()` / `write_report(path)`: JSON servito da `/debug/startup` e
+  salvato come artefatto (`STARTUP_PROFILE_PATH`)
+
+Attivo di default; `STARTUP_PROFILE=0` disattiva il tracciamento degli import.
+Il wrapper di `__import__` viene rimosso da `mark_ready()`, oppure dopo
+`STARTUP_PROFILE_TIMEOUT` secondi / all'uscita se il lifespan non parte mai
+(import di `core.main` da script, test, worker).
+"""
+import atexit
+import builtins
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+@dataclass
+class Span:
+    name: str
+    start: float
+    end: Optional[float] = None
+    attrs: Dict[str, object] = field(default_factory=dict)
+    children: List["Span"] = field(default_factory=list)
+
+    def to_dict(self, origin: float) -> dict:
+        end = self.end if self.end is not None else time.perf_counter()
+        return {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((end - self.start) * 1000, 3),
+            "running": self.end is None,
+            **({"attrs": self.attrs} if self.attrs else {}),
+            "children": [child.to_dict(origin) for child in self.children],
+        }
+
+
+@dataclass
+class ImportRecord:
+    module: str
+    start: float
+    duration: float = 0.0
+    self_time: float = 0.0
+    children: List["ImportRecord"] = field(default_factory=list)
+
+    def to_dict(self, origin: float, min_ms: float) -> dict:
+        return {
+            "module": self.module,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+            "self_ms": round(self.self_time * 1000, 3),
+            "children": [
+                child.to_dict(origin, min_ms) for child in self.children
+                if child.duration * 1000 >= min_ms
+            ],
+        }
+
+
+class StartupProfiler:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.started_at = time.time()
+        self.ready_at: Optional[float] = None
+        self.spans: List[Span] = []
+        self.imports: List[ImportRecord] = []
+        self._all_imports: List[ImportRecord] = []
+        self._current: ContextVar[Optional[Span]] = ContextVar("startup_span", default=None)
+        self._import_stack = threading.local()
+        self._original_import = None
+        self._timed_import = None
+        self._stop_timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    # ===== SPAN =====
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Fase del boot; le span aperte dentro diventano figlie"""
+        parent = self._current.get()
+        current = Span(name, time.perf_counter(), attrs=attrs)
+        with self._lock:
+            (parent.children if parent is not None else self.spans).append(current)
+        token = self._current.set(current)
+        try:
+            yield current
+        except BaseException as e:
+            current.attrs["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            current.end = time.perf_counter()
+            self._current.reset(token)
+
+    # ===== IMPORT =====
+
+    @property
+    def tracking_imports(self) -> bool:
+        return self._original_import is not None
+
+    def start_import_tracking(self, timeout: Optional[float] = None) -> None:
+        """Avvolge `__import__`; si ferma comunque dopo `timeout` secondi o all'uscita"""
+        if self._original_import is not None or os.getenv("STARTUP_PROFILE", "1") == "0":
+            return
+        if timeout is None:
+            timeout = float(os.getenv("STARTUP_PROFILE_TIMEOUT", "120"))
+        self._original_import = original = builtins.__import__
+        stack = self._import_stack
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            # Moduli già importati: nessun costo da misurare
+            if level == 0 and name in sys.modules:
+                return original(name, globals, locals, fromlist, level)
+            module = name
+            if level and globals:
+                package = globals.get("__package__") or ""
+                module = ".".join(package.split(".")[:len(package.split(".")) - level + 1] + ([name] if name else []))
+            if module in sys.modules:
+                # `from pkg import submodule`: conta solo se il sottomodulo è da caricare
+                package = sys.modules[module]
+                pending = [
+                    f"{module}.{item}" for item in fromlist or ()
+                    if item != "*" and hasattr(package, "__path__") and not hasattr(package, item)
+                    and f"{module}.{item}" not in sys.modules
+                ]
+                if not pending:
+                    return original(name, globals, locals, fromlist, level)
+                module = ", ".join(pending)
+
+            parents = getattr(stack, "records", None)
+            if parents is None:
+                parents = stack.records = []
+            record = ImportRecord(module, time.perf_counter())
+            parents.append(record)
+            try:
+                return original(name, globals, locals, fromlist, level)
+            finally:
+                parents.pop()
+                record.duration = time.perf_counter() - record.start
+                record.self_time = record.duration - sum(c.duration for c in record.children)
+                with self._lock:
+                    (parents[-1].children if parents else self.imports).append(record)
+                    self._all_imports.append(record)
+
+        self._timed_import = builtins.__import__ = timed_import
+        self._stop_timer = threading.Timer(timeout, self.stop_import_tracking)
+        self._stop_timer.daemon = True
+        self._stop_timer.start()
+        atexit.register(self.stop_import_tracking)
+
+    def stop_import_tracking(self) -> None:
+        with self._lock:
+            if self._original_import is None:
+                return
+            # Non sovrascrive un eventuale wrapper installato dopo il nostro
+            if builtins.__import__ is self._timed_import:
+                builtins.__import__ = self._original_import
+            self._original_import = self._timed_import = None
+            timer, self._stop_timer = self._stop_timer, None
+        if timer is not None and timer is not threading.current_thread():
+            timer.cancel()
+        atexit.unregister(self.stop_import_tracking)
+
+    def mark_ready(self) -> None:
+        """App pronta: fine del tracciamento import"""
+        self.ready_at = time.perf_counter()
+        self.stop_import_tracking()
+
+    # ===== REPORT =====
+
+    def report(self, min_import_ms: float = 1.0, top: int = 25) -> dict:
+        origin = self.origin
+        with self._lock:
+            spans = list(self.spans)
+            imports = list(self.imports)
+            all_imports = list(self._all_imports)
+        slowest = sorted(all_imports, key=lambda r: r.self_time, reverse=True)[:top]
+        return {
+            "started_at": self.started_at,
+            "ready": self.ready_at is not None,
+            "ready_ms": round((self.ready_at - origin) * 1000, 3) if self.ready_at is not None else None,
+            "spans": [span.to_dict(origin) for span in spans],
+            "imports": {
+                "count": len(all_imports),
+                "total_ms": round(sum(r.duration for r in imports) * 1000, 3),
+                "slowest_self": [
+                    {"module": r.module, "self_ms": round(r.self_time * 1000, 3),
+                     "duration_ms": round(r.duration * 1000, 3)}
+                    for r in slowest
+                ],
+                "tree": [r.to_dict(origin, min_import_ms) for r in imports if r.duration * 1000 >= min_import_ms],
+            },
+        }
+
+    def write_report(self, path) -> Path:
+        """Scrittura atomica del report JSON"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".startup-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        os.replace(tmp, path)
+        return path
+
+
+profiler = StartupProfiler()
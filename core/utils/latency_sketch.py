@@ -0,0 +1,73 @@
+"""
+📈 Sketch di latenza a bucket logaritmici (stile DDSketch)
+
+Il bucket `i` copre (min·γ^(i-1), min·γ^i]: ogni quantile ha errore
+relativo ≤ `relative_accuracy`, con poche centinaia di bucket da 10µs a
+minuti. I conteggi sono additivi: sketch di worker e minuti diversi si
+fondono sommando i bucket (HINCRBY in Redis).
+"""
+import math
+from typing import Dict, Iterable, Mapping, Optional
+
+
+class LatencySketch:
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+
+    def key(self, value: float) -> int:
+        if value <= self.min_value:
+            return 0
+        return int(math.ceil(math.log(value / self.min_value) / self._log_gamma))
+
+    def value(self, key: int) -> float:
+        """Stima centrale del bucket (errore relativo ≤ relative_accuracy)"""
+        if key == 0:
+            return self.min_value
+        return self.min_value * 2 * self.gamma ** key / (1 + self.gamma)
+
+    def add(self, value: float, n: int = 1) -> None:
+        k = self.key(value)
+        self.buckets[k] = self.buckets.get(k, 0) + n
+        self.count += n
+
+    def merge_counts(self, counts: Mapping) -> None:
+        """Somma conteggi `{bucket: n}` (anche con chiavi/valori bytes da Redis)"""
+        for k, n in counts.items():
+            k, n = int(k), int(n)
+            self.buckets[k] = self.buckets.get(k, 0) + n
+            self.count += n
+
+    def merge(self, other: "LatencySketch") -> None:
+        self.merge_counts(other.buckets)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for k in sorted(self.buckets):
+            seen += self.buckets[k]
+            if seen > rank:
+                return self.value(k)
+        return self.value(max(self.buckets))
+
+    def quantiles(self, qs: Iterable[float]) -> Dict[float, Optional[float]]:
+        """Più quantili con una sola scansione dei bucket ordinati"""
+        qs = sorted(qs)
+        result: Dict[float, Optional[float]] = {q: None for q in qs}
+        if not self.count:
+            return result
+        ordered = sorted(self.buckets.items())
+        seen, i = 0, 0
+        for q in qs:
+            rank = q * (self.count - 1)
+            while i < len(ordered) and seen + ordered[i][1] <= rank:
+                seen += ordered[i][1]
+                i += 1
+            result[q] = self.value(ordered[min(i, len(ordered) - 1)][0])
+        return result
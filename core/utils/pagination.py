@@ -0,0 +1,180 @@
+"""
+📄 Paginazione keyset (niente OFFSET) e streaming NDJSON
+
+Le righe sono ordinate per colonne univoche (es. `created_at, id`); il
+cursore opaco contiene i valori dell'ultima riga e la pagina successiva
+parte da `(created_at, id) > cursore`, usando l'indice invece di scorrere
+le righe già viste. Si selezionano solo le colonne richieste (`fields`).
+"""
+import base64
+import json
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import DateTime, literal, tuple_
+from starlette.responses import StreamingResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+STREAM_CHUNK_SIZE = 1000
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+@dataclass
+class Page:
+    items: List[dict] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    limit: int = DEFAULT_LIMIT
+
+    def to_dict(self) -> dict:
+        return {"items": self.items, "next_cursor": self.next_cursor, "limit": self.limit}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Tipo non serializzabile: {type(value).__name__}")
+
+
+def dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, default=_json_default)
+    return json.dumps(value, default=_json_default, separators=(",", ":")).encode()
+
+
+# ===== CURSORE =====
+
+def encode_cursor(values: Sequence) -> str:
+    raw = json.dumps([_json_default(v) if isinstance(v, (datetime, date, uuid.UUID)) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> list:
+    """Valori del cursore convertiti al tipo delle colonne; ValueError se non valido"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError(cursor)
+        return [_cursor_value(column, value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError("Cursore non valido")
+
+
+def _cursor_value(column, value):
+    if value is None:
+        raise ValueError("valore nullo")
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    if getattr(column.type, "as_uuid", False):
+        return uuid.UUID(value)
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    # Il JSON distingue già int/float/str: il valore deve essere del tipo della colonna
+    if python_type is float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, python_type) or (isinstance(value, bool) and python_type is not bool):
+        raise TypeError(f"{column.name}: atteso {python_type.__name__}")
+    return value
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str], default: Sequence[str]) -> List[str]:
+    """`"id,name"` → colonne richieste (nell'ordine dato); ValueError se non consentite"""
+    if not fields:
+        return list(default)
+    requested = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in requested if f not in allowed]
+    if unknown or not requested:
+        raise ValueError(f"Campi non validi: {unknown}. Disponibili: {list(allowed)}")
+    return requested
+
+
+# ===== QUERY =====
+
+def _keyset_query(query, model, fields: Sequence[str], order_by: Sequence[str], cursor: Optional[str]):
+    order_columns = [getattr(model, name) for name in order_by]
+    # Le colonne dell'ordinamento servono sempre per il cursore successivo
+    names = list(dict.fromkeys([*fields, *order_by]))
+    query = query.with_entities(*(getattr(model, name) for name in names)).order_by(*order_columns)
+    if cursor:
+        values = decode_cursor(cursor, order_columns)
+        bound = [literal(value, type_=column.type) for column, value in zip(order_columns, values)]
+        query = query.filter(tuple_(*order_columns) > tuple_(*bound))
+    return query, names
+
+
+def _rows(rows, names: Sequence[str], fields: Sequence[str]) -> List[dict]:
+    positions = [names.index(name) for name in fields]
+    return [{name: row[i] for name, i in zip(fields, positions)} for row in rows]
+
+
+def keyset_page(query, model, fields: Sequence[str], cursor: Optional[str] = None,
+                limit: int = DEFAULT_LIMIT, order_by: Sequence[str] = ("created_at", "id")) -> Page:
+    """Una pagina (`limit` righe) dopo `cursor`; `next_cursor` None sull'ultima"""
+    query, names = _keyset_query(query, model, fields, order_by, cursor)
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor([last[names.index(name)] for name in order_by])
+    return Page(_rows(rows, names, fields), next_cursor, limit)
+
+
+def keyset_chunks(query, model, fields: Sequence[str], cursor: Optional[str] = None,
+                  chunk_size: int = STREAM_CHUNK_SIZE,
+                  order_by: Sequence[str] = ("created_at", "id")) -> Iterator[List[dict]]:
+    """Tutte le righe dopo `cursor`, a blocchi di `chunk_size` (una query keyset per blocco)"""
+    if cursor:
+        # Cursore validato subito, non a stream già avviato
+        decode_cursor(cursor, [getattr(model, name) for name in order_by])
+    return _chunks(query, model, fields, cursor, chunk_size, order_by)
+
+
+def _chunks(query, model, fields, cursor, chunk_size, order_by) -> Iterator[List[dict]]:
+    while True:
+        page = keyset_page(query, model, fields, cursor, chunk_size, order_by)
+        if page.items:
+            yield page.items
+        if page.next_cursor is None:
+            return
+        cursor = page.next_cursor
+
+
+def ndjson_lines(chunks: Iterable[List[dict]]) -> Iterator[bytes]:
+    """Un blocco di righe NDJSON per chunk (meno write sul socket)"""
+    for chunk in chunks:
+        yield b"".join(dumps(row) + b"\n" for row in chunk)
+
+
+def ndjson_response(session_factory: Callable, chunks_for: Callable) -> StreamingResponse:
+    """
+    StreamingResponse NDJSON con una sessione propria, aperta per tutta la
+    durata dello stream; gli errori di `chunks_for` (es. ValueError su campi
+    o cursore) arrivano al chiamante prima che la risposta parta.
+    """
+    db = session_factory()
+    try:
+        chunks = chunks_for(db)
+    except Exception:
+        db.close()
+        raise
+
+    def body():
+        try:
+            yield from ndjson_lines(chunks)
+        finally:
+            db.close()
+
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE)
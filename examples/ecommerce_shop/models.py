@@ -16,6 +16,7 @@ def get_db():
 
 class User(Base):
     __tablename__ = "users"
+    __gdpr_subject__ = "id"  # colonna che collega la riga all'utente (export GDPR)
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True)
     name = Column(String)
@@ -51,8 +52,9 @@ class Product(Base):
 
 class Order(Base):
     __tablename__ = "orders"
+    __gdpr_subject__ = "user_id"  # colonna che collega la riga all'utente (export GDPR)
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
     quantity = Column(Integer)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
@@ -1,9 +1,10 @@
 from fastapi import FastAPI, Depends, HTTPException
 from sqlalchemy.orm import Session
-from .models import Base, User, Post, get_db
+from .models import Base, User, Post, get_db, SessionLocal
 from .schemas import UserCreate, UserOut, PostCreate, PostOut
 from .gdpr import export_user_data, log_audit
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import uvicorn
 
 app = FastAPI(title="Simple Blog Example", description="GDPR-compliant blog example.")
@@ -32,11 +33,20 @@ def create_post(post: PostCreate, db: Session = Depends(get_db)):
 def list_posts(db: Session = Depends(get_db)):
     return Post.list(db)
 
+def _export_stream(user_id: int):
+    # Sessione dedicata: resta aperta per tutta la durata dello stream
+    db = SessionLocal()
+    try:
+        yield from export_user_data(db, user_id)
+    finally:
+        db.close()
+
 @app.get("/gdpr/export")
 def gdpr_export(user_id: int, db: Session = Depends(get_db)):
-    data = export_user_data(db, user_id)
+    if not db.query(User).filter(User.id == user_id).first():
+        raise HTTPException(status_code=404, detail="User not found")
     log_audit(user_id, "GDPR export")
-    return data
+    return StreamingResponse(_export_stream(user_id), media_type="application/json")
 
 if __name__ == "__main__":
     uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
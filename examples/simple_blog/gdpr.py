@@ -1,24 +1,28 @@
-from .models import User, Post
+from .models import Base, User
 import json
 import datetime
 
-def export_user_data(db, user_id):
-    user = db.query(User).filter(User.id == user_id).first()
-    posts = db.query(Post).filter(Post.author_id == user_id).all()
-    if not user:
-        return {"error": "User not found"}
-    data = {
-        "user": {
-            "id": user.id,
-            "email": user.email,
-            "name": user.name,
-            "consent": user.consent
-        },
-        "posts": [
-            {"id": p.id, "title": p.title, "content": p.content, "created_at": p.created_at.isoformat()} for p in posts
-        ]
-    }
-    return data
+def personal_data_models():
+    """Modelli con dati personali: quelli che dichiarano `__gdpr_subject__` (ordine delle FK)"""
+    by_table = {m.local_table: m.class_ for m in Base.registry.mappers if getattr(m.class_, "__gdpr_subject__", None)}
+    return [by_table[t] for t in Base.metadata.sorted_tables if t in by_table]
+
+def export_user_data(db, user_id, chunk_size=500):
+    """Export JSON in streaming: le righe vengono lette a chunk e mai accumulate in memoria"""
+    if not db.query(User).filter(User.id == user_id).first():
+        yield json.dumps({"error": "User not found"})
+        return
+    yield "{" + json.dumps("user_id") + ": " + json.dumps(user_id)
+    for model in personal_data_models():
+        # Una query sull'indice della colonna soggetto per ogni tabella
+        subject = getattr(model, model.__gdpr_subject__)
+        rows = db.query(model).filter(subject == user_id).order_by(model.id).yield_per(chunk_size)
+        yield ", " + json.dumps(model.__tablename__) + ": ["
+        for i, row in enumerate(rows):
+            record = {c.key: getattr(row, c.key) for c in model.__mapper__.column_attrs}
+            yield (", " if i else "") + json.dumps(record, default=str)
+        yield "]"
+    yield "}"
 
 def log_audit(user_id, action):
     with open("audit.log", "a") as f:
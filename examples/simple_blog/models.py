@@ -16,6 +16,7 @@ def get_db():
 
 class User(Base):
     __tablename__ = "users"
+    __gdpr_subject__ = "id"  # colonna che collega la riga all'utente (export GDPR)
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True)
     name = Column(String)
@@ -32,11 +33,12 @@ class User(Base):
 
 class Post(Base):
     __tablename__ = "posts"
+    __gdpr_subject__ = "author_id"  # colonna che collega la riga all'utente (export GDPR)
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String)
     content = Column(Text)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
-    author_id = Column(Integer, ForeignKey("users.id"))
+    author_id = Column(Integer, ForeignKey("users.id"), index=True)
     author = relationship("User", back_populates="posts")
 
     @staticmethod
@@ -4,6 +4,8 @@ from core.database.base import Base, BaseModel, PluginRegistry
 
 class AnalyticsEvent(BaseModel):
     __tablename__ = "analytics_events"
+    __gdpr_subject__ = "user_id"
+    __anonymize__ = {"user_id": "null"}
     id = Column(Integer, primary_key=True, index=True)
     event_type = Column(String, index=True)
     user_id = Column(Integer, index=True, nullable=True)
@@ -12,3 +12,14 @@ def get_stats(db):
     total = db.query(AnalyticsEvent).count()
     by_type = db.query(AnalyticsEvent.event_type, db.func.count(AnalyticsEvent.id)).group_by(AnalyticsEvent.event_type).all()
     return {"total_events": total, "events_by_type": dict(by_type)}
+
+def export_events(db, tenant_id=None, chunk_size=5000, master_key=None):
+    """Export eventi con user_id pseudonimizzato (token stabile per tenant), in una sola passata"""
+    from plugins.gdpr_plugin.utils.pseudonymization import get_pseudonymizer
+    pseudonymizer = get_pseudonymizer(tenant_id, master_key)
+    query = db.query(AnalyticsEvent.id, AnalyticsEvent.event_type, AnalyticsEvent.user_id,
+                     AnalyticsEvent.data, AnalyticsEvent.created_at)
+    if tenant_id is not None:
+        query = query.filter(AnalyticsEvent.tenant_id == tenant_id)
+    rows = (row._asdict() for row in query.order_by(AnalyticsEvent.id).yield_per(chunk_size))
+    return pseudonymizer.records(rows, {"user_id": "token"}, chunk_size=chunk_size)
@@ -5,6 +5,7 @@ import datetime
 
 class AuditLog(BaseModel):
     __tablename__ = "audit_logs"
+    __gdpr_subject__ = "user_id"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, index=True, nullable=True)
     action = Column(String)
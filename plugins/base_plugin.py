@@ -1,5 +1,5 @@
 from fastapi import FastAPI
-from typing import Any
+from typing import Any, Dict, Optional
 
 class BasePlugin:
     """
@@ -8,6 +8,7 @@ class BasePlugin:
     name: str = "base"
     version: str = "1.0.0"
     enabled: bool = True
+    health_check_timeout: Optional[float] = None  # None: HEALTH_CHECK_TIMEOUT
 
     def __init__(self, app: FastAPI, config: dict = None):
         self.app = app
@@ -28,3 +29,13 @@ class BasePlugin:
     def security_checks(self):
         """Run security and GDPR compliance checks."""
         pass
+
+    async def health_check(self) -> Dict[str, Any]:
+        """
+        Probe economico dello stato del plugin (niente table scan).
+
+        Ritorna dettagli opzionali (`{"status": "degraded", ...}` per
+        segnalare un funzionamento ridotto); un'eccezione vale "unhealthy".
+        Chiamato in parallelo agli altri plugin, con timeout.
+        """
+        return {}
@@ -0,0 +1,31 @@
+import uuid
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from core.dependencies import get_db
+from plugins.gdpr_plugin.services import audit_checkpoint_service
+
+router = APIRouter()
+
+@router.get("/public-key", response_class=PlainTextResponse)
+def audit_public_key():
+    """Chiave pubblica Ed25519 (PEM) per verificare le firme dei checkpoint"""
+    return audit_checkpoint_service.get_audit_signer().public_key_pem()
+
+@router.get("/checkpoints/latest")
+def latest_checkpoint(tenant_id: Optional[str] = None, db=Depends(get_db)):
+    """Ultima root firmata dell'audit ledger"""
+    checkpoint = audit_checkpoint_service.get_latest_checkpoint(db, tenant_id)
+    if checkpoint is None:
+        raise HTTPException(404, "No audit checkpoint yet")
+    return audit_checkpoint_service.checkpoint_to_dict(checkpoint)
+
+@router.get("/entries/{entry_id}/proof")
+def inclusion_proof(entry_id: uuid.UUID, tree_size: Optional[int] = None, db=Depends(get_db)):
+    """Inclusion proof O(log n) di una voce rispetto a un checkpoint firmato"""
+    try:
+        return audit_checkpoint_service.get_inclusion_proof(db, entry_id, tree_size)
+    except LookupError as e:
+        raise HTTPException(404, str(e))
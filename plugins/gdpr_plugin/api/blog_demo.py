@@ -5,11 +5,16 @@ Add this to your core/api/router.py
 """
 
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
 import json
 
+from plugins.gdpr_plugin.services import export_service
+from plugins.gdpr_plugin.services.export_service import IterableExportSource
+from plugins.gdpr_plugin.utils.anonymization import anonymize_data
+
 router = APIRouter(prefix="/api/blog", tags=["Blog Demo"])
 
 # Pydantic models for the blog demo
@@ -303,34 +308,49 @@ async def get_blog_stats():
     }
 
 # GDPR integration endpoints for the blog
+BLOG_EXPORT_SOURCES = [
+    IterableExportSource(name="user_profile", fetch=lambda user_id: (u for u in DEMO_BLOG_DATA["users"] if u["id"] == user_id)),
+    IterableExportSource(name="posts_authored", fetch=lambda user_id: (p for p in DEMO_BLOG_DATA["posts"] if p["author_id"] == user_id)),
+    IterableExportSource(name="comments_made", fetch=lambda user_id: (c for c in DEMO_BLOG_DATA["comments"] if c["author_id"] == user_id)),
+]
+
 @router.get("/users/{user_id}/gdpr-export")
-async def export_user_blog_data(user_id: int):
+async def export_user_blog_data(user_id: int, format: str = "json", compress: bool = False,
+                                compression: Optional[str] = None, archive: str = "zip"):
     """Export all blog data for a specific user (GDPR compliance)"""
     user = next((u for u in DEMO_BLOG_DATA["users"] if u["id"] == user_id), None)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    if format not in export_service.available_formats():
+        raise HTTPException(status_code=400, detail=f"Format must be one of: {export_service.available_formats()}")
+    try:
+        compression = export_service.resolve_compression(compress, compression)
+        filename = export_service.export_filename(user_id, format, compression, archive)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Collect all user's blog data
-    user_posts = [p for p in DEMO_BLOG_DATA["posts"] if p["author_id"] == user_id]
-    user_comments = [c for c in DEMO_BLOG_DATA["comments"] if c["author_id"] == user_id]
-    
-    export_data = {
-        "user_profile": user,
-        "posts_authored": user_posts,
-        "comments_made": user_comments,
+    # Statistiche calcolate in streaming, senza materializzare le liste
+    extra_meta = {
         "blog_stats": {
-            "total_posts": len(user_posts),
-            "total_comments": len(user_comments),
+            "total_posts": sum(1 for p in DEMO_BLOG_DATA["posts"] if p["author_id"] == user_id),
+            "total_comments": sum(1 for c in DEMO_BLOG_DATA["comments"] if c["author_id"] == user_id),
             "member_since": user["created_at"]
         },
-        "export_metadata": {
-            "exported_at": datetime.now().isoformat(),
-            "export_type": "blog_data",
-            "gdpr_compliant": True
-        }
+        "export_type": "blog_data",
+        "gdpr_compliant": True
     }
     
-    return export_data
+    return StreamingResponse(
+        export_service.export_user_data(
+            None, user_id, fmt=format, compression=compression, archive=archive,
+            sources=BLOG_EXPORT_SOURCES, extra_meta=extra_meta
+        ),
+        media_type=export_service.export_media_type(format, compression, archive),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+USER_ANONYMIZATION = {"email": "hash", "name": "pseudonym"}
+AUTHOR_ANONYMIZATION = {"author_name": "pseudonym"}
 
 @router.delete("/users/{user_id}/gdpr-delete")
 async def delete_user_blog_data(user_id: int, anonymize_content: bool = True):
@@ -341,17 +361,17 @@ async def delete_user_blog_data(user_id: int, anonymize_content: bool = True):
     
     if anonymize_content:
         # Anonymize user's posts and comments (keep content but remove personal data)
+        # Stesse strategie dei modelli (__anonymize__); su DB è un UPDATE set-based
         for post in DEMO_BLOG_DATA["posts"]:
             if post["author_id"] == user_id:
-                post["author_name"] = f"Anonymous User {user_id}"
+                post.update(anonymize_data(post, AUTHOR_ANONYMIZATION, subject_id=user_id))
         
         for comment in DEMO_BLOG_DATA["comments"]:
             if comment["author_id"] == user_id:
-                comment["author_name"] = f"Anonymous User {user_id}"
+                comment.update(anonymize_data(comment, AUTHOR_ANONYMIZATION, subject_id=user_id))
         
         # Anonymize user profile
-        user["email"] = f"deleted_user_{user_id}@anonymized.local"
-        user["name"] = f"Anonymous User {user_id}"
+        user.update(anonymize_data(user, USER_ANONYMIZATION, subject_id=user_id))
         user["deleted_at"] = datetime.now().isoformat()
         
         return {
@@ -1,8 +1,19 @@
-from fastapi import APIRouter
+import uuid
+
+from fastapi import APIRouter, Depends
+
+from core.dependencies import get_db
+from plugins.gdpr_plugin.services import anonymization_service
 
 router = APIRouter()
 
-@router.delete("/")
-def delete_data():
-    # Logic for deleting user data
-    return {"status": "data deleted"}
+@router.delete("/", status_code=202)
+def delete_data(user_id: uuid.UUID, db=Depends(get_db)):
+    """Richiesta di erasure (GDPR Art. 17): anonimizzata dal batch notturno"""
+    request = anonymization_service.create_erasure_request(db, user_id)
+    return {
+        "status": "data deletion scheduled",
+        "request_id": str(request.id),
+        "user_id": str(request.user_id),
+        "requested_at": request.timestamp.isoformat() if request.timestamp else None,
+    }
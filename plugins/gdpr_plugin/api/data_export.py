@@ -1,8 +1,96 @@
-from fastapi import APIRouter
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
+
+from core.dependencies import get_db
+from plugins.gdpr_plugin.services import export_job_service
+from plugins.gdpr_plugin.services.export_service import (
+    available_formats,
+    export_filename,
+    export_media_type,
+    export_user_data,
+    resolve_export_options,
+)
 
 router = APIRouter()
 
-@router.get("/")
-def export_data():
-    # Logic for exporting user data
-    return {"status": "data exported"}
+
+def _export_stream(user_id: str, fmt: str, compression: str, archive: str):
+    # Sessione propria: deve restare aperta per tutta la durata dello stream
+    from core.database import SessionLocal
+    db = SessionLocal()
+    try:
+        yield from export_user_data(db, user_id, fmt=fmt, compression=compression, archive=archive)
+    finally:
+        db.close()
+
+
+def _validate_export_options(format: Optional[str], compress: Optional[bool], compression: Optional[str],
+                             archive: str):
+    """Formato/compressione effettivi (default da GDPR_EXPORT_FORMAT/GDPR_EXPORT_COMPRESSION)"""
+    if format is not None and format not in available_formats():
+        raise HTTPException(400, f"Format must be one of: {available_formats()}")
+    try:
+        return resolve_export_options(format, compress, compression, archive)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+
+@router.get("")
+def export_data(user_id: str, format: Optional[str] = Query(None), compress: Optional[bool] = None,
+                compression: Optional[str] = None, archive: str = "zip"):
+    """Export streaming dei dati personali (GDPR Art. 20)"""
+    format, compression = _validate_export_options(format, compress, compression, archive)
+    filename = export_filename(user_id, format, compression, archive)
+    return StreamingResponse(
+        _export_stream(user_id, format, compression, archive),
+        media_type=export_media_type(format, compression, archive),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/requests", status_code=202)
+def request_export(user_id: uuid.UUID, format: Optional[str] = Query(None), compress: Optional[bool] = None,
+                   compression: Optional[str] = None, archive: str = "zip", db=Depends(get_db)):
+    """Crea un job di export asincrono: l'artifact viene generato dal worker"""
+    format, compression = _validate_export_options(format, compress, compression, archive)
+    job = export_job_service.create_export_job(db, user_id, format, compression=compression, archive=archive)
+    from plugins.gdpr_plugin.tasks.export_jobs import process_export_request
+    process_export_request.delay(str(job.id))
+    return {
+        **export_job_service.get_job_progress(job),
+        "status_url": f"requests/{job.id}",
+        "download_url": f"requests/{job.id}/download",
+    }
+
+
+@router.get("/requests/{request_id}")
+def export_request_status(request_id: uuid.UUID, db=Depends(get_db)):
+    """Polling dello stato/avanzamento del job"""
+    job = export_job_service.get_export_job(db, request_id)
+    if not job:
+        raise HTTPException(404, "Export request not found")
+    return export_job_service.get_job_progress(job)
+
+
+@router.get("/requests/{request_id}/download")
+def download_export(request_id: uuid.UUID, db=Depends(get_db)):
+    """Download dell'artifact (FileResponse gestisce le richieste Range per il resume)"""
+    job = export_job_service.get_export_job(db, request_id)
+    if not job:
+        raise HTTPException(404, "Export request not found")
+    if job.status == export_job_service.STATUS_EXPIRED:
+        raise HTTPException(410, "Export expired")
+    if job.status != export_job_service.STATUS_COMPLETED:
+        raise HTTPException(409, f"Export not ready: {job.status}")
+    path = Path(job.artifact_path)
+    if not path.exists():
+        raise HTTPException(410, "Export artifact no longer available")
+    return FileResponse(
+        path,
+        media_type=export_media_type(job.export_format, job.compression or "none", job.archive or "zip"),
+        filename=path.name,
+    )
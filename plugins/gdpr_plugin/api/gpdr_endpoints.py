@@ -5,11 +5,14 @@ Add these to your plugins/gdpr_plugin/api.py file
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional
 import json
 from datetime import datetime, timedelta
 from core.dependencies import get_db
+from plugins.gdpr_plugin.services import export_service
+from plugins.gdpr_plugin.services.export_service import IterableExportSource
 
 router = APIRouter(prefix="/api/gdpr", tags=["GDPR"])
 
@@ -85,31 +88,26 @@ async def get_gdpr_metrics():
         "last_updated": datetime.now().isoformat()
     }
 
-@router.get("/export")
-async def export_user_data(user_id: int, format: str = "json"):
-    """Export all user data (GDPR Article 20 - Right to Data Portability)"""
-    
-    # Find user
-    user = next((u for u in DEMO_DATA["users"] if u["id"] == user_id), None)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Collect all user data
-    user_consents = [c for c in DEMO_DATA["consents"] if c["user_id"] == user_id]
-    user_exports = [e for e in DEMO_DATA["exports"] if e["user_id"] == user_id]
-    user_audit = [a for a in DEMO_DATA["audit_logs"] if a["user_id"] == user_id]
-    
-    export_data = {
-        "user_profile": user,
-        "consents": user_consents,
-        "export_history": user_exports,
-        "audit_trail": user_audit,
-        "exported_at": datetime.now().isoformat(),
-        "export_format": format,
-        "gdpr_notice": "This export contains all personal data we have about you as per GDPR Article 20."
-    }
+def _demo_source(name: str, key: str):
+    """Sorgente export sui dati demo di una collezione DEMO_DATA"""
+    return IterableExportSource(
+        name=name,
+        fetch=lambda user_id: (row for row in DEMO_DATA[key] if row.get("user_id") == user_id),
+    )
+
+DEMO_EXPORT_SOURCES = [
+    IterableExportSource(name="user_profile", fetch=lambda user_id: (u for u in DEMO_DATA["users"] if u["id"] == user_id)),
+    _demo_source("consents", "consents"),
+    _demo_source("export_history", "exports"),
+    _demo_source("audit_trail", "audit_logs"),
+]
+
+def _tracked_export_stream(user_id: int, format: str, compression: str, archive: str):
+    yield from export_service.export_user_data(
+        None, user_id, fmt=format, compression=compression, archive=archive, sources=DEMO_EXPORT_SOURCES
+    )
     
-    # Log the export
+    # Log the export (solo a stream completato)
     DEMO_DATA["audit_logs"].append({
         "id": len(DEMO_DATA["audit_logs"]) + 1,
         "user_id": user_id,
@@ -125,8 +123,30 @@ async def export_user_data(user_id: int, format: str = "json"):
         "status": "completed",
         "requested_at": datetime.now().isoformat()
     })
+
+@router.get("/export")
+async def export_user_data(user_id: int, format: str = "json", compress: bool = False,
+                           compression: Optional[str] = None, archive: str = "zip"):
+    """Export all user data (GDPR Article 20 - Right to Data Portability)"""
     
-    return export_data
+    # Find user
+    user = next((u for u in DEMO_DATA["users"] if u["id"] == user_id), None)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if format not in export_service.available_formats():
+        raise HTTPException(status_code=400, detail=f"Format must be one of: {export_service.available_formats()}")
+    try:
+        compression = export_service.resolve_compression(compress, compression)
+        filename = export_service.export_filename(user_id, format, compression, archive)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Stream incrementale: nessun dict completo dell'export in memoria
+    return StreamingResponse(
+        _tracked_export_stream(user_id, format, compression, archive),
+        media_type=export_service.export_media_type(format, compression, archive),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @router.delete("/delete-account")
 async def delete_user_account(user_id: int, reason: str = "User request"):
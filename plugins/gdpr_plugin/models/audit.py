@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Text
+from sqlalchemy import Column, String, DateTime, Text, BigInteger, Integer, SmallInteger, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base
 import uuid
@@ -6,13 +6,56 @@ import datetime
 
 Base = declarative_base()
 
+GENESIS_HASH = "0" * 64
+DEFAULT_TENANT = "default"
+
 class AuditLog(Base):
+    """Voce dell'audit ledger: catena di hash per tenant (entry_hash = sha256(previous_hash + payload))"""
     __tablename__ = "gdpr_audit_logs"
+    __table_args__ = (UniqueConstraint("tenant_id", "sequence", name="uq_gdpr_audit_tenant_sequence"),)
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tenant_id = Column(String, nullable=False, default=DEFAULT_TENANT)
+    sequence = Column(BigInteger, nullable=False)
     event_type = Column(String, nullable=False)
     user_id = Column(UUID(as_uuid=True), nullable=True)
+    subject_ref = Column(String, nullable=True)  # id dell'interessato non UUID (es. intero), come testo
     details = Column(Text, nullable=True)
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
+    previous_hash = Column(String(64), nullable=False)
+    entry_hash = Column(String(64), nullable=False)
+    batch_id = Column(UUID(as_uuid=True), nullable=True, index=True)
+
+class AuditBatch(Base):
+    """Batch di voci scritte insieme: Merkle root degli entry hash"""
+    __tablename__ = "gdpr_audit_batches"
+    __table_args__ = (UniqueConstraint("tenant_id", "first_sequence", name="uq_gdpr_audit_batch_start"),)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tenant_id = Column(String, nullable=False, default=DEFAULT_TENANT)
+    first_sequence = Column(BigInteger, nullable=False)
+    last_sequence = Column(BigInteger, nullable=False)
+    entry_count = Column(Integer, nullable=False)
+    merkle_root = Column(String(64), nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class AuditMerkleNode(Base):
+    """Nodo completo dell'albero Merkle sull'intera catena (solo livelli >= 4: 16+ foglie)"""
+    __tablename__ = "gdpr_audit_merkle_nodes"
+    tenant_id = Column(String, primary_key=True)
+    level = Column(SmallInteger, primary_key=True)
+    node_index = Column(BigInteger, primary_key=True)
+    hash = Column(String(64), nullable=False)
+
+class AuditCheckpoint(Base):
+    """Root firmata (Ed25519) dell'albero sulle prime `tree_size` voci del tenant"""
+    __tablename__ = "gdpr_audit_checkpoints"
+    __table_args__ = (UniqueConstraint("tenant_id", "tree_size", name="uq_gdpr_audit_checkpoint_size"),)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tenant_id = Column(String, nullable=False, default=DEFAULT_TENANT)
+    tree_size = Column(BigInteger, nullable=False)
+    root_hash = Column(String(64), nullable=False)
+    signature = Column(Text, nullable=False)  # base64
+    key_id = Column(String(32), nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
 class SecurityLog(Base):
     __tablename__ = "gdpr_security_logs"
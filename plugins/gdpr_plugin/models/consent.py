@@ -1,6 +1,7 @@
 from sqlalchemy import Column, String, DateTime, Boolean
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base
+from core.database.base import PluginRegistry
 import uuid
 import datetime
 
@@ -8,8 +9,9 @@ Base = declarative_base()
 
 class ConsentRecord(Base):
     __tablename__ = "gdpr_consents"
+    __gdpr_export_name__ = "consents"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), nullable=False)
+    user_id = Column(UUID(as_uuid=True), nullable=False, index=True)
     consent_type = Column(String, nullable=False)
     given = Column(Boolean, default=True)
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
@@ -17,7 +19,12 @@ class ConsentRecord(Base):
 
 class ConsentWithdrawal(Base):
     __tablename__ = "gdpr_consent_withdrawals"
+    __gdpr_export_name__ = "consent_withdrawals"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), nullable=False)
+    user_id = Column(UUID(as_uuid=True), nullable=False, index=True)
     consent_type = Column(String, nullable=False)
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
+
+# Dati personali: inclusi negli export GDPR
+PluginRegistry.register_table("gdpr", ConsentRecord, subject_column="user_id")
+PluginRegistry.register_table("gdpr", ConsentWithdrawal, subject_column="user_id")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, Text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base
 import uuid
@@ -9,7 +9,21 @@ Base = declarative_base()
 class DataSubjectRequest(Base):
     __tablename__ = "gdpr_data_subject_requests"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), nullable=False)
+    user_id = Column(UUID(as_uuid=True), nullable=False, index=True)
     request_type = Column(String, nullable=False)  # e.g. 'access', 'erasure', 'portability'
-    status = Column(String, default="pending")
+    status = Column(String, default="pending", index=True)
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
+
+    # Export job (request_type 'portability'): artifact scritto a chunk con checkpoint
+    export_format = Column(String, nullable=True)
+    compression = Column(String, default="none")  # none / gzip / zstd
+    archive = Column(String, nullable=True)  # zip / tar per i formati un-file-per-entità
+    checkpoint = Column(Text, nullable=True)  # JSON: posizione dopo l'ultimo chunk persistito
+    bytes_written = Column(BigInteger, default=0)
+    rows_written = Column(Integer, default=0)
+    total_rows = Column(Integer, nullable=True)
+    artifact_path = Column(String, nullable=True)
+    error = Column(Text, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True, index=True)
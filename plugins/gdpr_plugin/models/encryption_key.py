@@ -0,0 +1,35 @@
+from sqlalchemy import Column, String, DateTime, Boolean, Text, Integer, BigInteger
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.declarative import declarative_base
+import uuid
+import datetime
+
+Base = declarative_base()
+
+class DataEncryptionKey(Base):
+    """Data key per tenant (envelope encryption): salvata solo cifrata con la master key"""
+    __tablename__ = "gdpr_data_keys"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kid = Column(String, nullable=False, unique=True, index=True)  # id nel ciphertext v1:<kid>:...
+    tenant_id = Column(String, nullable=True, index=True)
+    master_kid = Column(String, nullable=False)
+    wrapped_key = Column(Text, nullable=False)  # base64(nonce + AES-GCM(master, data key))
+    active = Column(Boolean, default=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+
+class KeyRotationJob(Base):
+    """Re-encryption delle colonne cifrate verso la data key attiva (riprendibile)"""
+    __tablename__ = "gdpr_key_rotation_jobs"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tenant_id = Column(String, nullable=True, index=True)
+    target_kid = Column(String, nullable=False)
+    status = Column(String, default="pending", nullable=False, index=True)  # pending/processing/completed/failed
+    checkpoint = Column(Text, nullable=True)  # JSON {"column": "tabella.colonna", "last_pk": ...}
+    rows_scanned = Column(BigInteger, default=0)
+    rows_reencrypted = Column(BigInteger, default=0)
+    chunks_done = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
@@ -1,3 +1,219 @@
-def anonymize_user_data(user_id):
-    # Logic for anonymizing user data for GDPR compliance
-    pass
+"""
+🧹 GDPR Anonymization Engine - Diritto all'oblio (Art. 17)
+
+L'erasure è set-based: per ogni tabella del PersonalDataRegistry con
+strategie `__anonymize__` si esegue un solo
+`UPDATE ... WHERE <subject> IN (:ids)` (o DELETE) per batch di interessati,
+tutto in un'unica transazione. Le richieste di erasure pendenti vengono
+elaborate insieme dal task notturno (`tasks/erasure.py`).
+"""
+import hashlib
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import Date, String, Text, case, cast, delete, func, literal, update
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+from core.database.base import PersonalDataRegistry
+from plugins.gdpr_plugin.models.data_subject import DataSubjectRequest
+from plugins.gdpr_plugin.services.audit_service import append_entries, audit_event
+from plugins.gdpr_plugin.services.export_service import coerce_subject
+from plugins.gdpr_plugin.utils.anonymization import DELETE, column_strategy, derive_salt, pseudonym
+
+logger = logging.getLogger(__name__)
+
+ERASURE_REQUEST_TYPE = "erasure"
+DEFAULT_ERASURE_BATCH_SIZE = 1000
+
+
+# ===== SQL EXPRESSIONS =====
+
+class sha256_hex(FunctionElement):
+    """sha256(testo) in esadecimale, stesso risultato di `utils.anonymization.hash_value`"""
+    type = String()
+    inherit_cache = True
+
+
+@compiles(sha256_hex, "postgresql")
+def _sha256_hex_pg(element, compiler, **kw):
+    return "encode(sha256(convert_to(%s, 'UTF8')), 'hex')" % compiler.process(element.clauses, **kw)
+
+
+@compiles(sha256_hex, "sqlite")
+def _sha256_hex_sqlite(element, compiler, **kw):
+    return "gdpr_sha256(%s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(sha256_hex)
+def _sha256_hex_default(element, compiler, **kw):
+    return "SHA2(%s, 256)" % compiler.process(element.clauses, **kw)
+
+
+class truncate_date(FunctionElement):
+    """Generalizzazione di date/datetime a year/month/day"""
+    inherit_cache = True
+
+    def __init__(self, granularity: str, column):
+        self.granularity = granularity
+        self.type = column.type
+        super().__init__(column)
+
+
+@compiles(truncate_date, "sqlite")
+def _truncate_date_sqlite(element, compiler, **kw):
+    fmt = {"year": "%Y-01-01", "month": "%Y-%m-01", "day": "%Y-%m-%d"}[element.granularity]
+    if not isinstance(element.type, Date):
+        fmt += " 00:00:00.000000"
+    return "strftime('%s', %s)" % (fmt, compiler.process(element.clauses, **kw))
+
+
+@compiles(truncate_date)
+def _truncate_date_default(element, compiler, **kw):
+    return "date_trunc('%s', %s)" % (element.granularity, compiler.process(element.clauses, **kw))
+
+
+def _register_sqlite_functions(db) -> None:
+    """SQLite non ha sha256: funzione Python registrata sulla connessione corrente"""
+    if db.get_bind().dialect.name != "sqlite":
+        return
+    raw = db.connection().connection.driver_connection
+    raw.create_function(
+        "gdpr_sha256", 1,
+        lambda text: None if text is None else hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        deterministic=True,
+    )
+
+
+def strategy_expression(column, spec, subject_column, subject_ids: List[Any], secret: str):
+    """Espressione SQL per `SET column = ...` secondo la strategia dichiarata"""
+    name, option = column_strategy(column, spec)
+    if name == "null":
+        return None
+    if name == "hash":
+        return sha256_hex(cast(column, Text) + literal(derive_salt(secret)))
+    if name == "pseudonym":
+        # Token per interessato calcolato in Python, applicato con un CASE sulla colonna soggetto;
+        # bind col tipo della colonna, così su EncryptedString il token viene cifrato
+        tokens = {subject_id: literal(pseudonym(subject_id, secret), type_=column.type) for subject_id in subject_ids}
+        return case((column.is_(None), None), else_=case(tokens, value=subject_column))
+    if option in ("year", "month", "day"):
+        return truncate_date(option, column)
+    if isinstance(column.type, (String, Text)):
+        return func.substr(column, 1, option)
+    return (column // option) * option
+
+
+# ===== ENGINE =====
+
+def get_anonymization_sources() -> List[Any]:
+    """Tabelle del PersonalDataRegistry con strategie di anonimizzazione"""
+    return [source for source in PersonalDataRegistry.get_sources() if source.anonymize]
+
+
+def _batches(values: List[Any], size: int) -> Iterable[List[Any]]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def anonymize_subjects(db, subject_ids: Iterable[Any], sources: Optional[List[Any]] = None,
+                       secret: str = "", batch_size: int = DEFAULT_ERASURE_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Anonimizza i dati di più interessati con UPDATE/DELETE set-based.
+
+    Non esegue commit: il chiamante decide il confine della transazione
+    (`process_pending_erasures` fa tutto in una).
+
+    Args:
+        db: Sessione SQLAlchemy
+        subject_ids: Id degli interessati
+        sources: PersonalDataSource da trattare (default: registry)
+        secret: Segreto per hash/pseudonimi (GDPR_ENCRYPTION_KEY)
+        batch_size: Interessati per statement
+
+    Returns:
+        Righe modificate per tabella
+    """
+    selected = get_anonymization_sources() if sources is None else sources
+    subject_ids = list(dict.fromkeys(subject_ids))
+    _register_sqlite_functions(db)
+    counts: Dict[str, int] = {}
+    for source in selected:
+        table = source.model.__table__
+        subject_column = table.c[source.subject_column]
+        ids = []
+        for subject_id in subject_ids:
+            try:
+                ids.append(coerce_subject(subject_column, subject_id))
+            except ValueError:
+                continue  # id di tipo incompatibile con la tabella
+        counts[source.name] = 0
+        for batch in _batches(ids, batch_size):
+            if source.anonymize == DELETE:
+                stmt = delete(table).where(subject_column.in_(batch))
+            else:
+                values = {
+                    column_name: strategy_expression(table.c[column_name], spec, subject_column, batch, secret)
+                    for column_name, spec in source.anonymize.items()
+                }
+                stmt = update(table).where(subject_column.in_(batch)).values(values)
+            counts[source.name] += db.execute(stmt).rowcount or 0
+    return counts
+
+
+def anonymize_user_data(db, user_id, secret: str = "", sources: Optional[List[Any]] = None) -> Dict[str, int]:
+    """Anonimizza un singolo interessato e fa commit (con la voce di audit)"""
+    counts = anonymize_subjects(db, [user_id], sources=sources, secret=secret)
+    audit_event(db, "data_erasure", user_id, {"rows": counts})
+    db.commit()
+    return counts
+
+
+# ===== ERASURE REQUESTS =====
+
+def create_erasure_request(db, user_id) -> DataSubjectRequest:
+    """Registra una richiesta di erasure: verrà elaborata dal batch notturno"""
+    user_id = user_id if isinstance(user_id, uuid.UUID) else uuid.UUID(str(user_id))
+    request = DataSubjectRequest(user_id=user_id, request_type=ERASURE_REQUEST_TYPE, status="pending")
+    db.add(request)
+    db.commit()
+    db.refresh(request)
+    return request
+
+
+def process_pending_erasures(db, secret: str = "", limit: int = 10000,
+                             batch_size: int = DEFAULT_ERASURE_BATCH_SIZE,
+                             sources: Optional[List[Any]] = None) -> Dict[str, Any]:
+    """
+    Elabora insieme le richieste di erasure pendenti, in un'unica transazione.
+
+    In caso di errore la transazione viene annullata e le richieste restano
+    `pending` per il run successivo.
+    """
+    query = db.query(DataSubjectRequest).filter(
+        DataSubjectRequest.request_type == ERASURE_REQUEST_TYPE,
+        DataSubjectRequest.status == "pending",
+    ).order_by(DataSubjectRequest.timestamp).limit(limit)
+    # ✅ Più worker in parallelo non elaborano le stesse richieste
+    requests = query.with_for_update(skip_locked=True).all()
+    if not requests:
+        return {"requests": 0, "subjects": 0, "rows": {}}
+
+    subject_ids = list(dict.fromkeys(request.user_id for request in requests))
+    try:
+        counts = anonymize_subjects(db, subject_ids, sources=sources, secret=secret, batch_size=batch_size)
+        now = datetime.utcnow()
+        for request in requests:
+            request.status = "completed"
+            request.completed_at = now
+        # Una voce per richiesta, nella stessa transazione: niente erasure senza audit
+        append_entries(db, [{"event_type": "data_erasure", "user_id": request.user_id, "timestamp": now,
+                             "details": {"request_id": str(request.id), "rows": counts}} for request in requests])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    logger.info(f"🧹 Erasure batch: {len(requests)} richieste, {len(subject_ids)} interessati, {counts}")
+    return {"requests": len(requests), "subjects": len(subject_ids), "rows": counts}
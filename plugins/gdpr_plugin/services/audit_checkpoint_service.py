@@ -0,0 +1,303 @@
+"""
+🌳 GDPR Audit Checkpoints - Merkle tree sull'audit ledger e inclusion proof
+
+- l'albero copre l'intera catena del tenant (foglia i = voce con
+  sequence i + 1); i nodi completi sono immutabili e vengono salvati in
+  `gdpr_audit_merkle_nodes` a partire dal livello 4 (blocchi da 16 foglie)
+- ogni checkpoint salva la root sulle prime `tree_size` voci, firmata con
+  Ed25519: chi ha la chiave pubblica può verificarla senza accesso al DB
+- un inclusion proof costa O(log n) letture di nodi (più un blocco da 16
+  entry hash) invece di ripercorrere la catena
+"""
+import base64
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from sqlalchemy import func, insert, select, text
+
+from plugins.gdpr_plugin.models.audit import DEFAULT_TENANT, AuditCheckpoint, AuditLog, AuditMerkleNode
+from plugins.gdpr_plugin.services.audit_service import get_chain_head
+from plugins.gdpr_plugin.utils.merkle import inclusion_path, leaf_hash, node_hash, root_of_leaves, split_point
+
+logger = logging.getLogger(__name__)
+
+SIGNING_KEY_INFO = b"gdpr-audit-signing/ed25519"
+MIN_STORED_LEVEL = 4
+BLOCK_SIZE = 1 << MIN_STORED_LEVEL
+_BUILD_CHUNK = 10_000
+
+
+# ===== SIGNING =====
+
+class AuditSigner:
+    """Firma Ed25519 delle root dei checkpoint"""
+
+    def __init__(self, private_key: Ed25519PrivateKey):
+        self._private_key = private_key
+        self.public_key = private_key.public_key()
+        raw = self.public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+        self.key_id = hashlib.sha256(raw).hexdigest()[:16]
+
+    @classmethod
+    def from_secret(cls, secret: str) -> "AuditSigner":
+        """Chiave dedicata: seed Ed25519 di 32 byte hex/base64, altrimenti derivato (HKDF) dal segreto"""
+        for decode in (bytes.fromhex, base64.b64decode):
+            try:
+                seed = decode(secret)
+            except ValueError:
+                continue
+            if len(seed) == 32:
+                return cls(Ed25519PrivateKey.from_private_bytes(seed))
+        return cls.derived_from(secret)
+
+    @classmethod
+    def derived_from(cls, secret: str) -> "AuditSigner":
+        """Seed sempre derivato (HKDF, info di firma): per segreti condivisi con altri usi, es. la master key"""
+        seed = HKDF(algorithm=hashes.SHA256(), length=32, salt=None,
+                    info=SIGNING_KEY_INFO).derive(secret.encode())
+        return cls(Ed25519PrivateKey.from_private_bytes(seed))
+
+    def sign(self, message: bytes) -> str:
+        return base64.b64encode(self._private_key.sign(message)).decode()
+
+    def public_key_pem(self) -> str:
+        return self.public_key.public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+
+
+_signer: Optional[AuditSigner] = None
+
+
+def get_audit_signer() -> AuditSigner:
+    """
+    Signer di default: GDPR_AUDIT_SIGNING_KEY; in mancanza, derivato con HKDF
+    da GDPR_ENCRYPTION_KEY (mai i suoi byte usati direttamente come seed).
+    """
+    global _signer
+    if _signer is None:
+        from core.config import settings
+        if settings.GDPR_AUDIT_SIGNING_KEY:
+            _signer = AuditSigner.from_secret(settings.GDPR_AUDIT_SIGNING_KEY)
+        else:
+            logger.warning("⚠️ GDPR_AUDIT_SIGNING_KEY non impostata: chiave di firma derivata da GDPR_ENCRYPTION_KEY")
+            _signer = AuditSigner.derived_from(settings.GDPR_ENCRYPTION_KEY)
+    return _signer
+
+
+def set_audit_signer(signer: Optional[AuditSigner]) -> None:
+    global _signer
+    _signer = signer
+
+
+def checkpoint_message(tenant_id: str, tree_size: int, root_hash: str, created_at: datetime) -> bytes:
+    """Messaggio firmato: formato testuale stabile, verificabile anche fuori dall'app"""
+    return f"gdpr-audit-checkpoint/v1\n{tenant_id}\n{tree_size}\n{root_hash}\n{created_at.isoformat()}".encode()
+
+
+def verify_checkpoint_signature(public_key_pem: str, checkpoint: Dict[str, Any]) -> bool:
+    public_key = serialization.load_pem_public_key(public_key_pem.encode())
+    if not isinstance(public_key, Ed25519PublicKey):
+        return False
+    message = checkpoint_message(checkpoint["tenant_id"], checkpoint["tree_size"], checkpoint["root_hash"],
+                                 datetime.fromisoformat(checkpoint["created_at"]))
+    try:
+        public_key.verify(base64.b64decode(checkpoint["signature"]), message)
+        return True
+    except Exception:
+        return False
+
+
+# ===== TREE =====
+
+class MerkleTreeReader:
+    """Root dei sotto-alberi della catena: nodi salvati + blocchi di foglie in cache"""
+
+    def __init__(self, db, tenant_id: str):
+        self.db = db
+        self.tenant_id = tenant_id
+        self._blocks: Dict[int, List[bytes]] = {}
+
+    def leaves(self, start: int, size: int) -> List[bytes]:
+        block = start // BLOCK_SIZE
+        leaves = self._blocks.get(block)
+        if leaves is None:
+            first = block * BLOCK_SIZE + 1
+            leaves = self._blocks[block] = [leaf_hash(h) for h in self.db.execute(
+                select(AuditLog.entry_hash)
+                .where(AuditLog.tenant_id == self.tenant_id, AuditLog.sequence.between(first, first + BLOCK_SIZE - 1))
+                .order_by(AuditLog.sequence)
+            ).scalars()]
+        offset = start - block * BLOCK_SIZE
+        if offset + size <= len(leaves):
+            return leaves[offset:offset + size]
+        raise LookupError(f"Foglie {start}-{start + size - 1} non presenti per {self.tenant_id}")
+
+    def node(self, level: int, index: int) -> bytes:
+        value = self.db.execute(select(AuditMerkleNode.hash).where(
+            AuditMerkleNode.tenant_id == self.tenant_id,
+            AuditMerkleNode.level == level, AuditMerkleNode.node_index == index,
+        )).scalar()
+        if value is None:
+            raise LookupError(f"Nodo Merkle {level}/{index} non costruito per {self.tenant_id}")
+        return bytes.fromhex(value)
+
+    def subtree(self, start: int, size: int) -> bytes:
+        if size >= BLOCK_SIZE and size & (size - 1) == 0 and start % size == 0:
+            return self.node(size.bit_length() - 1, start // size)
+        if start // BLOCK_SIZE == (start + size - 1) // BLOCK_SIZE:
+            return root_of_leaves(self.leaves(start, size))
+        k = split_point(size)
+        return node_hash(self.subtree(start, k), self.subtree(start + k, size - k))
+
+
+def _built_count(db, tenant_id: str, level: int) -> int:
+    """Nodi completi già salvati al livello (sono sempre un prefisso contiguo)"""
+    last = db.execute(select(func.max(AuditMerkleNode.node_index)).where(
+        AuditMerkleNode.tenant_id == tenant_id, AuditMerkleNode.level == level)).scalar()
+    return 0 if last is None else last + 1
+
+
+def build_merkle_nodes(db, tenant_id: str, tree_size: int) -> int:
+    """
+    Salva i nodi completi mancanti per le prime `tree_size` voci.
+
+    Incrementale: legge solo le voci dopo l'ultimo blocco costruito e, per
+    ogni livello, combina i nodi nuovi (in memoria) con quelli salvati.
+    Non esegue commit.
+    """
+    reader = MerkleTreeReader(db, tenant_id)
+    new_nodes: Dict[Tuple[int, int], bytes] = {}
+
+    # Livello 4: blocchi completi da 16 foglie, dalla catena in streaming
+    first_block, last_block = _built_count(db, tenant_id, MIN_STORED_LEVEL), tree_size // BLOCK_SIZE
+    if last_block > first_block:
+        rows = db.execute(
+            select(AuditLog.entry_hash)
+            .where(AuditLog.tenant_id == tenant_id,
+                   AuditLog.sequence.between(first_block * BLOCK_SIZE + 1, last_block * BLOCK_SIZE))
+            .order_by(AuditLog.sequence).execution_options(yield_per=_BUILD_CHUNK)
+        ).scalars()
+        block, leaves = first_block, []
+        for entry_hash in rows:
+            leaves.append(leaf_hash(entry_hash))
+            if len(leaves) == BLOCK_SIZE:
+                new_nodes[(MIN_STORED_LEVEL, block)] = root_of_leaves(leaves)
+                block, leaves = block + 1, []
+        if block != last_block:
+            raise LookupError(f"Catena {tenant_id} incompleta: blocco {block} mancante")
+
+    # Livelli superiori: ogni nodo dai due figli
+    level = MIN_STORED_LEVEL + 1
+    while tree_size >> level:
+        target = tree_size >> level
+        for index in range(_built_count(db, tenant_id, level), target):
+            children = [new_nodes.get((level - 1, child)) or reader.node(level - 1, child)
+                        for child in (2 * index, 2 * index + 1)]
+            new_nodes[(level, index)] = node_hash(*children)
+        level += 1
+
+    if new_nodes:
+        db.execute(insert(AuditMerkleNode.__table__), [
+            {"tenant_id": tenant_id, "level": lvl, "node_index": index, "hash": value.hex()}
+            for (lvl, index), value in sorted(new_nodes.items())
+        ])
+    return len(new_nodes)
+
+
+# ===== CHECKPOINTS =====
+
+def checkpoint_to_dict(checkpoint: AuditCheckpoint) -> Dict[str, Any]:
+    return {
+        "tenant_id": checkpoint.tenant_id,
+        "tree_size": checkpoint.tree_size,
+        "root_hash": checkpoint.root_hash,
+        "signature": checkpoint.signature,
+        "key_id": checkpoint.key_id,
+        "created_at": checkpoint.created_at.isoformat(),
+    }
+
+
+def get_latest_checkpoint(db, tenant_id: Optional[str] = None, min_tree_size: int = 0) -> Optional[AuditCheckpoint]:
+    return db.execute(
+        select(AuditCheckpoint)
+        .where(AuditCheckpoint.tenant_id == (tenant_id or DEFAULT_TENANT), AuditCheckpoint.tree_size >= min_tree_size)
+        .order_by(AuditCheckpoint.tree_size.desc()).limit(1)
+    ).scalar()
+
+
+def create_checkpoint(db, tenant_id: Optional[str] = None,
+                      signer: Optional[AuditSigner] = None) -> Optional[AuditCheckpoint]:
+    """
+    Costruisce i nodi mancanti e firma la root sull'intera catena attuale.
+
+    Restituisce l'ultimo checkpoint se la catena non è cresciuta, None se è vuota.
+    """
+    tenant = tenant_id or DEFAULT_TENANT
+    signer = signer or get_audit_signer()
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"gdpr_audit_checkpoint:{tenant}"})
+    tree_size = get_chain_head(db, tenant)[0]
+    latest = get_latest_checkpoint(db, tenant)
+    if tree_size == 0 or (latest is not None and latest.tree_size == tree_size):
+        return latest
+
+    built = build_merkle_nodes(db, tenant, tree_size)
+    root_hash = MerkleTreeReader(db, tenant).subtree(0, tree_size).hex()
+    created_at = datetime.utcnow()
+    checkpoint = AuditCheckpoint(
+        tenant_id=tenant, tree_size=tree_size, root_hash=root_hash, created_at=created_at,
+        signature=signer.sign(checkpoint_message(tenant, tree_size, root_hash, created_at)),
+        key_id=signer.key_id,
+    )
+    db.add(checkpoint)
+    db.commit()
+    logger.info(f"🌳 Checkpoint audit {tenant}: {tree_size} voci, {built} nodi nuovi, root {root_hash[:12]}…")
+    return checkpoint
+
+
+def get_inclusion_proof(db, entry_id, tree_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Inclusion proof di una voce rispetto a un checkpoint firmato.
+
+    Args:
+        entry_id: ID della voce in gdpr_audit_logs
+        tree_size: Checkpoint da usare (default: l'ultimo)
+
+    Raises:
+        LookupError: voce o checkpoint inesistenti, voce non ancora coperta
+    """
+    entry = db.get(AuditLog, entry_id)
+    if entry is None:
+        raise LookupError(f"Voce di audit non trovata: {entry_id}")
+    if tree_size is None:
+        checkpoint = get_latest_checkpoint(db, entry.tenant_id)
+    else:
+        checkpoint = db.execute(select(AuditCheckpoint).where(
+            AuditCheckpoint.tenant_id == entry.tenant_id, AuditCheckpoint.tree_size == tree_size)).scalar()
+    if checkpoint is None or checkpoint.tree_size < entry.sequence:
+        raise LookupError(f"Voce {entry.sequence} non ancora coperta da un checkpoint")
+
+    reader = MerkleTreeReader(db, entry.tenant_id)
+    path = inclusion_path(entry.sequence - 1, checkpoint.tree_size, reader.subtree)
+    return {
+        "entry": {
+            "id": str(entry.id),
+            "tenant_id": entry.tenant_id,
+            "sequence": entry.sequence,
+            "event_type": entry.event_type,
+            "user_id": str(entry.user_id) if entry.user_id else entry.subject_ref,
+            "details": entry.details,
+            "timestamp": entry.timestamp.isoformat() if entry.timestamp else None,
+            "previous_hash": entry.previous_hash,
+            "entry_hash": entry.entry_hash,
+        },
+        "leaf_index": entry.sequence - 1,
+        "proof": [node.hex() for node in path],
+        "checkpoint": checkpoint_to_dict(checkpoint),
+    }
@@ -1,3 +1,384 @@
-def log_audit_event(event_type, user_id=None, details=None):
-    # Logic for logging audit events securely
-    pass
+"""
+📜 GDPR Audit Ledger - Audit trail a prova di manomissione (Art. 5(2), 30)
+
+- una catena di hash per tenant, persistita in `gdpr_audit_logs`:
+  `entry_hash = sha256(previous_hash + payload canonico)`, `sequence`
+  contigua da 1 (vincolo unico tenant/sequence)
+- le scritture sono serializzate per tenant con un advisory lock
+  transazionale (PostgreSQL); sugli altri DB il vincolo unico fa fallire
+  l'append concorrente, che viene ritentato
+- le voci si scrivono a batch (insert multiplo) e ogni batch salva la
+  Merkle root degli entry hash in `gdpr_audit_batches`
+- gli id dell'interessato UUID vanno in `user_id`, gli altri (es. interi)
+  in `subject_ref` come testo; nel payload firmato entrambi come stringa
+- export, erasure e rotazione delle chiavi scrivono la propria voce nella
+  stessa transazione dell'operazione (`audit_event`)
+- `verify_audit_chain` divide la catena in segmenti allineati ai batch e
+  li verifica in parallelo su più processi
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import create_engine, insert, select, text
+from sqlalchemy.exc import IntegrityError
+
+from plugins.gdpr_plugin.models.audit import DEFAULT_TENANT, GENESIS_HASH, AuditBatch, AuditLog
+from plugins.gdpr_plugin.services.export_serializers import json_default
+from plugins.gdpr_plugin.utils.merkle import merkle_root
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENT_SIZE = 100_000
+APPEND_RETRIES = 5
+_MAX_REPORTED_ERRORS = 20
+
+
+# ===== HASHING =====
+
+def serialize_details(details: Any) -> Optional[str]:
+    if details is None or isinstance(details, str):
+        return details
+    return json.dumps(details, sort_keys=True, default=json_default)
+
+
+def canonical_payload(tenant_id: str, sequence: int, event_type: str, user_id: Any,
+                      details: Optional[str], timestamp: Optional[datetime]) -> bytes:
+    """Serializzazione stabile della voce (lista JSON compatta, ordine fisso dei campi)"""
+    return json.dumps(
+        [tenant_id, sequence, event_type, None if user_id is None else str(user_id), details,
+         timestamp.isoformat() if timestamp else None],
+        separators=(",", ":"), ensure_ascii=False,
+    ).encode("utf-8")
+
+
+def compute_entry_hash(previous_hash: str, payload: bytes) -> str:
+    return hashlib.sha256(bytes.fromhex(previous_hash) + payload).hexdigest()
+
+
+def split_subject(value) -> Tuple[Optional[uuid.UUID], Optional[str]]:
+    """Id dell'interessato → (user_id UUID, subject_ref testuale): uno solo è valorizzato"""
+    if value is None or isinstance(value, uuid.UUID):
+        return value, None
+    try:
+        return uuid.UUID(str(value)), None
+    except ValueError:
+        return None, str(value)
+
+
+# ===== APPEND =====
+
+def _lock_chain(db, tenant_id: str) -> None:
+    """Serializza gli append del tenant fino a fine transazione (PostgreSQL)"""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"gdpr_audit:{tenant_id}"})
+
+
+def get_chain_head(db, tenant_id: Optional[str] = None) -> Tuple[int, str]:
+    """(ultima sequence, ultimo entry_hash) della catena del tenant"""
+    row = db.execute(
+        select(AuditLog.sequence, AuditLog.entry_hash)
+        .where(AuditLog.tenant_id == (tenant_id or DEFAULT_TENANT))
+        .order_by(AuditLog.sequence.desc()).limit(1)
+    ).first()
+    return (row.sequence, row.entry_hash) if row else (0, GENESIS_HASH)
+
+
+def append_entries(db, events: Iterable[Dict[str, Any]], tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Accoda un batch di eventi alla catena del tenant.
+
+    Non esegue commit: il lock (PostgreSQL) resta attivo fino al commit del
+    chiamante, che rende il batch visibile in modo atomico.
+
+    Args:
+        db: Sessione SQLAlchemy
+        events: dict con event_type, user_id, details (opz. timestamp)
+        tenant_id: Catena di destinazione (default: "default")
+
+    Returns:
+        Le voci scritte, con sequence ed entry_hash
+    """
+    tenant = tenant_id or DEFAULT_TENANT
+    _lock_chain(db, tenant)
+    sequence, previous_hash = get_chain_head(db, tenant)
+    batch_id = uuid.uuid4()
+    rows = []
+    for event in events:
+        sequence += 1
+        details = serialize_details(event.get("details"))
+        timestamp = event.get("timestamp") or datetime.utcnow()
+        user_id, subject_ref = split_subject(event.get("user_id"))
+        entry_hash = compute_entry_hash(previous_hash, canonical_payload(
+            tenant, sequence, event["event_type"], user_id or subject_ref, details, timestamp))
+        rows.append({
+            "id": uuid.uuid4(), "tenant_id": tenant, "sequence": sequence, "event_type": event["event_type"],
+            "user_id": user_id, "subject_ref": subject_ref, "details": details, "timestamp": timestamp,
+            "previous_hash": previous_hash, "entry_hash": entry_hash, "batch_id": batch_id,
+        })
+        previous_hash = entry_hash
+    if not rows:
+        return []
+    db.execute(insert(AuditBatch.__table__).values(
+        id=batch_id, tenant_id=tenant, first_sequence=rows[0]["sequence"], last_sequence=sequence,
+        entry_count=len(rows), merkle_root=merkle_root(row["entry_hash"] for row in rows),
+        created_at=datetime.utcnow(),
+    ))
+    db.execute(insert(AuditLog.__table__), rows)
+    return rows
+
+
+def append_with_retry(session_factory, events: List[Dict[str, Any]], tenant_id: Optional[str] = None,
+                      retries: int = APPEND_RETRIES) -> List[Dict[str, Any]]:
+    """Append + commit su una sessione propria, ritentato se un altro writer ha preso la stessa sequence"""
+    for attempt in range(retries):
+        with session_factory() as db:
+            try:
+                rows = append_entries(db, events, tenant_id)
+                db.commit()
+                return rows
+            except IntegrityError:
+                db.rollback()
+                if attempt == retries - 1:
+                    raise
+                time.sleep(0.01 * (attempt + 1))
+    return []
+
+
+def audit_event(db, event_type: str, user_id=None, details=None, tenant_id=None) -> Dict[str, Any]:
+    """Voce nella transazione del chiamante, senza commit: scritta solo se l'operazione va a buon fine"""
+    event = {"event_type": event_type, "user_id": user_id, "details": details}
+    return append_entries(db, [event], None if tenant_id is None else str(tenant_id))[0]
+
+
+def log_audit_event(event_type, user_id=None, details=None, tenant_id=None, db=None) -> Dict[str, Any]:
+    """
+    Registra un evento nell'audit ledger e fa commit.
+
+    Con `db` l'evento entra nella transazione del chiamante (commit incluso);
+    senza, viene scritto su una sessione dedicata.
+    """
+    event = {"event_type": event_type, "user_id": user_id, "details": details}
+    if db is not None:
+        rows = append_entries(db, [event], tenant_id)
+        db.commit()
+        return rows[0]
+    from core.database import SessionLocal
+    return append_with_retry(SessionLocal, [event], tenant_id)[0]
+
+
+class AuditBatchWriter:
+    """
+    Writer unico in background: raccoglie gli eventi in coda e li scrive a
+    batch (fino a `max_batch` voci o ogni `max_delay` secondi), un append
+    per tenant per batch. `flush()` attende che la coda sia scritta.
+    """
+
+    def __init__(self, session_factory, max_batch: int = 500, max_delay: float = 0.2):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="gdpr-audit-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, event_type, user_id=None, details=None, tenant_id=None) -> None:
+        self._queue.put({"event_type": event_type, "user_id": user_id, "details": details,
+                         "tenant_id": tenant_id, "timestamp": datetime.utcnow()})
+
+    def flush(self) -> None:
+        self._queue.join()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        running = True
+        while running:
+            item = self._queue.get()
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while item is not None and len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(item)
+            if batch[-1] is None:
+                running = False
+            events = [event for event in batch if event is not None]
+            by_tenant: Dict[Optional[str], List[Dict[str, Any]]] = {}
+            for event in events:
+                by_tenant.setdefault(event.pop("tenant_id"), []).append(event)
+            for tenant, tenant_events in by_tenant.items():
+                try:
+                    append_with_retry(self.session_factory, tenant_events, tenant)
+                except Exception as e:
+                    logger.error(f"❌ Audit ledger: {len(tenant_events)} eventi non scritti ({tenant}): {e}")
+            for _ in batch:
+                self._queue.task_done()
+
+
+# ===== VERIFICATION =====
+
+@dataclass
+class ChainVerification:
+    """Esito della verifica di una catena"""
+    tenant_id: str
+    entries: int = 0
+    batches: int = 0
+    segments: int = 0
+    seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"tenant_id": self.tenant_id, "valid": self.valid, "entries": self.entries,
+                "batches": self.batches, "segments": self.segments, "seconds": round(self.seconds, 3),
+                "errors": self.errors}
+
+
+def plan_segments(connection, tenant_id: str, segment_size: int = DEFAULT_SEGMENT_SIZE,
+                  errors: Optional[List[str]] = None) -> List[List[Tuple[int, int, str]]]:
+    """Segmenti di batch consecutivi con circa `segment_size` voci ciascuno"""
+    segments, current, size, expected = [], [], 0, 1
+    rows = connection.execute(
+        select(AuditBatch.first_sequence, AuditBatch.last_sequence, AuditBatch.merkle_root)
+        .where(AuditBatch.tenant_id == tenant_id).order_by(AuditBatch.first_sequence)
+    )
+    for first, last, root in rows:
+        if first != expected and errors is not None:
+            errors.append(f"batch {first}-{last}: atteso inizio a sequence {expected}")
+        expected = last + 1
+        current.append((first, last, root))
+        size += last - first + 1
+        if size >= segment_size:
+            segments.append(current)
+            current, size = [], 0
+    if current:
+        segments.append(current)
+    return segments
+
+
+_worker_engines: Dict[str, Any] = {}
+
+
+def _worker_engine(database_url: str):
+    engine = _worker_engines.get(database_url)
+    if engine is None:
+        engine = _worker_engines[database_url] = create_engine(database_url)
+    return engine
+
+
+def verify_segment(bind, tenant_id: str, batches: List[Tuple[int, int, str]]) -> Dict[str, Any]:
+    """
+    Verifica un segmento: sequence contigue, collegamento previous_hash,
+    ricalcolo di ogni entry_hash e Merkle root di ogni batch.
+    """
+    if isinstance(bind, str):
+        bind = _worker_engine(bind)
+    first_seq, last_seq = batches[0][0], batches[-1][1]
+    errors: List[str] = []
+    checked = 0
+    with bind.connect() as connection:
+        if first_seq == 1:
+            previous_hash = GENESIS_HASH
+        else:
+            previous_hash = connection.execute(
+                select(AuditLog.entry_hash).where(AuditLog.tenant_id == tenant_id, AuditLog.sequence == first_seq - 1)
+            ).scalar()
+            if previous_hash is None:
+                errors.append(f"sequence {first_seq - 1}: voce mancante")
+                previous_hash = GENESIS_HASH
+        rows = connection.execution_options(stream_results=True, yield_per=10_000).execute(
+            select(AuditLog.sequence, AuditLog.event_type, AuditLog.user_id, AuditLog.subject_ref, AuditLog.details,
+                   AuditLog.timestamp, AuditLog.previous_hash, AuditLog.entry_hash)
+            .where(AuditLog.tenant_id == tenant_id, AuditLog.sequence.between(first_seq, last_seq))
+            .order_by(AuditLog.sequence)
+        )
+        batch_iter = iter(batches)
+        batch_first, batch_last, batch_root = next(batch_iter)
+        batch_hashes: List[str] = []
+        expected = first_seq
+        for sequence, event_type, user_id, subject_ref, details, timestamp, stored_previous, entry_hash in rows:
+            if sequence != expected:
+                errors.append(f"sequence {expected}: voce mancante (trovata {sequence})")
+            if stored_previous != previous_hash:
+                errors.append(f"sequence {sequence}: previous_hash non collegato")
+            payload = canonical_payload(tenant_id, sequence, event_type, user_id or subject_ref, details, timestamp)
+            if compute_entry_hash(stored_previous, payload) != entry_hash:
+                errors.append(f"sequence {sequence}: entry_hash non valido (voce modificata)")
+            while sequence > batch_last:
+                errors.append(f"batch {batch_first}-{batch_last}: voci mancanti")
+                batch_first, batch_last, batch_root = next(batch_iter, (None, float("inf"), None))
+                batch_hashes = []
+            batch_hashes.append(entry_hash)
+            if sequence == batch_last:
+                if merkle_root(batch_hashes) != batch_root:
+                    errors.append(f"batch {batch_first}-{batch_last}: Merkle root non valida")
+                batch_hashes = []
+                batch_first, batch_last, batch_root = next(batch_iter, (None, float("inf"), None))
+            previous_hash, expected = entry_hash, sequence + 1
+            checked += 1
+            if len(errors) >= _MAX_REPORTED_ERRORS:
+                break
+    if expected <= last_seq and len(errors) < _MAX_REPORTED_ERRORS:
+        errors.append(f"sequence {expected}-{last_seq}: voci mancanti")
+    return {"entries": checked, "batches": len(batches), "errors": errors}
+
+
+def verify_audit_chain(bind, tenant_id: Optional[str] = None, max_workers: Optional[int] = None,
+                       segment_size: int = DEFAULT_SEGMENT_SIZE) -> ChainVerification:
+    """
+    Verifica la catena del tenant in parallelo.
+
+    Args:
+        bind: Engine SQLAlchemy (i worker aprono connessioni proprie sullo stesso URL)
+        tenant_id: Catena da verificare (default: "default")
+        max_workers: Processi worker (default: CPU disponibili; 1 = nel processo corrente)
+        segment_size: Voci per segmento (i segmenti sono allineati ai batch)
+    """
+    started = time.monotonic()
+    tenant = tenant_id or DEFAULT_TENANT
+    result = ChainVerification(tenant_id=tenant)
+    with bind.connect() as connection:
+        segments = plan_segments(connection, tenant, segment_size, result.errors)
+        head = get_chain_head(connection, tenant)[0]
+    if segments and segments[-1][-1][1] != head:
+        result.errors.append(f"ultima voce {head} fuori dai batch (ultimo batch: {segments[-1][-1][1]})")
+    result.segments = len(segments)
+
+    workers = max_workers or os.cpu_count() or 1
+    if workers <= 1 or len(segments) <= 1:
+        outcomes = [verify_segment(bind, tenant, segment) for segment in segments]
+    else:
+        url = bind.url.render_as_string(hide_password=False)
+        with ProcessPoolExecutor(min(workers, len(segments))) as executor:
+            outcomes = list(executor.map(verify_segment, [url] * len(segments), [tenant] * len(segments), segments))
+    for outcome in outcomes:
+        result.entries += outcome["entries"]
+        result.batches += outcome["batches"]
+        result.errors.extend(outcome["errors"])
+    result.seconds = time.monotonic() - started
+    level = logging.INFO if result.valid else logging.ERROR
+    logger.log(level, f"📜 Audit chain {tenant}: {result.entries} voci, {result.segments} segmenti, "
+                      f"{'OK' if result.valid else f'{len(result.errors)} errori'} in {result.seconds:.1f}s")
+    return result
+
+
+def list_audit_tenants(bind) -> List[str]:
+    with bind.connect() as connection:
+        return list(connection.execute(select(AuditBatch.tenant_id).distinct()).scalars())
@@ -0,0 +1,282 @@
+"""
+⏳ GDPR Export Jobs - Export asincroni, a chunk e riprendibili
+
+Le richieste di export diventano job `DataSubjectRequest` elaborati da un
+worker Celery: l'artifact viene scritto in GDPR_EXPORT_DIR a chunk e dopo
+ogni chunk si salva un checkpoint (offset su file + posizione nelle
+sorgenti). Se il worker riparte, il job riprende dall'ultimo checkpoint
+invece di ricominciare.
+
+Un lock per richiesta (`flock` su `<artifact>.lock`) impedisce a un task
+riconsegnato di scrivere lo stesso `.part` insieme alla prima esecuzione;
+il sistema operativo lo rilascia se il worker muore.
+"""
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # non POSIX: nessun lock tra processi
+    fcntl = None
+
+from plugins.gdpr_plugin.models.data_subject import DataSubjectRequest
+from plugins.gdpr_plugin.services.audit_service import audit_event
+from plugins.gdpr_plugin.services.export_service import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_EXPORT_WORKERS,
+    build_export_meta,
+    count_export_rows,
+    export_extension,
+    get_export_sources,
+    iter_export_segments,
+    resolve_compression,
+    snapshot_session,
+)
+from plugins.gdpr_plugin.services.export_serializers import StreamCompressor, get_serializer, json_default
+
+logger = logging.getLogger(__name__)
+
+EXPORT_REQUEST_TYPE = "portability"
+
+STATUS_PENDING = "pending"
+STATUS_PROCESSING = "processing"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+STATUS_EXPIRED = "expired"
+
+
+class ExportJobBusy(Exception):
+    """Il job è già in elaborazione in un altro worker"""
+
+
+def _as_uuid(value) -> uuid.UUID:
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def create_export_job(db, user_id, fmt: str = "json", compress: bool = False,
+                      compression: Optional[str] = None, archive: str = "zip") -> DataSubjectRequest:
+    """Crea il job di export; l'elaborazione avviene nel worker"""
+    compression = resolve_compression(compress, compression)
+    get_serializer(fmt, compression, archive)  # valida formato/compressione/archivio
+    job = DataSubjectRequest(
+        user_id=_as_uuid(user_id),
+        request_type=EXPORT_REQUEST_TYPE,
+        status=STATUS_PENDING,
+        export_format=fmt,
+        compression=compression,
+        archive=archive,
+        bytes_written=0,
+        rows_written=0,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_export_job(db, job_id) -> Optional[DataSubjectRequest]:
+    job = db.get(DataSubjectRequest, _as_uuid(job_id))
+    if job is None or job.request_type != EXPORT_REQUEST_TYPE:
+        return None
+    return job
+
+
+def artifact_path(export_dir, job: DataSubjectRequest) -> Path:
+    """Path finale dell'artifact (durante la scrittura: suffisso .part)"""
+    extension = export_extension(job.export_format, job.compression or "none", job.archive or "zip")
+    return Path(export_dir) / f"{job.id}.{extension}"
+
+
+def _lock_path(final_path: Path) -> Path:
+    return final_path.with_name(final_path.name + ".lock")
+
+
+def _claim(path: Path):
+    """Lock esclusivo non bloccante sul job; ExportJobBusy se è di un altro processo"""
+    handle = open(path, "a+b")
+    if fcntl is not None:
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            raise ExportJobBusy(f"Export {path.stem} già in elaborazione")
+    return handle
+
+
+def run_export_job(db, job_id, export_dir, retention_hours: int = 72,
+                   sources: Optional[List[Any]] = None,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   checkpoint_every: int = 1,
+                   max_workers: int = DEFAULT_EXPORT_WORKERS) -> DataSubjectRequest:
+    """
+    Elabora (o riprende) un job di export.
+
+    Args:
+        db: Sessione SQLAlchemy
+        job_id: ID del DataSubjectRequest
+        export_dir: Directory degli artifact (GDPR_EXPORT_DIR)
+        retention_hours: Validità dell'artifact completato
+        sources: Sorgenti da esportare (default: quelle registrate)
+        chunk_size: Righe per chunk
+        checkpoint_every: Chunk scritti tra due checkpoint persistiti
+        max_workers: Sorgenti lette in parallelo
+
+    Returns:
+        Il job aggiornato
+
+    Raises:
+        ExportJobBusy: il job è in elaborazione in un altro worker
+    """
+    job = get_export_job(db, job_id)
+    if job is None:
+        raise ValueError(f"Export job non trovato: {job_id}")
+    if job.status in (STATUS_COMPLETED, STATUS_EXPIRED):
+        return job
+
+    final_path = artifact_path(export_dir, job)
+    final_path.parent.mkdir(parents=True, exist_ok=True)
+    lock = _claim(_lock_path(final_path))
+    try:
+        # Stato riletto col lock preso: la prima esecuzione può aver già finito
+        db.refresh(job)
+        if job.status in (STATUS_COMPLETED, STATUS_EXPIRED):
+            return job
+        return _run_claimed_job(db, job, final_path, retention_hours, sources, chunk_size,
+                                checkpoint_every, max_workers)
+    finally:
+        lock.close()
+
+
+def _run_claimed_job(db, job: DataSubjectRequest, final_path: Path, retention_hours: int,
+                     sources: Optional[List[Any]], chunk_size: int, checkpoint_every: int,
+                     max_workers: int) -> DataSubjectRequest:
+    selected = get_export_sources() if sources is None else sources
+    part_path = final_path.with_name(final_path.name + ".part")
+
+    serializer = get_serializer(job.export_format, job.compression or "none", job.archive or "zip")
+    compression = job.compression if serializer.compressible and job.compression != "none" else None
+
+    checkpoint = json.loads(job.checkpoint) if job.checkpoint else None
+    offset = job.bytes_written or 0
+    if checkpoint is None or not part_path.exists() or part_path.stat().st_size < offset:
+        # Nessun checkpoint utilizzabile: si (ri)parte da zero
+        checkpoint, offset = None, 0
+        job.rows_written = 0
+        job.total_rows = count_export_rows(db, job.user_id, selected, max_workers)
+    else:
+        logger.info(f"♻️ Ripresa export {job.id} da offset {offset} ({job.rows_written} righe)")
+
+    job.status = STATUS_PROCESSING
+    job.error = None
+    job.started_at = job.started_at or datetime.utcnow()
+    db.commit()
+
+    meta = build_export_meta(str(job.user_id), job.export_format, {"request_id": str(job.id)})
+    # Letture su una sessione dedicata: i commit dei checkpoint su `db` non devono
+    # chiudere il cursore server-side delle sorgenti, e tutte le sorgenti vedono lo stesso snapshot
+    read_db = snapshot_session(db.get_bind())
+    segments = iter_export_segments(read_db, job.user_id, serializer, selected, meta,
+                                    chunk_size=chunk_size, checkpoint=checkpoint, max_workers=max_workers)
+    try:
+        with open(part_path, "r+b" if offset else "wb") as f:
+            f.truncate(offset)
+            f.seek(offset)
+            # gzip/zstd: un member/frame per checkpoint, così il file troncato resta valido
+            compressor = StreamCompressor(compression) if compression else None
+            pending = 0
+            for data, position in segments:
+                f.write(compressor.compress(data) if compressor else data)
+                if position is None:
+                    continue
+                pending += 1
+                if pending < checkpoint_every:
+                    continue
+                pending = 0
+                job.rows_written = position["rows"]
+                if serializer.resumable:
+                    if compressor:
+                        f.write(compressor.finish())
+                    f.flush()
+                    job.checkpoint = json.dumps(position, default=json_default)
+                    job.bytes_written = f.tell()
+                # Archivi (zip/tar): solo avanzamento, un restart riparte da zero
+                db.commit()
+            if compressor:
+                f.write(compressor.finish())
+            job.bytes_written = f.tell()
+    except Exception as e:
+        db.rollback()
+        job.status = STATUS_FAILED
+        job.error = str(e)
+        db.commit()
+        raise
+    finally:
+        segments.close()
+        read_db.close()
+
+    os.replace(part_path, final_path)
+    now = datetime.utcnow()
+    job.status = STATUS_COMPLETED
+    job.artifact_path = str(final_path)
+    job.checkpoint = None
+    job.completed_at = now
+    job.expires_at = now + timedelta(hours=retention_hours)
+    audit_event(db, "data_export", job.user_id, {
+        "request_id": str(job.id), "format": job.export_format, "compression": job.compression,
+        "rows": job.rows_written, "bytes": job.bytes_written,
+    })
+    db.commit()
+    logger.info(f"✅ Export {job.id} completato: {job.rows_written} righe, {job.bytes_written} bytes")
+    return job
+
+
+def get_job_progress(job: DataSubjectRequest) -> Dict[str, Any]:
+    """Stato del job per il polling del client"""
+    total = job.total_rows
+    if job.status == STATUS_COMPLETED:
+        percent = 100.0
+    elif total:
+        percent = round(min(job.rows_written or 0, total) * 100 / total, 1)
+    else:
+        percent = 0.0
+    return {
+        "request_id": str(job.id),
+        "user_id": str(job.user_id),
+        "status": job.status,
+        "format": job.export_format,
+        "compression": job.compression,
+        "archive": job.archive,
+        "rows_written": job.rows_written or 0,
+        "total_rows": total,
+        "progress_percent": percent,
+        "bytes_written": job.bytes_written or 0,
+        "requested_at": job.timestamp.isoformat() if job.timestamp else None,
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None,
+        "expires_at": job.expires_at.isoformat() if job.expires_at else None,
+        "error": job.error,
+    }
+
+
+def cleanup_expired_exports(db, export_dir, now: Optional[datetime] = None) -> int:
+    """Elimina gli artifact oltre la retention e marca i job come scaduti"""
+    now = now or datetime.utcnow()
+    expired = db.query(DataSubjectRequest).filter(
+        DataSubjectRequest.request_type == EXPORT_REQUEST_TYPE,
+        DataSubjectRequest.status == STATUS_COMPLETED,
+        DataSubjectRequest.expires_at <= now,
+    ).all()
+    for job in expired:
+        path = Path(job.artifact_path) if job.artifact_path else artifact_path(export_dir, job)
+        path.unlink(missing_ok=True)
+        _lock_path(artifact_path(export_dir, job)).unlink(missing_ok=True)
+        job.status = STATUS_EXPIRED
+        job.artifact_path = None
+    db.commit()
+    if expired:
+        logger.info(f"🧹 Rimossi {len(expired)} export GDPR scaduti")
+    return len(expired)
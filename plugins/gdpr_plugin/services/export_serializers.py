@@ -0,0 +1,523 @@
+"""
+🧩 GDPR Export Serializers - Registry dei formati di export
+
+Ogni serializer trasforma lo stream di chunk prodotto dall'export engine in
+bytes, in modo incrementale:
+
+- stream: json, ndjson, csv (formato long), xml → un unico file,
+  comprimibile on the fly con gzip o zstd
+- archivio: csv_zip (un CSV per entità), parquet (un file Parquet per
+  entità) → scritti in uno zip (entry stored o deflate: niente zstd) o in
+  un tar comprimibile con gzip o zstd
+
+I serializer si registrano con `register_serializer`; `GDPR_EXPORT_FORMAT`
+viene validato su questo registry all'avvio del plugin
+(`export_service.validate_export_settings`).
+"""
+import csv
+import io
+import json
+import tarfile
+import tempfile
+import time
+import uuid
+import zipfile
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+from xml.sax.saxutils import escape, quoteattr
+
+try:
+    import zstandard
+except ImportError:  # dipendenza opzionale
+    zstandard = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pyarrow_parquet
+except ImportError:  # dipendenza opzionale
+    pyarrow = None
+    pyarrow_parquet = None
+
+COMPRESSIONS = ("none", "gzip", "zstd")
+ARCHIVES = ("zip", "tar")
+ZIP_COMPRESSIONS = {"none": zipfile.ZIP_STORED, "gzip": zipfile.ZIP_DEFLATED}  # gzip → deflate
+
+_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+_COPY_BUFFER_SIZE = 1024 * 1024
+
+
+# ===== VALUE ENCODING =====
+
+def json_default(value):
+    """Default JSON per i tipi restituiti da SQLAlchemy"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.hex()
+    raise TypeError(f"Tipo non serializzabile: {type(value).__name__}")
+
+
+def dumps(value) -> str:
+    return json.dumps(value, default=json_default, ensure_ascii=False)
+
+
+def text_value(value) -> str:
+    """Rappresentazione testuale di un valore (CSV/XML)"""
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return dumps(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+# ===== COMPRESSION =====
+
+class StreamCompressor:
+    """
+    Compressione gzip/zstd incrementale.
+
+    `finish()` chiude il member gzip / frame zstd corrente: member e frame
+    concatenati sono uno stream valido, quindi un file troncato a un
+    confine di `finish()` resta decomprimibile (usato dai checkpoint).
+    """
+
+    def __init__(self, compression: str):
+        if compression not in COMPRESSIONS or compression == "none":
+            raise ValueError(f"Compressione non supportata: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("Compressione zstd richiede il pacchetto 'zstandard'")
+        self.compression = compression
+        self._new()
+
+    def _new(self):
+        if self.compression == "gzip":
+            self._obj = zlib.compressobj(6, zlib.DEFLATED, 31)
+        else:
+            self._obj = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) if data else b""
+
+    def finish(self) -> bytes:
+        data = self._obj.flush()
+        self._new()
+        return data
+
+
+def compression_suffix(compression: str) -> str:
+    return {"none": "", "gzip": ".gz", "zstd": ".zst"}[compression]
+
+
+def compression_media_type(compression: str) -> Optional[str]:
+    return {"none": None, "gzip": "application/gzip", "zstd": "application/zstd"}[compression]
+
+
+# ===== STREAM SERIALIZERS =====
+
+class ExportSerializer:
+    """
+    Interfaccia serializer: ogni metodo restituisce i bytes da scrivere.
+
+    `rows` riceve `written`, il numero di record già scritti per la sorgente
+    (serve a separatori e numerazione quando l'export riprende da checkpoint).
+    """
+    name: str = ""
+    media_type: str = "application/octet-stream"
+    extension: str = ""
+    resumable: bool = True      # output riprendibile dai checkpoint dell'engine
+    compressible: bool = True   # accetta compressione gzip/zstd esterna
+
+    def __init__(self, **options):
+        self.options = options
+
+    def header(self, meta: Dict[str, Any]) -> bytes:
+        return b""
+
+    def begin_source(self, source) -> bytes:
+        return b""
+
+    def rows(self, source, chunk: List[Dict[str, Any]], written: int) -> bytes:
+        raise NotImplementedError
+
+    def end_source(self, source) -> bytes:
+        return b""
+
+    def footer(self) -> bytes:
+        return b""
+
+
+class JsonSerializer(ExportSerializer):
+    """Un unico documento JSON: metadati + un array per sorgente"""
+    name = "json"
+    media_type = "application/json"
+    extension = "json"
+
+    def header(self, meta):
+        return ("{" + ", ".join(f"{dumps(k)}: {dumps(v)}" for k, v in meta.items())).encode()
+
+    def begin_source(self, source):
+        return f", {dumps(source.name)}: [".encode()
+
+    def rows(self, source, chunk, written):
+        body = ", ".join(dumps(row) for row in chunk)
+        return (", " + body if written else body).encode()
+
+    def end_source(self, source):
+        return b"]"
+
+    def footer(self):
+        return b"}"
+
+
+class NdjsonSerializer(ExportSerializer):
+    """Una riga JSON per record: {"source": ..., "record": ...}"""
+    name = "ndjson"
+    media_type = "application/x-ndjson"
+    extension = "ndjson"
+
+    def header(self, meta):
+        return (dumps({"source": "_meta", "record": meta}) + "\n").encode()
+
+    def rows(self, source, chunk, written):
+        return "".join(dumps({"source": source.name, "record": row}) + "\n" for row in chunk).encode()
+
+
+class CsvSerializer(ExportSerializer):
+    """Formato "long": un'unica tabella source,record,field,value valida per tutte le sorgenti"""
+    name = "csv"
+    media_type = "text/csv"
+    extension = "csv"
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def _drain(self) -> bytes:
+        text = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return text.encode()
+
+    def header(self, meta):
+        self._writer.writerow(["source", "record", "field", "value"])
+        for field_name, value in meta.items():
+            self._writer.writerow(["_meta", 0, field_name, text_value(value)])
+        return self._drain()
+
+    def rows(self, source, chunk, written):
+        for record, row in enumerate(chunk, start=written + 1):
+            self._writer.writerows([source.name, record, k, text_value(v)] for k, v in row.items())
+        return self._drain()
+
+
+class XmlSerializer(ExportSerializer):
+    """<gdpr_export> con un elemento <source> per sorgente e <record>/<field> per riga"""
+    name = "xml"
+    media_type = "application/xml"
+    extension = "xml"
+
+    @staticmethod
+    def _fields(values: Dict[str, Any]) -> str:
+        return "".join(f"<field name={quoteattr(str(k))}>{escape(text_value(v))}</field>" for k, v in values.items())
+
+    def header(self, meta):
+        return f'<?xml version="1.0" encoding="UTF-8"?>\n<gdpr_export><meta>{self._fields(meta)}</meta>'.encode()
+
+    def begin_source(self, source):
+        return f"<source name={quoteattr(source.name)}>".encode()
+
+    def rows(self, source, chunk, written):
+        return "".join(f"<record>{self._fields(row)}</record>" for row in chunk).encode()
+
+    def end_source(self, source):
+        return b"</source>"
+
+    def footer(self):
+        return b"</gdpr_export>\n"
+
+
+# ===== ARCHIVE SERIALIZERS =====
+
+class _Sink(io.RawIOBase):
+    """Destinazione non seekable: accumula i bytes scritti finché non vengono drenati"""
+
+    def __init__(self):
+        super().__init__()
+        self._data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._data += b
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = bytes(self._data)
+        self._data.clear()
+        return data
+
+
+class ArchiveSerializer(ExportSerializer):
+    """
+    Un file per entità dentro un archivio scritto in streaming.
+
+    zip: ogni entry è scritta direttamente nello stream (data descriptor,
+    nessun seek). tar: l'header richiede la dimensione, quindi ogni entità
+    viene prima bufferizzata in uno SpooledTemporaryFile (RAM fino a 8MB,
+    poi disco) e copiata nello stream a fine sorgente.
+    """
+    resumable = False
+    compressible = False
+    entry_extension = ""
+
+    def __init__(self, archive: str = "zip", compression: str = "none", **options):
+        super().__init__(**options)
+        if archive not in ARCHIVES:
+            raise ValueError(f"Archivio non supportato: {archive}. Disponibili: {list(ARCHIVES)}")
+        if archive == "zip" and compression not in ZIP_COMPRESSIONS:
+            raise ValueError(f"Compressione {compression} non supportata per archivi zip "
+                             f"(disponibili: {list(ZIP_COMPRESSIONS)}); usare archive=tar")
+        self.archive = archive
+        self._sink = _Sink()
+        self._compressor = StreamCompressor(compression) if archive == "tar" and compression != "none" else None
+        if archive == "zip":
+            self.media_type, self.extension = "application/zip", "zip"
+            self._zip = zipfile.ZipFile(self._sink, "w", compression=ZIP_COMPRESSIONS[compression])
+        else:
+            self.media_type = compression_media_type(compression) or "application/x-tar"
+            self.extension = "tar" + compression_suffix(compression)
+            self._tar = tarfile.open(fileobj=self._sink, mode="w|")
+        self._entry = None
+
+    # --- entry plumbing ---
+
+    def _output(self) -> bytes:
+        data = self._sink.drain()
+        return self._compressor.compress(data) if self._compressor else data
+
+    def _open_entry(self, name: str):
+        if self.archive == "zip":
+            self._entry = self._zip.open(name, "w", force_zip64=True)
+        else:
+            self._entry = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_SIZE)
+        self._entry_name = name
+
+    def _write_entry(self, data: bytes):
+        if data:
+            self._entry.write(data)
+
+    def _close_entry(self):
+        if self.archive == "zip":
+            self._entry.close()
+        else:
+            size = self._entry.tell()
+            self._entry.seek(0)
+            info = tarfile.TarInfo(self._entry_name)
+            info.size, info.mtime = size, int(time.time())
+            self._tar.addfile(info, self._entry)
+            self._entry.close()
+        self._entry = None
+
+    # --- serializer API ---
+
+    def header(self, meta):
+        self._open_entry("_meta.json")
+        self._write_entry(json.dumps(meta, default=json_default, indent=2, ensure_ascii=False).encode())
+        self._close_entry()
+        return self._output()
+
+    def begin_source(self, source):
+        self._open_entry(f"{source.name}.{self.entry_extension}")
+        return self._output()
+
+    def rows(self, source, chunk, written):
+        self._write_entry(self.encode_rows(chunk, written))
+        return self._output()
+
+    def end_source(self, source):
+        self._write_entry(self.finish_entry())
+        self._close_entry()
+        return self._output()
+
+    def footer(self):
+        if self.archive == "zip":
+            self._zip.close()
+        else:
+            self._tar.close()
+        data = self._output()
+        return data + self._compressor.finish() if self._compressor else data
+
+    # --- per-format hooks ---
+
+    def encode_rows(self, chunk: List[Dict[str, Any]], written: int) -> bytes:
+        raise NotImplementedError
+
+    def finish_entry(self) -> bytes:
+        return b""
+
+
+class CsvArchiveSerializer(ArchiveSerializer):
+    """Un CSV per entità (colonne = campi della sorgente)"""
+    name = "csv_zip"
+    entry_extension = "csv"
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def encode_rows(self, chunk, written):
+        if not written:
+            self._writer.writerow(list(chunk[0].keys()))
+        self._writer.writerows([text_value(v) for v in row.values()] for row in chunk)
+        text = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return text.encode()
+
+
+def arrow_schema(source):
+    """
+    Schema Arrow dalle colonne SQLAlchemy della sorgente (None per sorgenti
+    senza modello): tutti i campi nullable, UUID/Decimal/JSON come stringhe.
+    """
+    model = getattr(source, "model", None)
+    if model is None:
+        return None
+    table = model.__table__
+    columns = [table.c[c] for c in source.columns] if getattr(source, "columns", None) else list(table.c)
+    return pyarrow.schema([pyarrow.field(column.name, _arrow_type(column.type)) for column in columns])
+
+
+def _arrow_type(column_type):
+    try:
+        python_type = column_type.python_type
+    except NotImplementedError:
+        return pyarrow.string()
+    if python_type is bool:
+        return pyarrow.bool_()
+    if python_type is int:
+        return pyarrow.int64()
+    if python_type is float:
+        return pyarrow.float64()
+    if python_type is datetime:
+        return pyarrow.timestamp("us", tz="UTC" if getattr(column_type, "timezone", False) else None)
+    if python_type is date:
+        return pyarrow.date32()
+    if python_type is bytes:
+        return pyarrow.binary()
+    return pyarrow.string()
+
+
+def _infer_schema(rows: List[Dict[str, Any]]):
+    # Sorgenti senza modello: tipi dal primo chunk, campi tutti None → stringa
+    names = list(dict.fromkeys(name for row in rows for name in row))
+    inferred = pyarrow.Table.from_pylist(rows).schema
+    return pyarrow.schema([
+        pyarrow.field(name, pyarrow.string() if name not in inferred.names
+                      or pyarrow.types.is_null(inferred.field(name).type) else inferred.field(name).type)
+        for name in names
+    ])
+
+
+class ParquetArchiveSerializer(ArchiveSerializer):
+    """Un file Parquet per entità, un row group per chunk (richiede pyarrow)"""
+    name = "parquet"
+    entry_extension = "parquet"
+
+    def __init__(self, **options):
+        if pyarrow is None:
+            raise ValueError("Formato parquet richiede il pacchetto 'pyarrow'")
+        super().__init__(**options)
+        self._file = None
+        self._schema = None
+        self._writer = None
+
+    def _normalize(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        # Campi stringa nello schema: UUID, Decimal, JSON, ... in forma testuale
+        return {
+            name: text_value(row[name]) if is_string and row.get(name) is not None
+            and not isinstance(row[name], str) else row.get(name)
+            for name, is_string in self._string_fields
+        }
+
+    def _open_writer(self, schema):
+        self._schema = schema
+        self._string_fields = [(f.name, pyarrow.types.is_string(f.type)) for f in schema]
+        self._writer = pyarrow_parquet.ParquetWriter(self._file, schema, compression="zstd")
+
+    def begin_source(self, source):
+        # ParquetWriter scrive il footer a fine file: spool locale, poi copia nell'entry
+        self._file = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_SIZE)
+        self._schema = arrow_schema(source)
+        return super().begin_source(source)
+
+    def encode_rows(self, chunk, written):
+        if self._writer is None:
+            self._open_writer(self._schema or _infer_schema(chunk))
+        rows = [self._normalize(row) for row in chunk]
+        self._writer.write_table(pyarrow.Table.from_pylist(rows, schema=self._schema))
+        return b""
+
+    def finish_entry(self):
+        if self._writer is None:
+            # Nessuna riga: file Parquet valido con lo schema (vuoto se sconosciuto)
+            self._open_writer(self._schema or pyarrow.schema([]))
+        self._writer.close()
+        self._writer = None
+        self._file.seek(0)
+        while True:
+            block = self._file.read(_COPY_BUFFER_SIZE)
+            if not block:
+                break
+            self._write_entry(block)
+        self._file.close()
+        return b""
+
+
+# ===== REGISTRY =====
+
+_SERIALIZERS: Dict[str, type] = {}
+
+
+def register_serializer(serializer_class: type) -> type:
+    """Registra un serializer (usabile anche come decorator dai plugin)"""
+    _SERIALIZERS[serializer_class.name] = serializer_class
+    return serializer_class
+
+
+def available_formats() -> List[str]:
+    """Formati registrati (esclusi quelli con dipendenze opzionali mancanti)"""
+    return [name for name in _SERIALIZERS if not (name == "parquet" and pyarrow is None)]
+
+
+def is_archive_format(fmt: str) -> bool:
+    """Formato un-file-per-entità (zip/tar)"""
+    return fmt in _SERIALIZERS and issubclass(_SERIALIZERS[fmt], ArchiveSerializer)
+
+
+def get_serializer(fmt: str, compression: str = "none", archive: str = "zip") -> ExportSerializer:
+    """Istanza serializer per un singolo export"""
+    if fmt not in _SERIALIZERS:
+        raise ValueError(f"Formato export non supportato: {fmt}. Disponibili: {available_formats()}")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Compressione non supportata: {compression}. Disponibili: {list(COMPRESSIONS)}")
+    serializer_class = _SERIALIZERS[fmt]
+    if issubclass(serializer_class, ArchiveSerializer):
+        return serializer_class(archive=archive, compression=compression)
+    return serializer_class()
+
+
+for _serializer in (JsonSerializer, NdjsonSerializer, CsvSerializer, XmlSerializer,
+                    CsvArchiveSerializer, ParquetArchiveSerializer):
+    register_serializer(_serializer)
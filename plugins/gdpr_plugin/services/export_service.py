@@ -1,3 +1,555 @@
-def export_user_data(user_id):
-    # Logic for exporting user data securely
-    pass
+"""
+📦 GDPR Data Export - Streaming engine (Art. 15 / Art. 20 GDPR)
+
+L'export non costruisce mai il payload completo in memoria: ogni sorgente
+dati viene letta a chunk con cursore server-side e serializzata man mano,
+con compressione gzip/zstd opzionale on the fly. Memoria costante per
+export, indipendentemente dal numero di righe dell'interessato.
+
+I formati sono implementati in `export_serializers` (registry pluggable).
+Le sorgenti sono scoperte dal `PersonalDataRegistry` (modelli con
+`__gdpr_subject__` o registrati con `subject_column`). Su PostgreSQL sono
+lette in parallelo, una sessione per sorgente sullo stesso snapshot; sugli
+altri dialetti in sequenza sulla sessione dell'export.
+"""
+import logging
+import queue
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from core.database.base import PersonalDataRegistry
+
+from plugins.gdpr_plugin.services.export_serializers import (
+    COMPRESSIONS,
+    ZIP_COMPRESSIONS,
+    ExportSerializer,
+    StreamCompressor,
+    available_formats,
+    compression_media_type,
+    compression_suffix,
+    get_serializer,
+    is_archive_format,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_EXPORT_WORKERS = 4
+DEFAULT_PREFETCH_CHUNKS = 2
+MAX_EXPORT_READERS = 8  # sessioni di lettura parallele in tutto il processo
+
+GDPR_EXPORT_NOTICE = "This export contains all personal data we hold about you as per GDPR Article 20."
+
+
+# ===== SOURCES =====
+
+def _coerce_key(column, value):
+    """Le chiavi dei checkpoint sono salvate in JSON: ripristina il tipo della colonna"""
+    if isinstance(value, str):
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            return value
+        if python_type is uuid.UUID:
+            return uuid.UUID(value)
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+    return value
+
+
+def coerce_subject(column, value):
+    """Converte l'id dell'interessato nel tipo della colonna (ValueError se incompatibile)"""
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if isinstance(value, python_type):
+        return value
+    if python_type is uuid.UUID:
+        return uuid.UUID(str(value))
+    if python_type is int:
+        return int(str(value))
+    return value
+
+
+def _is_indexed(column) -> bool:
+    """True se esiste un indice che inizia con `column` (PK, unique o index)"""
+    if column.primary_key or column.index or column.unique:
+        return True
+    return any(list(index.columns)[:1] == [column] for index in column.table.indexes)
+
+
+@dataclass
+class ExportSource:
+    """Sorgente SQLAlchemy: righe di `model` collegate all'interessato via `subject_column`"""
+    name: str
+    model: Any
+    subject_column: str = "user_id"
+    key_column: str = "id"
+    columns: Optional[List[str]] = None
+
+    def iter_chunks(self, db, subject_id, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    after: Any = None) -> Iterator[List[Dict[str, Any]]]:
+        """Chunk ordinati per chiave; `after` riprende dopo l'ultima chiave esportata"""
+        table = self.model.__table__
+        try:
+            subject_id = coerce_subject(table.c[self.subject_column], subject_id)
+        except ValueError:
+            return  # id di tipo incompatibile con la tabella: nessuna riga dell'interessato
+        cols = [table.c[c] for c in self.columns] if self.columns else list(table.c)
+        key = table.c[self.key_column]
+        stmt = select(*cols).where(table.c[self.subject_column] == subject_id).order_by(key)
+        if after is not None:
+            stmt = stmt.where(key > _coerce_key(key, after))
+        # ✅ Server-side cursor: il driver non carica l'intero result set
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=chunk_size))
+        try:
+            for partition in result.mappings().partitions(chunk_size):
+                yield [dict(row) for row in partition]
+        finally:
+            result.close()
+
+    def count(self, db, subject_id) -> int:
+        """Righe dell'interessato (query sull'indice di `subject_column`)"""
+        table = self.model.__table__
+        try:
+            subject_id = coerce_subject(table.c[self.subject_column], subject_id)
+        except ValueError:
+            return 0
+        stmt = select(func.count()).select_from(table).where(table.c[self.subject_column] == subject_id)
+        return db.execute(stmt).scalar() or 0
+
+
+@dataclass
+class IterableExportSource:
+    """Sorgente generica (es. dati demo in memoria): `fetch(subject_id)` restituisce le righe"""
+    name: str
+    fetch: Callable[[Any], Iterable[Dict[str, Any]]]
+    key_column: str = "id"
+
+    def iter_chunks(self, db, subject_id, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    after: Any = None) -> Iterator[List[Dict[str, Any]]]:
+        chunk = []
+        for row in self.fetch(subject_id):
+            if after is not None and row.get(self.key_column) is not None and row[self.key_column] <= after:
+                continue
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def count(self, db, subject_id) -> int:
+        return sum(1 for _ in self.fetch(subject_id))
+
+
+_EXPORT_SOURCES: Dict[str, Any] = {}
+
+
+def register_export_source(source) -> None:
+    """Registra una sorgente custom (es. non SQLAlchemy); sovrascrive quella scoperta con lo stesso nome"""
+    _EXPORT_SOURCES[source.name] = source
+
+
+def _plan_source(entry) -> ExportSource:
+    table = entry.model.__table__
+    if not _is_indexed(table.c[entry.subject_column]):
+        logger.warning(f"⚠️ Export GDPR: {table.name}.{entry.subject_column} non indicizzata (full scan)")
+    key_column = list(table.primary_key.columns)[0].name
+    return ExportSource(name=entry.name, model=entry.model,
+                        subject_column=entry.subject_column, key_column=key_column)
+
+
+def get_export_sources() -> List[Any]:
+    """
+    Piano di export: una sorgente per ogni tabella del PersonalDataRegistry,
+    più le sorgenti custom registrate con `register_export_source`.
+    """
+    planned = {entry.name: _plan_source(entry) for entry in PersonalDataRegistry.get_sources()}
+    planned.update(_EXPORT_SOURCES)
+    return list(planned.values())
+
+
+def register_default_export_sources() -> None:
+    """Importa i modelli core + GDPR così che si registrino (chiamata dal plugin e dai worker Celery)"""
+    import core.models.user  # noqa: F401
+    import plugins.gdpr_plugin.models.consent  # noqa: F401
+
+
+# ===== CONCURRENT READS =====
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_readers_lock = threading.Lock()
+_readers_in_use = 0
+
+
+def _reserve_readers(wanted: int) -> int:
+    """Riserva fino a `wanted` sessioni dal budget globale; 0 se non ne restano almeno 2"""
+    global _readers_in_use
+    with _readers_lock:
+        granted = min(wanted, MAX_EXPORT_READERS - _readers_in_use)
+        if granted < 2:
+            return 0
+        _readers_in_use += granted
+        return granted
+
+
+def _release_readers(count: int) -> None:
+    global _readers_in_use
+    with _readers_lock:
+        _readers_in_use -= count
+
+
+def supports_parallel_reads(db) -> bool:
+    """
+    Letture parallele solo se le sessioni dei worker possono condividere uno
+    snapshot (PostgreSQL, `pg_export_snapshot`): altrimenti ogni sorgente
+    vedrebbe lo stato del database in un istante diverso.
+    """
+    return db is None or db.get_bind().dialect.name == "postgresql"
+
+
+def snapshot_session(bind) -> Session:
+    """Sessione di lettura REPEATABLE READ: tutte le sorgenti lette sullo stesso snapshot"""
+    if bind.dialect.name in ("postgresql", "mysql", "mariadb"):
+        bind = bind.execution_options(isolation_level="REPEATABLE READ")
+    return Session(bind=bind)
+
+
+class ConcurrentSourceReader:
+    """
+    Legge più sorgenti in parallelo: un thread e una sessione per sorgente,
+    ogni sorgente con una coda di al massimo `prefetch` chunk. Il consumer
+    legge le sorgenti in ordine, quindi l'output resta deterministico e la
+    memoria limitata a workers × prefetch chunk.
+
+    Le sessioni dei worker importano lo snapshot di una transazione
+    coordinatrice e sono conteggiate nel budget `MAX_EXPORT_READERS`:
+    si crea con `acquire`, che restituisce None se il budget è esaurito.
+    """
+
+    def __init__(self, db, subject_id, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 max_workers: int = DEFAULT_EXPORT_WORKERS, prefetch: int = DEFAULT_PREFETCH_CHUNKS):
+        self.subject_id = subject_id
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.prefetch = prefetch
+        # Le Session non sono thread-safe: ogni worker apre la propria sullo stesso engine
+        self._bind = db.get_bind() if db is not None else None
+        self._snapshot_conn = None
+        self._snapshot = None
+        self._stop = threading.Event()
+        self._executor = None
+        self._closed = False
+
+    @classmethod
+    def acquire(cls, db, subject_id, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                max_workers: int = DEFAULT_EXPORT_WORKERS,
+                prefetch: int = DEFAULT_PREFETCH_CHUNKS) -> Optional["ConcurrentSourceReader"]:
+        workers = _reserve_readers(max_workers)
+        if not workers:
+            return None
+        reader = cls(db, subject_id, chunk_size, workers, prefetch)
+        try:
+            reader._export_snapshot()
+        except BaseException:
+            reader.close()
+            raise
+        return reader
+
+    def _export_snapshot(self):
+        if self._bind is None or self._bind.dialect.name != "postgresql":
+            return
+        conn = self._bind.connect().execution_options(isolation_level="REPEATABLE READ")
+        self._snapshot_conn = conn
+        conn.begin()
+        self._snapshot = conn.exec_driver_sql("SELECT pg_export_snapshot()").scalar()
+
+    def _session(self):
+        if self._bind is None:
+            return None
+        if self._snapshot is None:
+            return Session(bind=self._bind)
+        conn = self._bind.connect().execution_options(isolation_level="REPEATABLE READ")
+        conn.begin()
+        conn.exec_driver_sql(f"SET TRANSACTION SNAPSHOT '{self._snapshot}'")
+        return Session(bind=conn, info={"snapshot_conn": conn})
+
+    @staticmethod
+    def _close_session(session):
+        if session is None:
+            return
+        conn = session.info.get("snapshot_conn")
+        session.close()
+        if conn is not None:
+            conn.close()
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(self, source, after, q: queue.Queue):
+        session = None
+        try:
+            session = self._session()
+            for chunk in source.iter_chunks(session, self.subject_id, self.chunk_size, after=after):
+                if not self._put(q, chunk):
+                    return
+            self._put(q, _DONE)
+        except BaseException as e:
+            self._put(q, _Failure(e))
+        finally:
+            self._close_session(session)
+
+    @staticmethod
+    def _drain(q: queue.Queue) -> Iterator[List[Dict[str, Any]]]:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+
+    def open(self, jobs: List[Tuple[Any, Any]]) -> List[Iterator[List[Dict[str, Any]]]]:
+        """`jobs`: lista (sorgente, after) → un iteratore di chunk per sorgente"""
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="gdpr-export")
+        iterators = []
+        for source, after in jobs:  # FIFO: le sorgenti partono nell'ordine di consumo
+            q = queue.Queue(maxsize=self.prefetch)
+            self._executor.submit(self._read, source, after, q)
+            iterators.append(self._drain(q))
+        return iterators
+
+    def count(self, sources: List[Any]) -> int:
+        """Somma delle righe dell'interessato, query di conteggio in parallelo"""
+        def _count(source):
+            session = self._session()
+            try:
+                return source.count(session, self.subject_id)
+            finally:
+                self._close_session(session)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="gdpr-count") as executor:
+            return sum(executor.map(_count, sources))
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        if self._executor is not None:
+            # Attende i worker: le sessioni vanno chiuse prima di liberare il budget
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        if self._snapshot_conn is not None:
+            self._snapshot_conn.close()
+        _release_readers(self.max_workers)
+
+
+def count_export_rows(db, subject_id, sources: List[Any], max_workers: int = DEFAULT_EXPORT_WORKERS) -> int:
+    """Totale righe da esportare (per l'avanzamento dei job)"""
+    reader = None
+    if max_workers > 1 and len(sources) > 1 and supports_parallel_reads(db):
+        reader = ConcurrentSourceReader.acquire(db, subject_id, max_workers=min(max_workers, len(sources)))
+    if reader is None:
+        return sum(source.count(db, subject_id) for source in sources)
+    try:
+        return reader.count(sources)
+    finally:
+        reader.close()
+
+
+def iter_export_segments(db, user_id, serializer: ExportSerializer, sources: List[Any], meta: Dict[str, Any],
+                         chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         checkpoint: Optional[Dict[str, Any]] = None,
+                         max_workers: int = DEFAULT_EXPORT_WORKERS,
+                         prefetch: int = DEFAULT_PREFETCH_CHUNKS) -> Iterator[Tuple[bytes, Optional[Dict[str, Any]]]]:
+    """
+    Serializza l'export come sequenza di segmenti `(bytes, checkpoint)`.
+
+    Il checkpoint (quando presente) descrive la posizione *dopo* il segmento:
+    per i serializer `resumable`, ripartendo da esso i segmenti successivi
+    proseguono l'output byte per byte. Passando `checkpoint` l'intestazione
+    non viene riemessa.
+
+    Con `max_workers` > 1 le sorgenti vengono lette in parallelo
+    (`ConcurrentSourceReader`) se il dialetto lo consente e il budget globale
+    di sessioni non è esaurito; l'ordine dell'output non cambia.
+    """
+    state = checkpoint or {"source": 0, "after": None, "written": 0, "started": False, "rows": 0}
+    rows = state["rows"]
+    pending = sources[state["source"]:]
+    jobs = [(source, state["after"] if i == 0 and state["started"] else None) for i, source in enumerate(pending)]
+
+    reader = None
+    if max_workers > 1 and len(jobs) > 1 and supports_parallel_reads(db):
+        reader = ConcurrentSourceReader.acquire(db, user_id, chunk_size, min(max_workers, len(jobs)), prefetch)
+    if reader is not None:
+        chunk_iterators = reader.open(jobs)
+    else:
+        chunk_iterators = [source.iter_chunks(db, user_id, chunk_size, after=after) for source, after in jobs]
+
+    try:
+        if checkpoint is None:
+            yield serializer.header(meta), None
+        for offset, (source, chunks) in enumerate(zip(pending, chunk_iterators)):
+            index = state["source"] + offset
+            resuming = offset == 0 and state["started"]
+            written = state["written"] if resuming else 0
+            if not resuming:
+                yield serializer.begin_source(source), None
+            for chunk in chunks:
+                data = serializer.rows(source, chunk, written)
+                written += len(chunk)
+                rows += len(chunk)
+                yield data, {"source": index, "after": chunk[-1].get(source.key_column),
+                             "written": written, "started": True, "rows": rows}
+            yield serializer.end_source(source), {"source": index + 1, "after": None,
+                                                  "written": 0, "started": False, "rows": rows}
+        yield serializer.footer(), None
+    finally:
+        if reader is not None:
+            reader.close()
+
+
+def _compress_stream(chunks: Iterable[bytes], compression: str) -> Iterator[bytes]:
+    compressor = StreamCompressor(compression)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+# ===== PUBLIC API =====
+
+def resolve_compression(compress: bool = False, compression: Optional[str] = None) -> str:
+    """`compression` esplicita oppure il flag storico `compress` (→ gzip)"""
+    if compression is None:
+        return "gzip" if compress else "none"
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Compressione non supportata: {compression}. Disponibili: {list(COMPRESSIONS)}")
+    return compression
+
+
+def resolve_export_options(fmt: Optional[str] = None, compress: Optional[bool] = None,
+                           compression: Optional[str] = None, archive: str = "zip",
+                           default_format: Optional[str] = None,
+                           default_compression: Optional[str] = None) -> Tuple[str, str]:
+    """
+    (formato, compressione) effettivi e validati sul registry. Senza
+    parametri espliciti valgono GDPR_EXPORT_FORMAT / GDPR_EXPORT_COMPRESSION;
+    una compressione di default che lo zip non supporta (zstd) diventa deflate.
+    """
+    if fmt is None or (compress is None and compression is None):
+        if default_format is None or default_compression is None:
+            from core.config import settings
+            default_format = default_format or settings.GDPR_EXPORT_FORMAT
+            default_compression = default_compression or settings.GDPR_EXPORT_COMPRESSION
+    fmt = fmt or default_format
+    if compress is None and compression is None:
+        compression = resolve_compression(compression=default_compression)
+        if archive == "zip" and is_archive_format(fmt) and compression not in ZIP_COMPRESSIONS:
+            compression = "gzip"
+    else:
+        compression = resolve_compression(bool(compress), compression)
+    if fmt not in available_formats():
+        raise ValueError(f"Formato export non supportato: {fmt}. Disponibili: {available_formats()}")
+    get_serializer(fmt, compression, archive)
+    return fmt, compression
+
+
+def validate_export_settings(settings) -> None:
+    """GDPR_EXPORT_FORMAT / GDPR_EXPORT_COMPRESSION validi sul registry (all'avvio del plugin)"""
+    resolve_export_options(default_format=settings.GDPR_EXPORT_FORMAT,
+                           default_compression=settings.GDPR_EXPORT_COMPRESSION)
+
+
+def build_export_meta(user_id, fmt: str, extra_meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Intestazione comune a tutti gli export"""
+    meta = {
+        "subject_id": user_id,
+        "exported_at": datetime.utcnow().isoformat(),
+        "export_format": fmt,
+        "gdpr_notice": GDPR_EXPORT_NOTICE,
+    }
+    meta.update(extra_meta or {})
+    return meta
+
+
+def export_user_data(db, user_id, fmt: str = "json", compress: bool = False,
+                     sources: Optional[List[Any]] = None,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     extra_meta: Optional[Dict[str, Any]] = None,
+                     compression: Optional[str] = None,
+                     archive: str = "zip",
+                     max_workers: int = DEFAULT_EXPORT_WORKERS) -> Iterator[bytes]:
+    """
+    Export streaming dei dati personali di un interessato.
+
+    Args:
+        db: Sessione SQLAlchemy (usata dalle sorgenti su modelli)
+        user_id: Identificativo dell'interessato
+        fmt: Formato registrato (json / ndjson / csv / xml / csv_zip / parquet)
+        compress: Comprime l'output in gzip on the fly (alias di compression="gzip")
+        sources: Sorgenti da esportare (default: quelle registrate)
+        chunk_size: Righe lette e serializzate per volta
+        extra_meta: Campi aggiuntivi nell'intestazione dell'export
+        compression: none / gzip / zstd
+        archive: Contenitore dei formati per entità (zip / tar)
+        max_workers: Sorgenti lette in parallelo (1 = sequenziale sulla sessione `db`)
+
+    Returns:
+        Iteratore di bytes, da passare a una StreamingResponse
+    """
+    compression = resolve_compression(compress, compression)
+    serializer = get_serializer(fmt, compression, archive)
+    meta = build_export_meta(user_id, fmt, extra_meta)
+    selected = get_export_sources() if sources is None else sources
+    segments = iter_export_segments(db, user_id, serializer, selected, meta, chunk_size, max_workers=max_workers)
+    encoded = (data for data, _ in segments if data)
+    if serializer.compressible and compression != "none":
+        return _compress_stream(encoded, compression)
+    return encoded
+
+
+def export_media_type(fmt: str, compression: str = "none", archive: str = "zip") -> str:
+    """Content-Type della risposta di export"""
+    serializer = get_serializer(fmt, compression, archive)
+    if serializer.compressible and compression != "none":
+        return compression_media_type(compression)
+    return serializer.media_type
+
+
+def export_extension(fmt: str, compression: str = "none", archive: str = "zip") -> str:
+    """Estensione dell'artifact (es. ndjson.zst, csv_zip → zip, parquet → tar.zst)"""
+    serializer = get_serializer(fmt, compression, archive)
+    if serializer.compressible:
+        return serializer.extension + compression_suffix(compression)
+    return serializer.extension
+
+
+def export_filename(user_id, fmt: str, compression: str = "none", archive: str = "zip") -> str:
+    """Nome file suggerito per il download"""
+    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    return f"gdpr_export_{user_id}_{timestamp}.{export_extension(fmt, compression, archive)}"
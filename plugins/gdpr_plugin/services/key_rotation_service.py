@@ -0,0 +1,388 @@
+"""
+🔄 GDPR Key Rotation - Rotazione online delle chiavi e re-encryption
+
+1. `start_key_rotation` crea una nuova data key attiva per il tenant: da
+   quel momento le scritture usano la nuova chiave, le letture accettano
+   tutte le versioni (il kid è nel ciphertext)
+2. `run_key_rotation_job` percorre le colonne `EncryptedString` a chunk
+   in ordine di primary key (keyset, niente OFFSET), ri-cifra i chunk in
+   parallelo in processi worker (thread se il processo corrente è un worker
+   Celery prefork, che non può avere figli) e scrive con UPDATE condizionati sul
+   vecchio ciphertext (una scrittura concorrente dell'app vince sempre).
+   Nelle tabelle con il tenant per riga si leggono solo le righe del tenant;
+   i valori vengono riscritti in formato v2 (AAD con tabella.colonna) e il
+   blind index mancante (righe cifrate da valori legacy in chiaro) viene
+   ricalcolato nello stesso UPDATE
+3. dopo ogni gruppo di chunk si salva un checkpoint sul `KeyRotationJob`:
+   se il worker riparte, la re-encryption riprende da lì
+
+Per ruotare la master key basta `FieldEncryptionService.rewrap_data_keys()`:
+le data key vengono ri-cifrate, i dati no.
+"""
+import base64
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from sqlalchemy import Text, bindparam, func, literal, select, type_coerce, update
+
+from core.database.base import PersonalDataRegistry
+from plugins.gdpr_plugin.models.encryption_key import KeyRotationJob
+from plugins.gdpr_plugin.services.audit_service import audit_event
+from plugins.gdpr_plugin.services.export_serializers import json_default
+from plugins.gdpr_plugin.services.export_service import coerce_subject
+from plugins.gdpr_plugin.utils.encryption import (
+    BOUND_FORMAT_VERSION,
+    NONCE_SIZE,
+    BlindIndex,
+    EncryptedString,
+    FieldEncryptionService,
+    blind_index_label,
+    field_aad,
+    get_blind_index,
+    get_encryption_service,
+)
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_PROCESSING = "processing"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+DEFAULT_ROTATION_CHUNK_SIZE = 1000
+DEFAULT_ROTATION_WORKERS = 2
+
+
+@dataclass
+class EncryptedColumn:
+    """Colonna `EncryptedString` da ri-cifrare, percorsa per primary key"""
+    table: Any
+    column_name: str
+    tenant_id: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.table.name}.{self.column_name}"
+
+    @property
+    def blind_index(self) -> Optional[str]:
+        """Colonna blind index da valorizzare se mancante"""
+        return self.table.c[self.column_name].type.blind_index
+
+    @property
+    def tenant_column(self) -> Optional[str]:
+        """Colonna del tenant per riga: si ri-cifrano solo le righe di `tenant_id`"""
+        return self.table.c[self.column_name].type.row_tenant_column(self.table)
+
+    @property
+    def pk(self):
+        return list(self.table.primary_key.columns)[0]
+
+
+def find_encrypted_columns(tables: Optional[Iterable[Any]] = None, tenant_id: Optional[str] = None) -> List[EncryptedColumn]:
+    """
+    Colonne `EncryptedString` del tenant: quelle con `tenant_id` fisso uguale
+    e quelle con il tenant per riga (filtrate in lettura).
+
+    Default: tabelle del PersonalDataRegistry (i dati cifrati sono dati personali).
+    Servono tabelle con primary key su una sola colonna.
+    """
+    if tables is None:
+        tables = [source.model.__table__ for source in PersonalDataRegistry.get_sources()]
+    found: Dict[str, EncryptedColumn] = {}
+    for table in tables:
+        for column in table.columns:
+            if not isinstance(column.type, EncryptedString):
+                continue
+            if column.type.row_tenant_column(table) is None and column.type.tenant_id != tenant_id:
+                continue
+            if len(table.primary_key.columns) != 1:
+                logger.warning(f"⚠️ {table.name}.{column.name}: primary key composta, re-encryption saltata")
+                continue
+            target = EncryptedColumn(table, column.name, tenant_id)
+            found[target.key] = target
+    return [found[key] for key in sorted(found)]
+
+
+# ===== WORKER =====
+
+@dataclass
+class _BlindIndexSpec:
+    """Parametri per ricalcolare il blind index nei worker (picklable)"""
+    key: bytes
+    length: int
+    label: str
+    normalizer: Any
+
+
+def _reencrypt_rows(keys: Dict[str, bytes], tenants: Dict[str, Optional[str]], target_kid: str,
+                    context: str, blind_index: Optional[_BlindIndexSpec],
+                    rows: List[Tuple[Any, Optional[str], bool]]) -> List[Tuple[Any, str, str, Optional[str]]]:
+    """
+    Ri-cifra un chunk con la data key `target_kid` (eseguito nei processi worker).
+
+    Args:
+        keys: {kid: data key} per i kid presenti nel chunk e per il target
+        tenants: {kid: tenant della data key} (AAD v2)
+        context: `tabella.colonna` (AAD v2)
+        blind_index: Parametri del blind index della colonna (None se non ne ha)
+        rows: [(pk, ciphertext, blind index presente)]
+
+    Returns:
+        [(pk, vecchio valore, nuovo ciphertext v2, blind index o None)] solo per le righe cambiate
+    """
+    ciphers = {kid: AESGCM(key) for kid, key in keys.items()}
+    target = ciphers[target_kid]
+    prefix = f"{BOUND_FORMAT_VERSION}:{target_kid}:"
+    aad = field_aad(target_kid, tenants[target_kid], context)
+    index = BlindIndex(blind_index.key, blind_index.length) if blind_index else None
+    changed = [(pk, token, indexed) for pk, token, indexed in rows
+               if token is not None and (not token.startswith(prefix) or (index and not indexed))]
+    nonces = os.urandom(NONCE_SIZE * len(changed))
+    result = []
+    for i, (pk, token, indexed) in enumerate(changed):
+        kid = FieldEncryptionService.key_id(token)
+        if kid is None:
+            plaintext = token.encode("utf-8")  # valore legacy in chiaro: viene cifrato
+        else:
+            blob = base64.b64decode(token.split(":", 2)[2])
+            old_aad = field_aad(kid, tenants[kid], context) if token.startswith(BOUND_FORMAT_VERSION + ":") else kid.encode()
+            plaintext = ciphers[kid].decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], old_aad)
+        nonce = nonces[i * NONCE_SIZE:(i + 1) * NONCE_SIZE]
+        new_token = prefix + base64.b64encode(nonce + target.encrypt(nonce, plaintext, aad)).decode()
+        bidx = None
+        if index and not indexed:
+            bidx = index.compute(plaintext.decode("utf-8"), blind_index.label, blind_index.normalizer)
+        result.append((pk, token, new_token, bidx))
+    return result
+
+
+class _InlineExecutor:
+    """Esecuzione nel processo corrente (max_workers <= 1)"""
+
+    def map(self, fn, *iterables):
+        return map(fn, *iterables)
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def _make_executor(max_workers: int):
+    if max_workers <= 1:
+        return _InlineExecutor()
+    if multiprocessing.current_process().daemon:
+        # Worker Celery prefork (processo daemon): niente processi figli
+        logger.info("Processo daemon: re-encryption su thread invece che su processi")
+        return ThreadPoolExecutor(max_workers)
+    return ProcessPoolExecutor(max_workers)
+
+
+class _Throttle:
+    """Limita le righe al secondo dormendo tra un gruppo di chunk e il successivo"""
+
+    def __init__(self, max_rows_per_second: int = 0):
+        self.max_rows_per_second = max_rows_per_second
+        self.started = time.monotonic()
+        self.rows = 0
+
+    def wait(self, rows: int) -> None:
+        self.rows += rows
+        if not self.max_rows_per_second:
+            return
+        delay = self.rows / self.max_rows_per_second - (time.monotonic() - self.started)
+        if delay > 0:
+            time.sleep(delay)
+
+
+# ===== JOBS =====
+
+def start_key_rotation(db, tenant_id: Any = None,
+                       service: Optional[FieldEncryptionService] = None) -> KeyRotationJob:
+    """Nuova data key attiva per il tenant + job di re-encryption da eseguire nel worker"""
+    service = service or get_encryption_service()
+    tenant = None if tenant_id is None else str(tenant_id)
+    target_kid = service.rotate_data_key(tenant)
+    job = KeyRotationJob(tenant_id=tenant, target_kid=target_kid, status=STATUS_PENDING,
+                         rows_scanned=0, rows_reencrypted=0, chunks_done=0)
+    db.add(job)
+    db.flush()
+    audit_event(db, "key_rotation_started", details={"job_id": str(job.id), "target_kid": target_kid},
+                tenant_id=tenant)
+    db.commit()
+    db.refresh(job)
+    logger.info(f"🔑 Nuova data key {target_kid} per tenant {tenant or '*'}, job {job.id}")
+    return job
+
+
+def _read_chunk(db, column: EncryptedColumn, last_pk, chunk_size: int) -> List[Tuple[Any, Optional[str], bool]]:
+    pk = column.pk
+    indexed = column.table.c[column.blind_index].isnot(None) if column.blind_index else literal(True)
+    # type_coerce: ciphertext grezzo, senza passare dal TypeDecorator
+    stmt = select(pk, type_coerce(column.table.c[column.column_name], Text), indexed).order_by(pk).limit(chunk_size)
+    if last_pk is not None:
+        stmt = stmt.where(pk > last_pk)
+    if column.tenant_column is not None:
+        row_tenant = column.table.c[column.tenant_column]
+        if column.tenant_id is None:
+            stmt = stmt.where(row_tenant.is_(None))
+        else:
+            stmt = stmt.where(row_tenant == coerce_subject(row_tenant, column.tenant_id))
+    return [tuple(row) for row in db.execute(stmt)]
+
+
+def _write_chunk(db, column: EncryptedColumn, changes: List[Tuple[Any, str, str, Optional[str]]]) -> int:
+    if not changes:
+        return 0
+    target = column.table.c[column.column_name]
+    values = {column.column_name: type_coerce(bindparam("_new"), Text)}  # già cifrato: niente TypeDecorator
+    if column.blind_index:
+        # Blind index ricalcolato solo dove mancava
+        bidx = column.table.c[column.blind_index]
+        values[column.blind_index] = func.coalesce(bidx, bindparam("_bidx", type_=bidx.type))
+    stmt = (
+        update(column.table)
+        .where(column.pk == bindparam("_pk"))
+        .where(type_coerce(target, Text) == bindparam("_old"))  # la scrittura dell'app nel frattempo vince
+        .values(values)
+        .execution_options(synchronize_session=False)
+    )
+    params = [{"_pk": pk, "_old": old, "_new": new, "_bidx": bidx} for pk, old, new, bidx in changes]
+    result = db.connection().execute(stmt, params)
+    return result.rowcount if result.rowcount is not None and result.rowcount >= 0 else len(changes)
+
+
+def _blind_index_spec(column: EncryptedColumn) -> Optional[_BlindIndexSpec]:
+    if not column.blind_index:
+        return None
+    index, source = get_blind_index(), column.table.c[column.column_name]
+    return _BlindIndexSpec(index.key, index.length, blind_index_label(source), source.type.normalizer)
+
+
+def run_key_rotation_job(db, job_id, service: Optional[FieldEncryptionService] = None,
+                         columns: Optional[List[EncryptedColumn]] = None,
+                         chunk_size: int = DEFAULT_ROTATION_CHUNK_SIZE,
+                         max_workers: int = DEFAULT_ROTATION_WORKERS,
+                         max_rows_per_second: int = 0) -> KeyRotationJob:
+    """
+    Esegue (o riprende) la re-encryption verso `job.target_kid`.
+
+    Args:
+        db: Sessione SQLAlchemy
+        job_id: ID del KeyRotationJob
+        service: FieldEncryptionService (default: quello dell'app)
+        columns: Colonne da trattare (default: `find_encrypted_columns` del tenant)
+        chunk_size: Righe per chunk
+        max_workers: Processi worker (un chunk ciascuno per gruppo); <= 1 = inline,
+            thread se il processo corrente è daemon (es. worker Celery prefork)
+        max_rows_per_second: Throttle (0 = nessun limite)
+
+    Returns:
+        Il job aggiornato
+    """
+    job = db.get(KeyRotationJob, job_id)
+    if job is None:
+        raise ValueError(f"Key rotation job non trovato: {job_id}")
+    if job.status == STATUS_COMPLETED:
+        return job
+
+    service = service or get_encryption_service()
+    selected = find_encrypted_columns(tenant_id=job.tenant_id) if columns is None else columns
+    checkpoint = json.loads(job.checkpoint) if job.checkpoint else None
+    if checkpoint:
+        logger.info(f"♻️ Ripresa key rotation {job.id} da {checkpoint}")
+
+    job.status = STATUS_PROCESSING
+    job.error = None
+    job.started_at = job.started_at or datetime.utcnow()
+    db.commit()
+
+    keys: Dict[str, bytes] = {job.target_kid: service.data_key(job.target_kid)}
+    tenants: Dict[str, Optional[str]] = {job.target_kid: service.key_tenant(job.target_kid)}
+    group_size = max(1, max_workers)
+    executor = _make_executor(max_workers)
+    throttle = _Throttle(max_rows_per_second)
+    try:
+        for column in selected:
+            if checkpoint and column.key < checkpoint["column"]:
+                continue  # colonna già completata
+            if column.tenant_id != job.tenant_id:
+                column = EncryptedColumn(column.table, column.column_name, job.tenant_id)
+            context = column.table.c[column.column_name].type.context
+            blind_index = _blind_index_spec(column)
+            last_pk = None
+            if checkpoint and column.key == checkpoint["column"] and checkpoint["last_pk"] is not None:
+                last_pk = coerce_subject(column.pk, checkpoint["last_pk"])
+            while True:
+                # Lettura keyset di un gruppo di chunk, poi ri-cifratura in parallelo
+                chunks = []
+                for _ in range(group_size):
+                    rows = _read_chunk(db, column, last_pk, chunk_size)
+                    if not rows:
+                        break
+                    chunks.append(rows)
+                    last_pk = rows[-1][0]
+                    if len(rows) < chunk_size:
+                        break
+                if not chunks:
+                    break
+                for rows in chunks:
+                    for kid in {FieldEncryptionService.key_id(token) for _, token, _ in rows} - {None} - keys.keys():
+                        keys[kid] = service.data_key(kid)
+                        tenants[kid] = service.key_tenant(kid)
+                scanned = sum(len(rows) for rows in chunks)
+                n = len(chunks)
+                for changes in executor.map(_reencrypt_rows, [keys] * n, [tenants] * n, [job.target_kid] * n,
+                                            [context] * n, [blind_index] * n, chunks):
+                    job.rows_reencrypted += _write_chunk(db, column, changes)
+                job.rows_scanned += scanned
+                job.chunks_done += len(chunks)
+                job.checkpoint = json.dumps({"column": column.key, "last_pk": last_pk}, default=json_default)
+                db.commit()
+                throttle.wait(scanned)
+                if len(chunks[-1]) < chunk_size:
+                    break
+            checkpoint = None
+    except Exception as e:
+        db.rollback()
+        job.status = STATUS_FAILED
+        job.error = str(e)
+        db.commit()
+        raise
+    finally:
+        executor.shutdown(wait=True)
+
+    job.status = STATUS_COMPLETED
+    job.checkpoint = None
+    job.completed_at = datetime.utcnow()
+    audit_event(db, "key_rotation_completed", details={
+        "job_id": str(job.id), "target_kid": job.target_kid,
+        "rows_scanned": job.rows_scanned, "rows_reencrypted": job.rows_reencrypted,
+    }, tenant_id=job.tenant_id)
+    db.commit()
+    logger.info(f"✅ Key rotation {job.id}: {job.rows_reencrypted}/{job.rows_scanned} righe ri-cifrate")
+    return job
+
+
+def get_rotation_progress(job: KeyRotationJob) -> Dict[str, Any]:
+    """Stato del job per dashboard/CLI"""
+    return {
+        "job_id": str(job.id),
+        "tenant_id": job.tenant_id,
+        "target_kid": job.target_kid,
+        "status": job.status,
+        "rows_scanned": job.rows_scanned or 0,
+        "rows_reencrypted": job.rows_reencrypted or 0,
+        "chunks_done": job.chunks_done or 0,
+        "checkpoint": json.loads(job.checkpoint) if job.checkpoint else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None,
+        "error": job.error,
+    }
@@ -0,0 +1,32 @@
+"""
+Task Celery per i checkpoint Merkle dell'audit ledger.
+
+Ogni run costruisce i nodi nuovi e firma la root di ogni tenant la cui
+catena è cresciuta dall'ultimo checkpoint.
+"""
+import logging
+
+from core.celery import celery_app
+from plugins.gdpr_plugin.services import audit_checkpoint_service
+from plugins.gdpr_plugin.services.audit_service import list_audit_tenants
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(name="plugins.gdpr_plugin.tasks.audit_checkpoints.create_audit_checkpoints")
+def create_audit_checkpoints():
+    """Checkpoint firmato per ogni tenant dell'audit ledger"""
+    from core.database import SessionLocal
+    db = SessionLocal()
+    created = {}
+    try:
+        for tenant_id in list_audit_tenants(db.get_bind()):
+            try:
+                checkpoint = audit_checkpoint_service.create_checkpoint(db, tenant_id)
+                created[tenant_id] = checkpoint.tree_size if checkpoint else 0
+            except Exception as exc:
+                db.rollback()
+                logger.error(f"❌ Checkpoint audit {tenant_id} fallito: {exc}")
+        return created
+    finally:
+        db.close()
@@ -0,0 +1,40 @@
+"""
+Task Celery per il diritto all'oblio (Art. 17).
+
+Le richieste di erasure pendenti vengono elaborate in batch: un UPDATE
+set-based per tabella e un'unica transazione per run.
+"""
+import logging
+
+from core.celery import celery_app
+from core.config import settings
+from plugins.gdpr_plugin.services import anonymization_service
+from plugins.gdpr_plugin.services.export_service import register_default_export_sources
+
+logger = logging.getLogger(__name__)
+
+register_default_export_sources()
+
+
+@celery_app.task(
+    name="plugins.gdpr_plugin.tasks.erasure.process_pending_erasures",
+    bind=True,
+    acks_late=True,
+    max_retries=3,
+    default_retry_delay=300,
+)
+def process_pending_erasures(self):
+    """Anonimizza insieme tutti gli interessati con richiesta di erasure pendente"""
+    from core.database import SessionLocal
+    db = SessionLocal()
+    try:
+        return anonymization_service.process_pending_erasures(
+            db,
+            secret=settings.GDPR_ENCRYPTION_KEY,
+            batch_size=settings.GDPR_ERASURE_BATCH_SIZE,
+        )
+    except Exception as exc:
+        logger.error(f"❌ Erasure batch fallito, richieste ancora pending: {exc}")
+        raise self.retry(exc=exc)
+    finally:
+        db.close()
@@ -0,0 +1,58 @@
+"""
+Task Celery per gli export GDPR asincroni.
+
+`acks_late` + `reject_on_worker_lost`: se il worker muore durante un export
+il task torna in coda e riprende dall'ultimo checkpoint salvato sul job.
+"""
+import logging
+
+from core.celery import celery_app
+from core.config import settings
+from plugins.gdpr_plugin.services import export_job_service
+from plugins.gdpr_plugin.services.export_service import register_default_export_sources
+
+logger = logging.getLogger(__name__)
+
+register_default_export_sources()
+
+
+@celery_app.task(
+    name="plugins.gdpr_plugin.tasks.export_jobs.process_export_request",
+    bind=True,
+    acks_late=True,
+    reject_on_worker_lost=True,
+    max_retries=3,
+    default_retry_delay=30,
+)
+def process_export_request(self, request_id: str):
+    """Genera l'artifact di export per un DataSubjectRequest"""
+    from core.database import SessionLocal
+    db = SessionLocal()
+    try:
+        job = export_job_service.run_export_job(
+            db, request_id, settings.GDPR_EXPORT_DIR,
+            retention_hours=settings.GDPR_EXPORT_RETENTION_HOURS,
+        )
+        return {"request_id": request_id, "status": job.status, "rows": job.rows_written}
+    except export_job_service.ExportJobBusy:
+        # Consegna duplicata: il job è già in mano a un altro worker
+        logger.info(f"⏭️ Export {request_id} già in elaborazione, consegna ignorata")
+        return {"request_id": request_id, "status": "busy"}
+    except ValueError:
+        raise
+    except Exception as exc:
+        logger.error(f"❌ Export {request_id} fallito, retry dal checkpoint: {exc}")
+        raise self.retry(exc=exc)
+    finally:
+        db.close()
+
+
+@celery_app.task(name="plugins.gdpr_plugin.tasks.export_jobs.cleanup_expired_exports")
+def cleanup_expired_exports():
+    """Garbage collection degli artifact oltre GDPR_EXPORT_RETENTION_HOURS"""
+    from core.database import SessionLocal
+    db = SessionLocal()
+    try:
+        return {"expired": export_job_service.cleanup_expired_exports(db, settings.GDPR_EXPORT_DIR)}
+    finally:
+        db.close()
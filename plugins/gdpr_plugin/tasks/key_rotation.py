@@ -0,0 +1,57 @@
+"""
+Task Celery per la rotazione delle chiavi di cifratura.
+
+La re-encryption parte dopo GDPR_KEY_CACHE_TTL secondi, quando tutti i
+processi scrivono già con la nuova data key; `acks_late` +
+`reject_on_worker_lost` la fanno ripartire dall'ultimo checkpoint.
+"""
+import logging
+import uuid
+
+from core.celery import celery_app
+from core.config import settings
+from plugins.gdpr_plugin.services import key_rotation_service
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(name="plugins.gdpr_plugin.tasks.key_rotation.rotate_data_key")
+def rotate_data_key(tenant_id: str = None):
+    """Nuova data key attiva per il tenant e re-encryption schedulata"""
+    from core.database import SessionLocal
+    db = SessionLocal()
+    try:
+        job = key_rotation_service.start_key_rotation(db, tenant_id)
+        reencrypt_columns.apply_async((str(job.id),), countdown=settings.GDPR_KEY_CACHE_TTL)
+        return {"job_id": str(job.id), "target_kid": job.target_kid}
+    finally:
+        db.close()
+
+
+@celery_app.task(
+    name="plugins.gdpr_plugin.tasks.key_rotation.reencrypt_columns",
+    bind=True,
+    acks_late=True,
+    reject_on_worker_lost=True,
+    max_retries=5,
+    default_retry_delay=60,
+)
+def reencrypt_columns(self, job_id: str):
+    """Ri-cifra le colonne EncryptedString verso la data key del job"""
+    from core.database import SessionLocal
+    db = SessionLocal()
+    try:
+        job = key_rotation_service.run_key_rotation_job(
+            db, uuid.UUID(job_id),
+            chunk_size=settings.GDPR_KEY_ROTATION_CHUNK_SIZE,
+            max_workers=settings.GDPR_KEY_ROTATION_WORKERS,
+            max_rows_per_second=settings.GDPR_KEY_ROTATION_MAX_ROWS_PER_SECOND,
+        )
+        return key_rotation_service.get_rotation_progress(job)
+    except ValueError:
+        raise
+    except Exception as exc:
+        logger.error(f"❌ Key rotation {job_id} fallita, retry dal checkpoint: {exc}")
+        raise self.retry(exc=exc)
+    finally:
+        db.close()
@@ -1,3 +1,128 @@
-def anonymize_data(data):
-    # Logic for anonymizing data for GDPR compliance
-    pass
+"""
+🕶️ GDPR Anonymization - Strategie per colonna
+
+I modelli dichiarano le strategie in `__anonymize__`:
+
+    __anonymize__ = {
+        "email": "hash",                    # sha256(valore + salt), irreversibile
+        "name": "pseudonym",                # token stabile per interessato
+        "ip_address": "null",
+        "birth_date": ("generalize", "year"),
+        "age": ("generalize", 10),          # bucket numerico / prefisso stringa
+    }
+
+oppure `__anonymize__ = "delete"` per eliminare le righe dell'interessato.
+Sulle colonne `EncryptedString` hash e generalize lavorerebbero sul
+ciphertext: sono ammessi solo null e pseudonym (il token viene cifrato).
+Queste funzioni applicano le strategie in Python (dict e istanze ORM);
+`anonymization_service` le traduce in UPDATE set-based.
+"""
+import hashlib
+import hmac
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple, Union
+
+from core.database.base import register_anonymizer
+from core.database.types import EncryptedString
+from plugins.gdpr_plugin.utils.pseudonymization import Pseudonymizer
+
+STRATEGIES = ("null", "hash", "pseudonym", "generalize")
+ENCRYPTED_STRATEGIES = ("null", "pseudonym")
+DELETE = "delete"
+DATE_GRANULARITIES = ("year", "month", "day")
+
+StrategySpec = Union[str, Tuple[str, Any]]
+
+
+def parse_strategy(spec: StrategySpec) -> Tuple[str, Any]:
+    """"hash" → ("hash", None), ("generalize", "year") → ("generalize", "year")"""
+    name, option = (spec, None) if isinstance(spec, str) else (spec[0], spec[1])
+    if name not in STRATEGIES:
+        raise ValueError(f"Strategia di anonimizzazione non supportata: {name}. Disponibili: {list(STRATEGIES)}")
+    if name == "generalize" and not (option in DATE_GRANULARITIES or isinstance(option, int)):
+        raise ValueError(f"generalize richiede {list(DATE_GRANULARITIES)} o un intero, ricevuto: {option!r}")
+    return name, option
+
+
+def column_strategy(column, spec: StrategySpec) -> Tuple[str, Any]:
+    """parse_strategy + vincoli della colonna (cifrata: solo null/pseudonym)"""
+    name, option = parse_strategy(spec)
+    if column is not None and isinstance(column.type, EncryptedString) and name not in ENCRYPTED_STRATEGIES:
+        raise ValueError(f"Strategia {name} non applicabile alla colonna cifrata {column.name}: "
+                         f"usare {list(ENCRYPTED_STRATEGIES)}")
+    return name, option
+
+
+def derive_salt(secret: str, purpose: str = "hash") -> str:
+    """Salt derivato dal segreto: la chiave vera non finisce nei parametri SQL"""
+    return hmac.new(secret.encode(), purpose.encode(), hashlib.sha256).hexdigest()
+
+
+def hash_value(value: Any, salt: str) -> Optional[str]:
+    if value is None:
+        return None
+    return hashlib.sha256((str(value) + salt).encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=32)
+def _pseudonymizer(secret: str) -> Pseudonymizer:
+    return Pseudonymizer(secret)
+
+
+def pseudonym(subject_id: Any, secret: str) -> str:
+    """Token stabile per interessato: uguale in tutte le tabelle, non reversibile senza segreto"""
+    return _pseudonymizer(secret).token(subject_id)
+
+
+def generalize_value(value: Any, option: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, (datetime, date)):
+        granularity = option if option in DATE_GRANULARITIES else "year"
+        fields = {"year": dict(month=1, day=1), "month": dict(day=1), "day": {}}[granularity]
+        value = value.replace(**fields)
+        return value.replace(hour=0, minute=0, second=0, microsecond=0) if isinstance(value, datetime) else value
+    if isinstance(value, (int, float)) and isinstance(option, int):
+        return (value // option) * option
+    if isinstance(value, str) and isinstance(option, int):
+        return value[:option]
+    return value
+
+
+def apply_strategy(value: Any, spec: StrategySpec, subject_id: Any = None, secret: str = "") -> Any:
+    name, option = parse_strategy(spec)
+    if name == "null":
+        return None
+    if name == "hash":
+        return hash_value(value, derive_salt(secret))
+    if name == "pseudonym":
+        return None if value is None else pseudonym(subject_id, secret)
+    return generalize_value(value, option)
+
+
+def anonymize_data(data: Dict[str, Any], strategies: Dict[str, StrategySpec],
+                   subject_id: Any = None, secret: str = "") -> Dict[str, Any]:
+    """Copia anonimizzata di un record (campi senza strategia invariati)"""
+    result = dict(data)
+    for field_name, spec in strategies.items():
+        if field_name in result:
+            result[field_name] = apply_strategy(result[field_name], spec, subject_id, secret)
+    return result
+
+
+def anonymize_instance(instance, secret: str = "") -> None:
+    """Applica `__anonymize__` a un'istanza ORM (hook `BaseModel.anonymize`)"""
+    strategies = getattr(instance, "__anonymize__", None)
+    if not isinstance(strategies, dict):
+        return  # nessuna strategia o "delete" (gestito a livello di tabella)
+    subject_column = getattr(instance, "__gdpr_subject__", None) or "id"
+    subject_id = getattr(instance, subject_column, None)
+    table = getattr(instance, "__table__", None)
+    for field_name, spec in strategies.items():
+        if table is not None:
+            column_strategy(table.c.get(field_name), spec)
+        setattr(instance, field_name, apply_strategy(getattr(instance, field_name), spec, subject_id, secret))
+
+
+register_anonymizer(anonymize_instance)
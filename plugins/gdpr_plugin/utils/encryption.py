@@ -1,3 +1,34 @@
-def encrypt_data(data):
-    # Logic for encrypting data for GDPR compliance
-    pass
+"""
+🔐 GDPR Field Encryption - ri-esporta `core.database.types`
+
+I tipi `EncryptedString`/`BlindIndex` e il servizio di cifratura vivono nel
+core (li usano i modelli core); questo modulo resta per gli import del plugin.
+"""
+from core.database.types import (  # noqa: F401
+    BLIND_INDEX_LENGTH,
+    BOUND_FORMAT_VERSION,
+    DEFAULT_MASTER_KID,
+    FORMAT_VERSION,
+    NONCE_SIZE,
+    TAG_SIZE,
+    BlindIndex,
+    Ciphertext,
+    EncryptedString,
+    EncryptionError,
+    FieldEncryptionService,
+    MemoryKeyStore,
+    SQLKeyStore,
+    blind_index_for,
+    blind_index_label,
+    decrypt_data,
+    derive_master_key,
+    encrypt_data,
+    encrypt_for_column,
+    field_aad,
+    get_blind_index,
+    get_encryption_service,
+    master_keyring,
+    normalize_search_value,
+    set_blind_index,
+    set_encryption_service,
+)
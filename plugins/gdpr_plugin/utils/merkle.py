@@ -0,0 +1,83 @@
+"""
+🌳 Merkle tree SHA-256 per i batch dell'audit log
+
+Foglie e nodi interni con prefissi diversi (0x00 / 0x01, come RFC 6962):
+una foglia non può essere spacciata per un nodo interno. Con un numero
+dispari di nodi l'ultimo sale di livello invariato: la root coincide con
+MTH di RFC 6962, quindi valgono i suoi inclusion proof (O(log n) hash).
+"""
+import hashlib
+from typing import Callable, Iterable, List
+
+EMPTY_ROOT = hashlib.sha256(b"").hexdigest()
+
+
+def leaf_hash(entry_hash: str) -> bytes:
+    return hashlib.sha256(b"\x00" + bytes.fromhex(entry_hash)).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def root_of_leaves(leaves: List[bytes]) -> bytes:
+    """Root di una lista di foglie già hashate (`leaf_hash`)"""
+    level = leaves
+    while len(level) > 1:
+        paired = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0]
+
+
+def merkle_root(entry_hashes: Iterable[str]) -> str:
+    """Root esadecimale degli entry hash (in ordine di sequence)"""
+    leaves = [leaf_hash(h) for h in entry_hashes]
+    return root_of_leaves(leaves).hex() if leaves else EMPTY_ROOT
+
+
+def split_point(size: int) -> int:
+    """Massima potenza di 2 strettamente minore di `size` (> 1)"""
+    k = 1
+    while k * 2 < size:
+        k *= 2
+    return k
+
+
+def inclusion_path(index: int, size: int, subtree: Callable[[int, int], bytes], start: int = 0) -> List[bytes]:
+    """
+    Inclusion proof (RFC 6962 PATH) della foglia `index` in un albero di `size` foglie.
+
+    `subtree(start, size)` restituisce la root del sotto-albero sulle foglie
+    [start, start + size): il chiamante la legge dai nodi salvati.
+    """
+    path: List[bytes] = []
+    while size > 1:
+        k = split_point(size)
+        if index < k:
+            path.append(subtree(start + k, size - k))
+            size = k
+        else:
+            path.append(subtree(start, k))
+            index, start, size = index - k, start + k, size - k
+    return list(reversed(path))
+
+
+def verify_inclusion(index: int, size: int, entry_hash: str, proof: List[str], root: str) -> bool:
+    """Verifica un inclusion proof (algoritmo RFC 9162 §2.1.3.2)"""
+    if index >= size:
+        return False
+    fn, sn, r = index, size - 1, leaf_hash(entry_hash)
+    for sibling in proof:
+        p = bytes.fromhex(sibling)
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            r = node_hash(p, r)
+            while not fn & 1 and fn != 0:
+                fn, sn = fn >> 1, sn >> 1
+        else:
+            r = node_hash(r, p)
+        fn, sn = fn >> 1, sn >> 1
+    return sn == 0 and r.hex() == root
@@ -0,0 +1,168 @@
+"""
+🎭 GDPR Pseudonymization - Token deterministici con chiave (Art. 4(5))
+
+Stesso input + stessa chiave → stesso token: i dati restano collegabili per
+le analytics ma non riconducibili all'interessato senza la chiave.
+
+- HMAC-SHA256: il contesto HMAC con la chiave viene creato una volta sola
+  e clonato (`copy()`) per ogni valore, evitando il key schedule per riga
+- chiavi per tenant derivate dalla master key e tenute in cache
+- formati preservati per email e IP, API batch su liste/colonne/record
+  con memo dei valori ripetuti (una sola passata sui dati); il memo vive
+  solo per la durata della chiamata, nessun valore in chiaro resta in cache
+"""
+import hashlib
+import hmac
+import ipaddress
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+TOKEN_PREFIX = "anon_"
+DEFAULT_TOKEN_LENGTH = 16
+KINDS = ("token", "email", "name", "ip")
+
+_MEMO_MAX_SIZE = 10_000  # voci per chiamata a `batch`
+
+
+def _to_bytes(value: Any) -> bytes:
+    return value if isinstance(value, bytes) else str(value).encode("utf-8")
+
+
+class Pseudonymizer:
+    """Pseudonimizzazione deterministica HMAC-SHA256 con una chiave"""
+
+    def __init__(self, key: Union[str, bytes], length: int = DEFAULT_TOKEN_LENGTH, keep_email_domain: bool = True):
+        self._context = hmac.new(_to_bytes(key), digestmod=hashlib.sha256)
+        self.length = length
+        self.keep_email_domain = keep_email_domain
+
+    def digest(self, value: Any, domain: bytes = b"") -> bytes:
+        """HMAC del valore; `domain` separa i tipi (stesso valore → token diversi per email/IP)"""
+        mac = self._context.copy()
+        if domain:
+            mac.update(domain + b"\x00")
+        mac.update(_to_bytes(value))
+        return mac.digest()
+
+    # ===== SINGLE VALUE =====
+
+    def token(self, value: Any) -> Optional[str]:
+        if value is None:
+            return None
+        return TOKEN_PREFIX + self.digest(value).hex()[:self.length]
+
+    def email(self, value: Optional[str]) -> Optional[str]:
+        """Email valida: local part pseudonimizzata, dominio mantenuto (o pseudonimizzato)"""
+        if value is None:
+            return None
+        local, _, domain = value.strip().lower().rpartition("@")
+        if not local:
+            local, domain = domain, ""
+        pseudo_local = "u" + self.digest(local + "@" + domain, b"email").hex()[:self.length]
+        if self.keep_email_domain and domain:
+            return f"{pseudo_local}@{domain}"
+        return f"{pseudo_local}@" + self.digest(domain, b"email-domain").hex()[:8] + ".invalid"
+
+    def name(self, value: Optional[str]) -> Optional[str]:
+        """Nome leggibile e stabile, es. "Person 3F9A1C2B" (case-insensitive)"""
+        if value is None:
+            return None
+        return "Person " + self.digest(" ".join(value.lower().split()), b"name").hex()[:8].upper()
+
+    def ip(self, value: Optional[str], keep_prefix: int = 0) -> Optional[str]:
+        """IP della stessa famiglia; `keep_prefix` bit di rete restano invariati (es. 24 per /24)"""
+        if value is None:
+            return None
+        address = ipaddress.ip_address(value.strip())
+        bits = address.max_prefixlen
+        original = int(address)
+        pseudo = int.from_bytes(self.digest(address.packed, b"ip")[:bits // 8], "big")
+        if keep_prefix:
+            host_mask = (1 << (bits - keep_prefix)) - 1
+            pseudo = (original & ~host_mask) | (pseudo & host_mask)
+        return str(ipaddress.ip_address(pseudo) if bits == 32 else ipaddress.IPv6Address(pseudo))
+
+    def pseudonymize(self, value: Any, kind: str = "token") -> Any:
+        if kind not in KINDS:
+            raise ValueError(f"Tipo di pseudonimo non supportato: {kind}. Disponibili: {list(KINDS)}")
+        return getattr(self, kind)(value)
+
+    # ===== BATCH =====
+
+    def batch(self, values: Iterable[Any], kind: str = "token") -> List[Any]:
+        """Pseudonimizza una colonna: i valori ripetuti vengono calcolati una volta sola"""
+        if kind not in KINDS:
+            raise ValueError(f"Tipo di pseudonimo non supportato: {kind}. Disponibili: {list(KINDS)}")
+        fn = getattr(self, kind)
+        memo: Dict[Any, Any] = {}
+        result = []
+        append = result.append
+        for value in values:
+            memo_key = (value.__class__, value)  # 1, 1.0 e True hanno lo stesso hash ma token diversi
+            try:
+                pseudo = memo.get(memo_key)
+            except TypeError:  # valore non hashable: niente memo
+                append(fn(value))
+                continue
+            if pseudo is None:
+                if len(memo) >= _MEMO_MAX_SIZE:
+                    memo.clear()
+                pseudo = memo[memo_key] = fn(value)
+            append(pseudo)
+        return result
+
+    def records(self, rows: Iterable[Dict[str, Any]], fields: Dict[str, str],
+                chunk_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Stream di record con i campi `fields` ({"campo": kind}) pseudonimizzati.
+
+        Lavora a chunk: ogni colonna del chunk passa per `batch`.
+        """
+        chunk: List[Dict[str, Any]] = []
+        for row in rows:
+            chunk.append(dict(row))
+            if len(chunk) >= chunk_size:
+                yield from self._records_chunk(chunk, fields)
+                chunk = []
+        if chunk:
+            yield from self._records_chunk(chunk, fields)
+
+    def _records_chunk(self, chunk: List[Dict[str, Any]], fields: Dict[str, str]) -> List[Dict[str, Any]]:
+        for field_name, kind in fields.items():
+            column = self.batch((row.get(field_name) for row in chunk), kind)
+            for row, pseudo in zip(chunk, column):
+                if field_name in row:
+                    row[field_name] = pseudo
+        return chunk
+
+
+# ===== KEYS =====
+
+def derive_tenant_key(master_key: Union[str, bytes], tenant_id: Any = None) -> bytes:
+    """Chiave per tenant: HMAC(master, "pseudonym:<tenant>"), token non collegabili tra tenant"""
+    label = b"pseudonym:" + (_to_bytes(tenant_id) if tenant_id is not None else b"*")
+    return hmac.new(_to_bytes(master_key), label, hashlib.sha256).digest()
+
+
+@lru_cache(maxsize=1024)
+def _cached_pseudonymizer(master_key: Union[str, bytes], tenant_id: Any) -> Pseudonymizer:
+    return Pseudonymizer(derive_tenant_key(master_key, tenant_id))
+
+
+def get_pseudonymizer(tenant_id: Any = None, master_key: Optional[Union[str, bytes]] = None) -> Pseudonymizer:
+    """
+    Pseudonymizer (in cache) per un tenant.
+
+    Master key: `master_key` oppure GDPR_PSEUDONYMIZATION_KEY
+    (fallback GDPR_ENCRYPTION_KEY).
+    """
+    if master_key is None:
+        from core.config import settings
+        master_key = settings.GDPR_PSEUDONYMIZATION_KEY or settings.GDPR_ENCRYPTION_KEY
+    return _cached_pseudonymizer(master_key, None if tenant_id is None else str(tenant_id))
+
+
+def pseudonymize_values(values: Iterable[Any], kind: str = "token", tenant_id: Any = None,
+                        master_key: Optional[Union[str, bytes]] = None) -> List[Any]:
+    """Scorciatoia per `get_pseudonymizer(...).batch(values, kind)`"""
+    return get_pseudonymizer(tenant_id, master_key).batch(values, kind)
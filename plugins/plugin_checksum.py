@@ -0,0 +1,129 @@
+"""
+🔒 Checksum dei plugin con cache locale
+
+Il checksum di un plugin è lo SHA-256 dell'elenco ordinato
+`<path relativo>\\0<sha256 del file>\\n` dei suoi `.py`: cambiare, aggiungere,
+rinominare o rimuovere un file cambia il checksum. Il digest di ogni file è
+in cache (JSON locale) con chiave path + mtime/ctime/size/inode: al boot di
+un worker vengono rihashati solo i file cambiati, in un thread pool.
+
+Uso da CLI per aggiornare `manifest.json`:
+    python -m plugins.plugin_checksum plugins/gdpr_plugin
+"""
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.getenv("PLUGIN_CHECKSUM_CACHE", ".cache/plugin_checksums.json")
+_READ_BUFFER = 1 << 20
+
+
+def hash_file(path: Path) -> str:
+    """SHA-256 del file (file_digest: buffer grandi, GIL rilasciato durante l'hash)"""
+    with open(path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        hasher = hashlib.sha256()
+        for chunk in iter(lambda: f.read(_READ_BUFFER), b""):
+            hasher.update(chunk)
+        return hasher.hexdigest()
+
+
+def _stat_key(stat: os.stat_result) -> list:
+    return [stat.st_mtime_ns, stat.st_ctime_ns, stat.st_size, stat.st_ino]
+
+
+def tree_checksum(digests: List[Tuple[str, str]]) -> str:
+    hasher = hashlib.sha256()
+    for rel_path, digest in digests:
+        hasher.update(f"{rel_path}\0{digest}\n".encode())
+    return f"sha256:{hasher.hexdigest()}"
+
+
+def legacy_checksum(plugin_path: Path) -> str:
+    """Formato storico: SHA-256 del contenuto concatenato dei `.py` ordinati"""
+    hasher = hashlib.sha256()
+    for py_file in sorted(plugin_path.rglob("*.py")):
+        with open(py_file, "rb") as f:
+            for chunk in iter(lambda: f.read(_READ_BUFFER), b""):
+                hasher.update(chunk)
+    return f"sha256:{hasher.hexdigest()}"
+
+
+class ChecksumCache:
+    """Cache `{path: {"stat": [...], "sha256": ...}}` salvata in modo atomico"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_workers: Optional[int] = None):
+        self.path = Path(path)
+        self.max_workers = max_workers or min(8, (os.cpu_count() or 1) + 2)
+        self._entries: Optional[Dict[str, dict]] = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, dict]:
+        if self._entries is None:
+            try:
+                with open(self.path) as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = dict(self._entries)
+            self._dirty = False
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=".checksums-")
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            # Cache non scrivibile (FS read-only): si rihasha al prossimo boot
+            logger.warning(f"Checksum cache non salvata: {e}")
+
+    def file_digests(self, plugin_path: Path) -> List[Tuple[str, str]]:
+        """`(path relativo, sha256)` dei `.py` del plugin; rihasha solo i file cambiati"""
+        entries = self._load()
+        files = sorted(plugin_path.rglob("*.py"))
+        stale: List[Tuple[Path, str, list]] = []
+        digests: Dict[Path, str] = {}
+        for py_file in files:
+            key = str(py_file.resolve())
+            stat_key = _stat_key(py_file.stat())
+            cached = entries.get(key)
+            if cached and cached["stat"] == stat_key:
+                digests[py_file] = cached["sha256"]
+            else:
+                stale.append((py_file, key, stat_key))
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(stale))) as pool:
+                for (py_file, key, stat_key), digest in zip(stale, pool.map(hash_file, (s[0] for s in stale))):
+                    digests[py_file] = digest
+                    with self._lock:
+                        entries[key] = {"stat": stat_key, "sha256": digest}
+                        self._dirty = True
+        return [(py_file.relative_to(plugin_path).as_posix(), digests[py_file]) for py_file in files]
+
+    def plugin_checksum(self, plugin_path: Path) -> str:
+        checksum = tree_checksum(self.file_digests(Path(plugin_path)))
+        self.save()
+        return checksum
+
+
+if __name__ == "__main__":
+    for arg in sys.argv[1:]:
+        print(f"{arg}: {ChecksumCache().plugin_checksum(Path(arg))}")
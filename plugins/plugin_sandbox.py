@@ -1,26 +1,175 @@
+"""
+🔒 Analisi statica (AST) del codice dei plugin
+
+Ogni modulo del package viene analizzato: import usati, import non
+consentiti e chiamate bloccate, con file e riga. L'analisi è in cache per
+hash del contenuto (+ policy) su disco, così un worker che riparte rianalizza
+solo i file cambiati; con molti file da analizzare il parsing va in un
+process pool.
+"""
 import ast
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.getenv("PLUGIN_SANDBOX_CACHE", ".cache/plugin_sandbox")
+PARALLEL_MIN_FILES = 8
+
+
+@dataclass
+class SandboxFinding:
+    kind: str  # "import" | "call"
+    name: str
+    file: str
+    line: int
+
+
+@dataclass
+class SandboxReport:
+    """📋 Risultato dell'analisi di un plugin"""
+    plugin: str
+    files: List[str] = field(default_factory=list)
+    imports: Dict[str, List[str]] = field(default_factory=dict)  # file -> moduli importati
+    violations: List[SandboxFinding] = field(default_factory=list)
+    cached_files: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return not self.violations
+
+    def raise_for_violations(self):
+        """Stesse eccezioni di `validate_plugin_code` sulla prima violazione"""
+        for finding in self.violations:
+            where = f"{finding.file}:{finding.line}"
+            if finding.kind == "import":
+                raise ImportError(f"Import non consentito: {finding.name} ({where})")
+            raise RuntimeError(f"Uso di funzione bloccata: {finding.name} ({where})")
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def analyze_source(code: str, allowed_imports: Iterable[str], blocked_functions: Iterable[str]) -> dict:
+    """Analisi di un modulo (funzione top-level: eseguibile in un process pool)"""
+    allowed_imports, blocked_functions = set(allowed_imports), set(blocked_functions)
+    imports, violations = [], []
+    for node in ast.walk(ast.parse(code)):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imports.append(alias.name)
+                if alias.name.split('.')[0] not in allowed_imports:
+                    violations.append(("import", alias.name, node.lineno))
+        elif isinstance(node, ast.ImportFrom):
+            # Import relativi (`from .models import X`): interni al package
+            if node.level:
+                imports.append("." * node.level + (node.module or ""))
+            elif node.module:
+                imports.append(node.module)
+                if node.module.split('.')[0] not in allowed_imports:
+                    violations.append(("import", node.module, node.lineno))
+        elif isinstance(node, ast.Call):
+            name = getattr(node.func, 'id', None) or getattr(node.func, 'attr', None)
+            if name in blocked_functions:
+                violations.append(("call", name, node.lineno))
+    violations.sort(key=lambda v: v[2])
+    return {"imports": sorted(set(imports)), "violations": violations}
+
+
+def _analyze_file(args) -> dict:
+    path, allowed_imports, blocked_functions = args
+    with open(path, "r", encoding="utf-8") as f:
+        return analyze_source(f.read(), allowed_imports, blocked_functions)
+
 
 class PluginSandbox:
-    def __init__(self):
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_workers: Optional[int] = None):
         self.allowed_imports = {"fastapi", "sqlalchemy", "pydantic"}
         self.blocked_functions = {"exec", "eval", "__import__"}
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_workers = max_workers
+        self._memory_cache: Dict[str, dict] = {}
 
     def validate_plugin_code(self, plugin_code: str):
-        tree = ast.parse(plugin_code)
-        for node in ast.walk(tree):
-            # Blocca import non consentiti
-            if isinstance(node, ast.Import):
-                for alias in node.names:
-                    if alias.name.split('.')[0] not in self.allowed_imports:
-                        raise ImportError(f"Import non consentito: {alias.name}")
-            if isinstance(node, ast.ImportFrom):
-                if node.module and node.module.split('.')[0] not in self.allowed_imports:
-                    raise ImportError(f"Import non consentito: {node.module}")
-            # Blocca funzioni pericolose
-            if isinstance(node, ast.Call):
-                if hasattr(node.func, 'id') and node.func.id in self.blocked_functions:
-                    raise RuntimeError(f"Uso di funzione bloccata: {node.func.id}")
-                if hasattr(node.func, 'attr') and node.func.attr in self.blocked_functions:
-                    raise RuntimeError(f"Uso di funzione bloccata: {node.func.attr}")
+        result = analyze_source(plugin_code, self.allowed_imports, self.blocked_functions)
+        for kind, name, _ in result["violations"]:
+            if kind == "import":
+                raise ImportError(f"Import non consentito: {name}")
+            raise RuntimeError(f"Uso di funzione bloccata: {name}")
 
         return True
+
+    # ===== ANALISI DEL PACKAGE =====
+
+    def _cache_key(self, content: bytes) -> str:
+        policy = json.dumps([sorted(self.allowed_imports), sorted(self.blocked_functions)])
+        return hashlib.sha256(policy.encode() + b"\0" + content).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[dict]:
+        if key in self._memory_cache:
+            return self._memory_cache[key]
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self.cache_dir / f"{key}.json") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._memory_cache[key] = result
+        return result
+
+    def _cache_put(self, key: str, result: dict) -> None:
+        self._memory_cache[key] = result
+        if self.cache_dir is None:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=".analysis-")
+            with os.fdopen(fd, "w") as f:
+                json.dump(result, f)
+            os.replace(tmp, self.cache_dir / f"{key}.json")
+        except OSError as e:
+            logger.warning(f"Cache sandbox non salvata: {e}")
+
+    def analyze_plugin(self, plugin_path) -> SandboxReport:
+        """🔍 Analizza tutti i `.py` del plugin (bloccante: chiamare via to_thread)"""
+        plugin_path = Path(plugin_path)
+        report = SandboxReport(plugin=plugin_path.name)
+        results: Dict[Path, dict] = {}
+        missing = []
+        for py_file in sorted(plugin_path.rglob("*.py")):
+            key = self._cache_key(py_file.read_bytes())
+            cached = self._cache_get(key)
+            if cached is None:
+                missing.append((py_file, key))
+            else:
+                results[py_file] = cached
+                report.cached_files += 1
+
+        jobs = [(str(py_file), sorted(self.allowed_imports), sorted(self.blocked_functions)) for py_file, _ in missing]
+        if len(missing) >= PARALLEL_MIN_FILES:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                analyzed = list(pool.map(_analyze_file, jobs))
+        else:
+            # Pochi file: l'avvio dei processi costerebbe più del parsing
+            analyzed = [_analyze_file(job) for job in jobs]
+        for (py_file, key), result in zip(missing, analyzed):
+            self._cache_put(key, result)
+            results[py_file] = result
+
+        for py_file in sorted(results):
+            rel_path = py_file.relative_to(plugin_path).as_posix()
+            report.files.append(rel_path)
+            report.imports[rel_path] = list(results[py_file]["imports"])
+            report.violations.extend(
+                SandboxFinding(kind, name, rel_path, line)
+                for kind, name, line in results[py_file]["violations"]
+            )
+        return report
@@ -0,0 +1,112 @@
+"""
+🔌 Slot per plugin: route e middleware di proprietà del manager
+
+Ogni versione caricata di un plugin (`PluginGeneration`) ha un router e una
+lista di middleware propri: il plugin li riceve tramite `PluginAppProxy` al
+posto dell'app reale. Attivare una generation sostituisce *in place* il suo
+router nell'app (un'assegnazione, nessun await in mezzo): le richieste già
+instradate finiscono sulla versione vecchia, le nuove vedono la nuova.
+"""
+import asyncio
+import logging
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+
+logger = logging.getLogger(__name__)
+
+
+class PluginGeneration:
+    """Una versione caricata di un plugin: istanza, router, middleware e richieste in corso"""
+
+    def __init__(self, plugin_name: str, version: str = ""):
+        self.plugin_name = plugin_name
+        self.version = version
+        self.instance = None
+        self.middleware: List[Middleware] = []
+        self.route_entries: list = []  # voci del router nell'app (assegnate all'attivazione)
+        self.inflight = 0
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self.router = APIRouter(dependencies=[Depends(self._track_request)])
+
+    async def _track_request(self):
+        self.inflight += 1
+        self._drained.clear()
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            if not self.inflight:
+                self._drained.set()
+
+    async def wait_drained(self, timeout: Optional[float] = None) -> bool:
+        """Attende la fine delle richieste in corso; False se scade il timeout"""
+        try:
+            await asyncio.wait_for(self._drained.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class PluginAppProxy:
+    """
+    L'app vista da un plugin: `include_router`, decoratori di route e
+    middleware finiscono nella generation, tutto il resto va all'app reale.
+    """
+
+    _ROUTE_ATTRIBUTES = frozenset({
+        "get", "post", "put", "patch", "delete", "options", "head", "trace",
+        "api_route", "add_api_route", "websocket", "add_api_websocket_route",
+        "add_route", "add_websocket_route",
+    })
+
+    def __init__(self, app, generation: PluginGeneration):
+        self._app = app
+        self._generation = generation
+
+    def include_router(self, router, **kwargs):
+        self._generation.router.include_router(router, **kwargs)
+
+    def add_middleware(self, middleware_class, *args, **kwargs):
+        self._generation.middleware.append(Middleware(middleware_class, *args, **kwargs))
+
+    def middleware(self, middleware_type: str):
+        if middleware_type != "http":
+            raise ValueError(f"Middleware non supportato: {middleware_type}")
+
+        def decorator(func):
+            self.add_middleware(BaseHTTPMiddleware, dispatch=func)
+            return func
+        return decorator
+
+    def __getattr__(self, name):
+        if name in self._ROUTE_ATTRIBUTES:
+            return getattr(self._generation.router, name)
+        return getattr(self._app, name)
+
+
+class PluginMiddlewareDispatcher:
+    """
+    Middleware ASGI fisso che esegue i middleware dei plugin attivi.
+
+    Lo stack viene ricostruito solo quando il manager cambia
+    `middleware_version`; le richieste in corso tengono lo stack vecchio.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._version = 0
+        self._stack = app
+
+    async def __call__(self, scope, receive, send):
+        manager = getattr(getattr(scope.get("app"), "state", None), "plugin_manager", None)
+        if manager is None or scope["type"] == "lifespan":
+            return await self.app(scope, receive, send)
+        version = manager.middleware_version
+        if version != self._version:
+            self._stack = manager.build_middleware_stack(self.app)
+            self._version = version
+        await self._stack(scope, receive, send)
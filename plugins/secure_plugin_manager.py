@@ -3,15 +3,22 @@
 Zero-trust plugin loading con validation completa
 """
 import importlib
-import hashlib
 import logging
+import sys
 from pathlib import Path
 from typing import Dict, List, Optional, Set
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict, field
 from enum import Enum
 import asyncio
+import time
 from contextlib import asynccontextmanager
-from plugins.plugin_sandbox import PluginSandbox
+from starlette.routing import Match
+from plugins.plugin_sandbox import PluginSandbox, SandboxReport
+from plugins.plugin_slots import PluginAppProxy, PluginGeneration
+from plugins.plugin_checksum import ChecksumCache, legacy_checksum
+from core.request_context import plugin_context
+from core.startup_profiler import profiler
+from core.config_snapshot import PluginConfigStore
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +28,7 @@ class PluginStatus(Enum):
     LOADED = "loaded"
     FAILED = "failed"
     DISABLED = "disabled"
+    LAZY = "lazy"  # route registrate, import al primo accesso
 
 @dataclass
 class PluginManifest:
@@ -33,11 +41,66 @@ class PluginManifest:
     dependencies: List[str]
     min_python_version: str
     checksum: str  # SHA256 del plugin code
+    route_prefixes: List[str] = field(default_factory=list)  # per il lazy loading
 
 class SecurityError(Exception):
     """Eccezione per violazioni sicurezza plugin"""
     pass
 
+@dataclass
+class PluginLoadRecord:
+    """⏱️ Timeline di startup di un plugin (secondi dall'inizio del caricamento)"""
+    name: str
+    level: Optional[int] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    status: str = PluginStatus.UNKNOWN.value
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+def build_dependency_levels(manifests: Dict[str, "PluginManifest"]):
+    """
+    🔗 Livelli topologici (Kahn) del DAG delle dipendenze.
+
+    Restituisce `(levels, errors)`: i plugin di uno stesso livello non
+    dipendono l'uno dall'altro. Dipendenze non richieste e cicli finiscono
+    in `errors` (plugin -> motivo) insieme a tutto ciò che ne dipende.
+    """
+    errors: Dict[str, str] = {}
+    for name, manifest in manifests.items():
+        missing = [dep for dep in manifest.dependencies or [] if dep not in manifests]
+        if missing:
+            errors[name] = f"Dependency mancante: {', '.join(missing)}"
+
+    pending = {
+        name: set(manifest.dependencies or [])
+        for name, manifest in manifests.items() if name not in errors
+    }
+    levels: List[List[str]] = []
+    while pending:
+        # Chi dipende da un plugin scartato è scartato a sua volta
+        for name, deps in list(pending.items()):
+            failed = sorted(deps & errors.keys())
+            if failed:
+                errors[name] = f"Dependency non disponibile: {', '.join(failed)}"
+                del pending[name]
+        ready = sorted(name for name, deps in pending.items() if not deps)
+        if not ready:
+            for name in pending:
+                errors[name] = "Ciclo di dipendenze"
+            break
+        levels.append(ready)
+        for name in ready:
+            del pending[name]
+        for deps in pending.values():
+            deps.difference_update(ready)
+    return levels, errors
+
 class PluginSecurityValidator:
     """🔒 Validatore sicurezza plugin"""
     
@@ -89,8 +152,7 @@ class PluginSecurityValidator:
             raise SecurityError(f"Path plugin non valido: {plugin_path}")
         
         # ✅ 6. Python file validation  
-        python_files = list(plugin_path.rglob("*.py"))
-        if not python_files:
+        if next(plugin_path.rglob("*.py"), None) is None:
             raise SecurityError(f"Nessun file Python trovato in {plugin_name}")
         
         return True
@@ -98,57 +160,218 @@ class PluginSecurityValidator:
 class SecurePluginManager:
     """🔒 Plugin manager con security zero-trust"""
     
-    def __init__(self, app):
+    def __init__(self, app, checksum_cache: Optional[ChecksumCache] = None,
+                 plugin_configs: Optional[PluginConfigStore] = None):
         self.app = app
+        self.checksum_cache = checksum_cache or ChecksumCache()
+        self.plugin_configs = plugin_configs or PluginConfigStore()
         self.plugins: Dict[str, object] = {}
         self.plugin_status: Dict[str, PluginStatus] = {}
         self.manifests: Dict[str, PluginManifest] = {}
         self.security_validator = PluginSecurityValidator()
         self.sandbox = PluginSandbox()
+        self.sandbox_reports: Dict[str, SandboxReport] = {}
+        self.startup_timeline: Dict[str, PluginLoadRecord] = {}
+        self._origin = time.perf_counter()
+        self._levels: Dict[str, int] = {}
+        self._lazy_prefixes: Dict[str, str] = {}
+        self._lazy_tasks: Dict[str, asyncio.Future] = {}
+        self.generations: Dict[str, PluginGeneration] = {}
+        self.middleware_version = 0
+        self.drain_timeout = 30.0
     
-    async def load_enabled_plugins(self, plugin_names: List[str]):
-        """🔒 Load plugin con security validation"""
+    async def load_enabled_plugins(self, plugin_names: List[str], lazy: bool = False):
+        """
+        🔒 Load plugin con security validation, in ordine di dipendenza.
+
+        I plugin dello stesso livello del DAG vengono caricati in parallelo
+        (`asyncio.gather`); un plugin parte solo se tutte le sue dipendenze
+        sono LOADED. Un plugin fallito non ferma gli altri.
+
+        Con `lazy=True` i plugin che dichiarano `route_prefixes` (e da cui
+        nessun plugin eager dipende) restano LAZY: validazione, import e
+        initialize avvengono alla prima richiesta su uno dei prefissi
+        (`LazyPluginMiddleware`) o in `warm_up()`.
+        """
         
         logger.info(f"🔌 Caricamento plugin: {plugin_names}")
-        
-        # ✅ Load in isolation per evitare cascading failures
-        for plugin_name in plugin_names:
-            try:
-                await self._load_single_plugin(plugin_name)
-            except Exception as e:
-                logger.error(f"❌ Plugin {plugin_name} fallito: {e}")
-                self.plugin_status[plugin_name] = PluginStatus.FAILED
-                # ✅ CONTINUE: Non fermare per un plugin fallito
-                continue
+        origin = self._origin = time.perf_counter()
+        self.startup_timeline = {name: PluginLoadRecord(name) for name in plugin_names}
+        
+        # ✅ 1. Manifest (in parallelo): servono per costruire il DAG
+        with profiler.span("plugins.manifests", count=len(plugin_names)):
+            manifests = await asyncio.gather(
+                *(self._load_plugin_manifest(name) for name in plugin_names),
+                return_exceptions=True,
+            )
+        for plugin_name, manifest in zip(plugin_names, manifests):
+            if isinstance(manifest, BaseException):
+                self._mark_failed(plugin_name, manifest)
+            else:
+                self.manifests[plugin_name] = manifest
+        
+        # ✅ 2. Livelli topologici: dipendenze mancanti/cicliche → FAILED
+        levels, dependency_errors = build_dependency_levels(
+            {name: self.manifests[name] for name in plugin_names if name in self.manifests}
+        )
+        for plugin_name, reason in dependency_errors.items():
+            self._mark_failed(plugin_name, SecurityError(reason))
+        self._levels = {name: depth for depth, level in enumerate(levels) for name in level}
+        deferred = self._lazy_candidates(levels) if lazy else set()
+        
+        # ✅ 3. Load in isolation, livello per livello
+        for depth, level in enumerate(levels):
+            runnable = []
+            for plugin_name in level:
+                if plugin_name in deferred:
+                    self._defer_plugin(plugin_name)
+                    continue
+                failed_deps = [
+                    dep for dep in self.manifests[plugin_name].dependencies or []
+                    if self.plugin_status.get(dep) != PluginStatus.LOADED
+                ]
+                if failed_deps:
+                    self._mark_failed(plugin_name, SecurityError(f"Dependency fallita: {', '.join(failed_deps)}"))
+                else:
+                    runnable.append(plugin_name)
+            await asyncio.gather(*(self._load_timed(name, depth, origin) for name in runnable))
         
         # ✅ Dependency resolution dopo load
         await self._resolve_dependencies()
         
-        logger.info(f"✅ Plugin caricati: {list(self.plugins.keys())}")
+        total = time.perf_counter() - origin
+        logger.info(f"✅ Plugin caricati: {list(self.plugins.keys())} in {total * 1000:.1f}ms")
+    
+    # ===== LAZY LOADING =====
+    
+    def _lazy_candidates(self, levels: List[List[str]]) -> Set[str]:
+        """Plugin con route_prefixes, escluse le dipendenze (anche indirette) di plugin eager"""
+        eager: Set[str] = set()
+        for level in reversed(levels):
+            for plugin_name in level:
+                if plugin_name in eager or not self.manifests[plugin_name].route_prefixes:
+                    eager.add(plugin_name)
+                    eager.update(self.manifests[plugin_name].dependencies or [])
+        return {name for level in levels for name in level} - eager
+    
+    def _defer_plugin(self, plugin_name: str):
+        self.plugin_status[plugin_name] = PluginStatus.LAZY
+        self.startup_timeline[plugin_name].status = PluginStatus.LAZY.value
+        for prefix in self.manifests[plugin_name].route_prefixes:
+            self._lazy_prefixes[prefix.rstrip("/") or "/"] = plugin_name
+        logger.info(f"💤 Plugin {plugin_name} lazy: {self.manifests[plugin_name].route_prefixes}")
+    
+    @property
+    def has_lazy_routes(self) -> bool:
+        return bool(self._lazy_prefixes)
+    
+    def lazy_plugin_for_path(self, path: str, scope: Optional[dict] = None) -> Optional[str]:
+        """
+        Plugin LAZY (o fallito al load lazy) che serve `path`, se esiste.
+        Con `scope`, i path già serviti da una route dell'app (es. route core
+        sotto lo stesso prefisso) restano all'app.
+        """
+        for prefix, plugin_name in self._lazy_prefixes.items():
+            if path == prefix or path.startswith(prefix + "/") or prefix == "/":
+                if scope is not None and self._app_serves(scope):
+                    return None
+                return plugin_name
+        return None
+    
+    def _app_serves(self, scope: dict) -> bool:
+        # Un plugin LAZY non ha route registrate: ogni match è di altri (core o plugin caricati)
+        routes = getattr(getattr(self.app, "router", None), "routes", ())
+        return any(route.matches(scope)[0] != Match.NONE for route in routes)
+    
+    async def ensure_loaded(self, plugin_name: str) -> bool:
+        """Carica on-demand un plugin LAZY e le sue dipendenze; richieste concorrenti attendono lo stesso load"""
+        task = self._lazy_tasks.get(plugin_name)
+        if task is None:
+            if self.plugin_status.get(plugin_name) != PluginStatus.LAZY:
+                return self.plugin_status.get(plugin_name) == PluginStatus.LOADED
+            task = self._lazy_tasks[plugin_name] = asyncio.ensure_future(self._load_deferred(plugin_name))
+        # shield: una richiesta cancellata non interrompe il load per le altre
+        await asyncio.shield(task)
+        return self.plugin_status.get(plugin_name) == PluginStatus.LOADED
+    
+    async def _load_deferred(self, plugin_name: str):
+        for dep in self.manifests[plugin_name].dependencies or []:
+            if not await self.ensure_loaded(dep):
+                self._mark_failed(plugin_name, SecurityError(f"Dependency fallita: {dep}"))
+                return
+        await self._load_timed(plugin_name, self._levels.get(plugin_name), self._origin)
+        if self.plugin_status[plugin_name] == PluginStatus.LOADED:
+            # Le route reali sono registrate: via gli stub e lo schema OpenAPI in cache
+            self._lazy_prefixes = {p: n for p, n in self._lazy_prefixes.items() if n != plugin_name}
+            if hasattr(self.app, "openapi_schema"):
+                self.app.openapi_schema = None
+    
+    async def warm_up(self, delay: float = 0.0):
+        """🔥 Carica in background tutti i plugin ancora LAZY (dopo `delay` secondi)"""
+        await asyncio.sleep(delay)
+        for plugin_name in sorted(set(self._lazy_prefixes.values()), key=lambda n: self._levels.get(n, 0)):
+            await self.ensure_loaded(plugin_name)
+    
+    async def _load_timed(self, plugin_name: str, level: Optional[int], origin: float):
+        """Load di un plugin con timeline; gli errori restano confinati al plugin"""
+        record = self.startup_timeline.setdefault(plugin_name, PluginLoadRecord(plugin_name))
+        record.level = level
+        record.started_at = time.perf_counter() - origin
+        try:
+            with plugin_context(plugin_name), profiler.span(f"plugin.{plugin_name}", level=level):
+                await self._load_single_plugin(plugin_name, self.manifests.get(plugin_name))
+        except Exception as e:
+            self._mark_failed(plugin_name, e)
+        finally:
+            record.finished_at = time.perf_counter() - origin
+            record.status = self.plugin_status[plugin_name].value
+    
+    def _mark_failed(self, plugin_name: str, error: BaseException):
+        logger.error(f"❌ Plugin {plugin_name} fallito: {error}")
+        self.plugin_status[plugin_name] = PluginStatus.FAILED
+        record = self.startup_timeline.setdefault(plugin_name, PluginLoadRecord(plugin_name))
+        record.status = PluginStatus.FAILED.value
+        record.error = str(error)
     
-    async def _load_single_plugin(self, plugin_name: str):
+    def get_startup_timeline(self) -> List[dict]:
+        """⏱️ Timeline di startup, in ordine di avvio"""
+        records = sorted(
+            self.startup_timeline.values(),
+            key=lambda r: (r.started_at is None, r.started_at or 0.0, r.name),
+        )
+        return [{**asdict(r), "duration": r.duration} for r in records]
+    
+    async def _load_single_plugin(self, plugin_name: str, manifest: Optional[PluginManifest] = None):
         """🔒 Load singolo plugin con timeout e sandbox"""
         
         self.plugin_status[plugin_name] = PluginStatus.LOADING
         
         try:
-            # ✅ 1. Load manifest
-            manifest = await self._load_plugin_manifest(plugin_name)
+            # ✅ 1. Load manifest (se non già caricato per il DAG)
+            if manifest is None:
+                with profiler.span("manifest"):
+                    manifest = await self._load_plugin_manifest(plugin_name)
             self.manifests[plugin_name] = manifest
             
             # ✅ 2. Security validation
-            self.security_validator.validate_plugin(plugin_name, manifest)
+            with profiler.span("validation"):
+                self.security_validator.validate_plugin(plugin_name, manifest)
             
-            # ✅ 3. Import con timeout (5s max)
+            # ✅ 3. Import con timeout (5s max): route e middleware nella generation
+            generation = PluginGeneration(plugin_name, manifest.version)
             plugin_instance = await asyncio.wait_for(
-                self._import_plugin_safely(plugin_name, manifest),
+                self._import_plugin_safely(plugin_name, manifest, generation),
                 timeout=5.0
             )
+            generation.instance = plugin_instance
             
             # ✅ 4. Initialize plugin
-            await self._initialize_plugin(plugin_instance, manifest)
+            with profiler.span("initialize"):
+                await self._initialize_plugin(plugin_instance, manifest)
             
-            # ✅ 5. Register in app
+            # ✅ 5. Register in app (swap atomico se c'è già una versione attiva)
+            with profiler.span("activate"):
+                self._activate_generation(plugin_name, generation)
             self.plugins[plugin_name] = plugin_instance
             self.plugin_status[plugin_name] = PluginStatus.LOADED
             
@@ -184,23 +407,26 @@ class SecurePluginManager:
         except (json.JSONDecodeError, TypeError) as e:
             raise SecurityError(f"Manifest malformato: {e}")
     
-    async def _import_plugin_safely(self, plugin_name: str, manifest: PluginManifest):
+    async def _import_plugin_safely(self, plugin_name: str, manifest: PluginManifest,
+                                    generation: Optional[PluginGeneration] = None):
         """🔒 Import plugin in sandbox"""
         
         # ✅ 1. Checksum verification del codice
-        await self._verify_plugin_checksum(plugin_name, manifest.checksum)
+        with profiler.span("checksum"):
+            await self._verify_plugin_checksum(plugin_name, manifest.checksum)
         
-        # ✅ 1b. Static sandbox validation
-        plugin_path = Path(f"plugins/{plugin_name}/plugin.py")
-        if plugin_path.exists():
-            with open(plugin_path, "r", encoding="utf-8") as f:
-                plugin_code = f.read()
-            self.sandbox.validate_plugin_code(plugin_code)
+        # ✅ 1b. Static sandbox validation di tutti i moduli (cache per contenuto)
+        with profiler.span("sandbox") as span:
+            report = await asyncio.to_thread(self.sandbox.analyze_plugin, Path(f"plugins/{plugin_name}"))
+            span.attrs.update(files=len(report.files), cached_files=report.cached_files)
+        self.sandbox_reports[plugin_name] = report
+        report.raise_for_violations()
         
         # ✅ 2. Dynamic import con error handling
         try:
             module_name = f"plugins.{plugin_name}.plugin"
-            module = importlib.import_module(module_name)
+            with profiler.span("import", module=module_name):
+                module = importlib.import_module(module_name)
             
             # ✅ 3. Class name validation
             expected_class = f"{plugin_name.title().replace('_', '')}Plugin"
@@ -210,7 +436,11 @@ class SecurePluginManager:
                 raise SecurityError(f"Classe plugin non trovata: {expected_class}")
             
             # ✅ 4. Istanzia plugin
-            plugin_instance = plugin_class(self.app, manifest.permissions)
+            app = PluginAppProxy(self.app, generation) if generation is not None else self.app
+            with profiler.span("instantiate"):
+                plugin_instance = plugin_class(app, manifest.permissions)
+            # Sezione tipizzata da config/plugin_configs (già in memoria)
+            plugin_instance.plugin_config = self.plugin_configs.get(plugin_name)
             
             return plugin_instance
             
@@ -222,16 +452,15 @@ class SecurePluginManager:
         
         plugin_path = Path(f"plugins/{plugin_name}")
         
-        # ✅ Calculate checksum di tutti i file .py
-        hasher = hashlib.sha256()
-        
-        for py_file in sorted(plugin_path.rglob("*.py")):
-            with open(py_file, 'rb') as f:
-                hasher.update(f.read())
-        
-        actual_checksum = f"sha256:{hasher.hexdigest()}"
+        # ✅ Checksum dei file .py: solo i file cambiati vengono rihashati
+        # (thread pool, fuori dall'event loop)
+        actual_checksum = await asyncio.to_thread(self.checksum_cache.plugin_checksum, plugin_path)
         
         if actual_checksum != expected_checksum:
+            # Manifest col formato storico (contenuto concatenato): hash completo
+            if await asyncio.to_thread(legacy_checksum, plugin_path) == expected_checksum:
+                logger.warning(f"⚠️ Checksum legacy per {plugin_name}: aggiornare il manifest a {actual_checksum}")
+                return
             raise SecurityError(
                 f"Checksum mismatch per {plugin_name}: "
                 f"expected {expected_checksum}, got {actual_checksum}"
@@ -267,12 +496,123 @@ class SecurePluginManager:
         """📊 Status di tutti i plugin"""
         return {name: status.value for name, status in self.plugin_status.items()}
     
+    def health_checks(self) -> Dict[str, object]:
+        """
+        🩺 Check per `HealthProber.add_provider`: `health_check()` dei plugin
+        LOADED (col loro `health_check_timeout`), stato fisso per gli altri.
+        """
+        checks: Dict[str, object] = {}
+        for plugin_name, status in self.plugin_status.items():
+            plugin = self.plugins.get(plugin_name)
+            if status == PluginStatus.LOADED and hasattr(plugin, "health_check"):
+                checks[plugin_name] = (plugin.health_check, getattr(plugin, "health_check_timeout", None))
+            else:
+                checks[plugin_name] = self._static_health(plugin_name, status)
+        return checks
+    
+    def _static_health(self, plugin_name: str, status: PluginStatus):
+        async def check():
+            if status == PluginStatus.FAILED:
+                record = self.startup_timeline.get(plugin_name)
+                raise SecurityError(f"Plugin fallito: {record.error if record else 'errore sconosciuto'}")
+            # LAZY/DISABLED/LOADING/senza health_check: nessun probe
+            return {"status": "unknown" if status == PluginStatus.LOADED else status.value}
+        return check
+    
+    # ===== SLOT: ROUTE E MIDDLEWARE PER PLUGIN =====
+    
+    def _routes_changed(self):
+        mark_changed = getattr(self.app.router, "_mark_routes_changed", None)
+        if mark_changed is not None:
+            mark_changed()
+        self.app.openapi_schema = None
+    
+    def _activate_generation(self, plugin_name: str, generation: PluginGeneration) -> Optional[PluginGeneration]:
+        """Monta il router della generation al posto di quello attivo; restituisce la vecchia"""
+        previous = self.generations.get(plugin_name)
+        if self.app is not None:
+            routes = self.app.router.routes
+            # FastAPI recente aggiunge una voce sola, le versioni vecchie una per route
+            start = len(routes)
+            self.app.include_router(generation.router)
+            generation.route_entries = routes[start:]
+            del routes[start:]
+            # Nessun await da qui alla fine: lo swap è atomico per l'event loop
+            old_entries = previous.route_entries if previous is not None else []
+            if old_entries and old_entries[0] in routes:
+                index = routes.index(old_entries[0])
+                routes[index:index + len(old_entries)] = generation.route_entries
+            else:
+                routes.extend(generation.route_entries)
+            self._routes_changed()
+        self.generations[plugin_name] = generation
+        self.middleware_version += 1
+        return previous
+    
+    def _detach_generation(self, plugin_name: str) -> Optional[PluginGeneration]:
+        generation = self.generations.pop(plugin_name, None)
+        if generation is not None:
+            if self.app is not None:
+                routes = self.app.router.routes
+                routes[:] = [route for route in routes if not any(route is e for e in generation.route_entries)]
+                self._routes_changed()
+            self.middleware_version += 1
+        return generation
+    
+    def build_middleware_stack(self, app):
+        """Stack dei middleware dei plugin attivi attorno ad `app` (primo plugin = più esterno)"""
+        for generation in reversed(list(self.generations.values())):
+            for middleware_class, args, kwargs in reversed(generation.middleware):
+                app = middleware_class(app, *args, **kwargs)
+        return app
+    
+    async def _retire_generation(self, generation: PluginGeneration):
+        """Attende le richieste in corso sulla generation, poi ne fa il cleanup"""
+        if not await generation.wait_drained(self.drain_timeout):
+            logger.warning(f"⚠️ {generation.plugin_name}: {generation.inflight} richieste ancora in corso dopo {self.drain_timeout}s")
+        if hasattr(generation.instance, 'cleanup'):
+            await generation.instance.cleanup()
+    
+    def _purge_plugin_modules(self, plugin_name: str):
+        """Rimuove i moduli del plugin da sys.modules: il prossimo import legge il codice nuovo"""
+        package = f"plugins.{plugin_name}"
+        for module_name in [m for m in sys.modules if m == package or m.startswith(package + ".")]:
+            del sys.modules[module_name]
+        importlib.invalidate_caches()
+    
+    async def reload_plugin(self, plugin_name: str):
+        """
+        🔄 Hot reload: la nuova versione viene validata, importata e
+        inizializzata accanto a quella attiva, poi scambiata atomicamente.
+        Le richieste in corso finiscono sulla vecchia istanza, che viene
+        pulita solo dopo. Se il load fallisce resta attiva la vecchia.
+        """
+        previous = self.generations.get(plugin_name)
+        self._purge_plugin_modules(plugin_name)
+        # YAML riparsato solo se il file è cambiato
+        await asyncio.to_thread(self.plugin_configs.refresh)
+        try:
+            with plugin_context(plugin_name):
+                await self._load_single_plugin(plugin_name)
+        except Exception:
+            if previous is not None and self.generations.get(plugin_name) is previous:
+                self.plugin_status[plugin_name] = PluginStatus.LOADED
+            raise
+        if previous is not None:
+            await self._retire_generation(previous)
+        logger.info(f"🔄 Plugin {plugin_name} ricaricato (v{self.generations[plugin_name].version})")
+    
     async def unload_plugin(self, plugin_name: str):
         """🔒 Unload plugin safely"""
         
         if plugin_name in self.plugins:
             plugin = self.plugins[plugin_name]
             
+            # ✅ Stacca route e middleware, poi attende le richieste in corso
+            generation = self._detach_generation(plugin_name)
+            if generation is not None and not await generation.wait_drained(self.drain_timeout):
+                logger.warning(f"⚠️ {plugin_name}: unload con richieste ancora in corso")
+            
             # ✅ Cleanup plugin
             if hasattr(plugin, 'cleanup'):
                 await plugin.cleanup()
@@ -291,5 +631,28 @@ class SecurePluginManager:
         
         logger.info("🔌 Tutti i plugin sono stati unloaded")
 
+class LazyPluginMiddleware:
+    """
+    💤 Middleware ASGI del lazy loading: se il path appartiene a un plugin
+    LAZY lo carica (una volta sola) prima di passare al router, dove ormai
+    ci sono le route reali. Senza plugin LAZY costa un attributo letto.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket"):
+            manager = getattr(getattr(scope.get("app"), "state", None), "plugin_manager", None)
+            if manager is not None and manager.has_lazy_routes:
+                plugin_name = manager.lazy_plugin_for_path(scope["path"], scope)
+                if plugin_name is not None and not await manager.ensure_loaded(plugin_name):
+                    if scope["type"] == "websocket":
+                        return await send({"type": "websocket.close", "code": 1013})
+                    from starlette.responses import JSONResponse
+                    response = JSONResponse({"detail": f"Plugin {plugin_name} non disponibile"}, status_code=503)
+                    return await response(scope, receive, send)
+        await self.app(scope, receive, send)
+
 # ✅ Export
-__all__ = ['SecurePluginManager', 'PluginManifest', 'PluginStatus', 'SecurityError']
+__all__ = ['SecurePluginManager', 'PluginManifest', 'PluginStatus', 'PluginLoadRecord', 'LazyPluginMiddleware', 'SecurityError', 'build_dependency_levels']
@@ -1,6 +1,7 @@
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 import os
+from core.metrics import record_security_block
 
 BLOCKED_IPS = os.getenv("BLOCKED_IPS", "").split(",") if os.getenv("BLOCKED_IPS") else []
 
@@ -8,5 +9,6 @@ class IPBlockingMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         ip = request.client.host
         if ip in BLOCKED_IPS:
+            record_security_block("ip_blocked")
             return Response("IP blocked", status_code=403)
         return await call_next(request)
@@ -7,9 +7,11 @@ from starlette.middleware.base import BaseHTTPMiddleware
 import time
 import redis
 import os
+from core.metrics import record_security_block, watch_redis_pool
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
 r = redis.Redis.from_url(REDIS_URL)
+watch_redis_pool("rate_limit", r.connection_pool)
 RATE_LIMIT = 100  # richieste per IP ogni 60 secondi
 WINDOW = 60
 logger = logging.getLogger(__name__)
@@ -26,6 +28,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             # Check with timeout
             async with asyncio.timeout(1.0):  # 1 second timeout
                 if await self.is_rate_limited(key):
+                    record_security_block("rate_limit")
                     return Response(
                         content=json.dumps({
                             "error": "Rate limit exceeded",
@@ -4,10 +4,12 @@
 from plugins.base_plugin import BasePlugin
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import JSONResponse
+import asyncio
 import time
 import redis
 from typing import Dict, Set
 import logging
+from core.metrics import record_security_block
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +38,16 @@ class SecurityPlugin(BasePlugin):
         self.app.middleware("http")(self.security_middleware)
         logger.info("✅ Security middleware registered")
         
+    async def health_check(self):
+        """Redis del plugin (client creato in initialize): senza Redis il plugin è degradato"""
+        if self.redis_client is None:
+            return {"status": "degraded", "redis": "not configured"}
+        try:
+            await asyncio.to_thread(self.redis_client.ping)
+        except redis.RedisError as e:
+            return {"status": "degraded", "redis": "unavailable", "error": str(e)}
+        return {"redis": "accessible", "blocked_ips": len(self.blocked_ips)}
+        
     def register_routes(self):
         """Register security API routes"""
         from fastapi import APIRouter
@@ -71,6 +83,7 @@ class SecurityPlugin(BasePlugin):
         # Bot detection
         if self._is_bot(user_agent):
             logger.warning(f"🚫 Bot detected: {client_ip} - {user_agent}")
+            record_security_block("bot")
             return JSONResponse(
                 status_code=403,
                 content={"error": "Bot access denied"}
@@ -79,6 +92,7 @@ class SecurityPlugin(BasePlugin):
         # Rate limiting
         if self._is_rate_limited(client_ip):
             logger.warning(f"⚡ Rate limited: {client_ip}")
+            record_security_block("rate_limit")
             return JSONResponse(
                 status_code=429,
                 content={"error": "Rate limit exceeded"}
@@ -0,0 +1,97 @@
+import os
+from typing import Dict, List
+
+import pytest
+from pydantic import BaseModel
+
+from core.config_snapshot import FrozenSettings, PluginConfigStore
+
+
+class DemoSettings(BaseModel):
+    ENVIRONMENT: str = "production"
+    ENABLED_PLUGINS: List[str] = ["gdpr"]
+    LIMITS: Dict[str, List[int]] = {"api": [60, 600]}
+
+
+def test_snapshot_is_immutable_with_slots():
+    snapshot = FrozenSettings.from_settings(DemoSettings())
+    assert snapshot.ENABLED_PLUGINS == ("gdpr",) and snapshot.LIMITS["api"] == (60, 600)
+    assert snapshot.is_production and snapshot.gdpr_enabled and not snapshot.security_enabled
+    assert not hasattr(snapshot, "__dict__")
+    with pytest.raises(AttributeError):
+        snapshot.ENVIRONMENT = "development"
+    with pytest.raises(TypeError):
+        snapshot.LIMITS["api"] = (1,)
+    assert snapshot.to_dict() == DemoSettings().model_dump()
+
+
+def test_plugin_config_store_reparses_only_changed_files(tmp_path, monkeypatch):
+    (tmp_path / "gdpr.yml").write_text("gdpr:\n  enabled: true\n  features:\n    data_export: true\n  settings:\n    retention_days: 1095\n")
+    (tmp_path / "security.yml").write_text("security:\n  enabled: false\n")
+    store = PluginConfigStore(tmp_path)
+    parsed = []
+    original_parse = store._parse
+    monkeypatch.setattr(store, "_parse", lambda path: parsed.append(path.name) or original_parse(path))
+
+    gdpr = store.get("gdpr_plugin")
+    assert gdpr.feature("data_export") and gdpr.settings["retention_days"] == 1095
+    assert not store.get("security").feature("rate_limiting")
+    assert sorted(parsed) == ["gdpr.yml", "security.yml"]
+
+    # Nessun cambiamento: nessun parsing
+    parsed.clear()
+    assert store.refresh() == [] and parsed == []
+
+    security = tmp_path / "security.yml"
+    security.write_text("security:\n  enabled: true\n  features:\n    rate_limiting: true\n")
+    os.utime(security, ns=(1, 1))
+    assert store.refresh() == ["security"] and parsed == ["security.yml"]
+    assert store.get("security").feature("rate_limiting")
+
+    # File non valido: resta la versione precedente
+    security.write_text("security: [")
+    assert store.refresh() == [] and store.get("security").enabled
+
+    (tmp_path / "gdpr.yml").unlink()
+    assert store.refresh() == ["gdpr"] and store.get("gdpr") is None
+
+
+def test_plugin_configs_on_fresh_module_state(tmp_path):
+    # Stato iniziale (nessuna snapshot): get_plugin_configs() chiama get_settings(),
+    # che prende lo stesso lock non rientrante. In un processo nuovo, con timeout:
+    # un deadlock fa fallire il test invece di bloccarlo
+    import subprocess
+    import sys
+    from pathlib import Path
+    (tmp_path / "gdpr.yml").write_text("gdpr:\n  enabled: true\n")
+    code = ("from core.config_snapshot import get_plugin_configs, get_plugin_config; "
+            "assert get_plugin_configs() is get_plugin_configs(); "
+            "print(get_plugin_config('gdpr_plugin').enabled)")
+    env = {**os.environ, "PYTHONPATH": str(Path(__file__).resolve().parents[2]),
+           "DATABASE_URL": f"sqlite:///{tmp_path / 'app.db'}", "PLUGIN_CONFIG_PATH": str(tmp_path)}
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=30)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "True"
+
+
+def test_reload_updates_snapshot_and_global_settings(tmp_path):
+    # Processo nuovo: core.config legge .env e ambiente all'import
+    import subprocess
+    import sys
+    from pathlib import Path
+    code = ("import os\n"
+            "from core.config import settings\n"
+            "from core.config_snapshot import get_settings, reload_settings\n"
+            "assert get_settings().PROJECT_NAME == settings.PROJECT_NAME == 'before'\n"
+            "os.environ['PROJECT_NAME'] = 'after'\n"
+            "assert reload_settings()\n"
+            "from core.config import settings as again\n"
+            "assert again is settings\n"
+            "print(get_settings().PROJECT_NAME, settings.PROJECT_NAME)\n")
+    env = {**os.environ, "PYTHONPATH": str(Path(__file__).resolve().parents[2]),
+           "DATABASE_URL": f"sqlite:///{tmp_path / 'app.db'}", "PROJECT_NAME": "before"}
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=30)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "after after"
@@ -0,0 +1,131 @@
+import asyncio
+import random
+import pytest
+from collections import defaultdict
+
+from core.performance_monitor import GDPRPerformanceMonitor, build_performance_report, slo_threshold
+from core.utils.latency_sketch import LatencySketch
+
+
+class MemoryRedis:
+    """Sottoinsieme dei comandi Redis usati dal monitor (hash, set, pipeline)"""
+
+    def __init__(self):
+        self.hashes = defaultdict(dict)
+        self.sets = defaultdict(set)
+
+    def pipeline(self, transaction=False):
+        return MemoryPipeline(self)
+
+
+class MemoryPipeline:
+    def __init__(self, redis):
+        self.redis, self.results = redis, []
+
+    def hincrby(self, key, field, n):
+        fields = self.redis.hashes[key]
+        fields[str(field).encode()] = str(int(fields.get(str(field).encode(), 0)) + n).encode()
+
+    def hgetall(self, key):
+        self.results.append(dict(self.redis.hashes.get(key, {})))
+
+    def sadd(self, key, member):
+        self.redis.sets[key].add(member.encode())
+
+    def smembers(self, key):
+        self.results.append(set(self.redis.sets.get(key, set())))
+
+    def expire(self, key, ttl):
+        pass
+
+    def execute(self):
+        results, self.results = self.results, []
+        return results
+
+
+def test_sketch_quantiles_within_relative_accuracy():
+    rng = random.Random(7)
+    values = sorted(rng.lognormvariate(3, 1) for _ in range(20000))
+    sketch = LatencySketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+    estimates = sketch.quantiles((0.5, 0.95, 0.99))
+    for q, estimate in estimates.items():
+        exact = values[int(q * (len(values) - 1))]
+        assert abs(estimate - exact) / exact <= 0.011
+        assert estimate == sketch.quantile(q)
+
+
+def test_slo_threshold_prefers_most_specific_pattern():
+    slo = {"*": 500.0, "* /api/gdpr/export*": 2000.0, "POST /api/gdpr/export/requests": 3000.0}
+    assert slo_threshold("GET /api/gdpr/consent", slo) == 500.0
+    assert slo_threshold("GET /api/gdpr/export/requests/{request_id}", slo) == 2000.0
+    assert slo_threshold("POST /api/gdpr/export/requests", slo) == 3000.0
+    assert slo_threshold("GET /x", {"POST *": 1.0}) is None
+
+
+def test_workers_merge_through_redis_into_window_report():
+    store = MemoryRedis()
+    options = dict(redis_client=store, flush_interval=0, retention_minutes=60,
+                   slo_p95_ms={"*": 90.0, "* /api/gdpr/export*": 5000.0})
+    worker_a, worker_b = GDPRPerformanceMonitor(**options), GDPRPerformanceMonitor(**options)
+    for i in range(1, 101):
+        worker_a.record("GET /api/gdpr/consent", float(i))
+        worker_b.record("POST /api/gdpr/export/requests", float(i * 10))
+    worker_a.flush()
+    worker_b.flush()
+
+    report = asyncio.run(worker_a.get_performance_report(window_minutes=5))
+    consent = report["operations"]["GET /api/gdpr/consent"]
+    export = report["operations"]["POST /api/gdpr/export/requests"]
+    assert consent["count"] == 100 and abs(consent["p50_ms"] - 50) <= 1
+    assert consent["slo_breached"] and not export["slo_breached"]
+    assert abs(export["p99_ms"] - 990) <= 10
+    assert report["slo_breaches"] == ["GET /api/gdpr/consent"]
+    assert build_performance_report({}, {}, 5)["operations"] == {}
+
+
+def test_flush_runs_in_background_one_at_a_time():
+    import threading
+    from types import SimpleNamespace
+
+    release, flushes = threading.Event(), []
+
+    class HangingRedis(MemoryRedis):
+        def pipeline(self, transaction=False):
+            flushes.append(1)
+            release.wait(5)  # Redis irraggiungibile: il flush resta appeso
+            return super().pipeline(transaction)
+
+    monitor = GDPRPerformanceMonitor(redis_client=HangingRedis(), flush_interval=0,
+                                     retention_minutes=60, slo_p95_ms={})
+    request = SimpleNamespace(method="GET", scope={"route": SimpleNamespace(path="/api/gdpr/consent")})
+
+    async def call_next(_):
+        return "response"
+
+    async def scenario():
+        for _ in range(5):
+            assert await asyncio.wait_for(monitor.monitor_request(request, call_next), 1) == "response"
+            await asyncio.sleep(0.01)
+        assert len(flushes) == 1 and not monitor._flush_task.done()
+        release.set()
+        await monitor._flush_task
+
+    asyncio.run(scenario())
+    assert len(flushes) == 1
+
+
+def test_failed_requests_are_recorded():
+    from types import SimpleNamespace
+
+    monitor = GDPRPerformanceMonitor(redis_client=MemoryRedis(), flush_interval=3600,
+                                     retention_minutes=60, slo_p95_ms={})
+    request = SimpleNamespace(method="POST", scope={"route": SimpleNamespace(path="/api/gdpr/delete")})
+
+    async def call_next(_):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(monitor.monitor_request(request, call_next))
+    assert [operation for operation, _ in monitor._pending] == ["POST /api/gdpr/delete"]
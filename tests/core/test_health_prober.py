@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import time
+
+from core.health_prober import HealthProber
+
+
+def test_checks_run_concurrently_with_per_dependency_timeout():
+    release = threading.Event()
+    calls = {"slow": 0}
+
+    def slow():
+        calls["slow"] += 1
+        release.wait(5)
+
+    async def failing():
+        raise ConnectionError("refused")
+
+    prober = HealthProber(checks={"db": lambda: {"pool": 1}, "slow": slow, "redis": failing},
+                          interval=30, timeout=0.05)
+
+    async def scenario():
+        start = time.perf_counter()
+        first = await prober.check_now()
+        assert time.perf_counter() - start < 1
+        assert first["status"] == "degraded"
+        assert first["checks"]["db"] == {"status": "healthy", "pool": 1, "latency_ms": first["checks"]["db"]["latency_ms"]}
+        assert first["checks"]["slow"]["error"].startswith("timeout")
+        assert first["checks"]["redis"]["error"] == "refused"
+        # Il check ancora appeso non apre un secondo thread
+        await prober.check_now()
+        assert calls["slow"] == 1
+        release.set()
+        await asyncio.sleep(0.05)
+        assert (await prober.check_now())["checks"]["slow"]["status"] == "healthy"
+        assert calls["slow"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_snapshot_is_cached_and_refreshed_once_when_stale():
+    calls = []
+
+    async def ping():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+
+    prober = HealthProber(checks={"redis": ping}, interval=30, timeout=1)
+
+    async def scenario():
+        snapshots = await asyncio.gather(*(prober.get_snapshot() for _ in range(5)))
+        assert len(calls) == 1 and all(s["status"] == "healthy" for s in snapshots)
+        await prober.get_snapshot()
+        assert len(calls) == 1
+        prober._checked_at -= prober.max_age + 1
+        await prober.get_snapshot()
+        assert len(calls) == 2
+
+        prober.interval = 0.01
+        prober.start()
+        await asyncio.sleep(0.1)
+        await prober.stop()
+        assert len(calls) > 3
+
+    asyncio.run(scenario())
@@ -0,0 +1,61 @@
+import json
+import logging
+import queue
+from logging.handlers import QueueListener
+
+from core.logging_config import ContextFilter, ContextQueueHandler, SamplingFilter, StructuredFormatter
+from core.request_context import request_context
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+def _pipeline(*filters):
+    log_queue = queue.SimpleQueue()
+    sink = ListHandler()
+    sink.setFormatter(StructuredFormatter({"service": "test"}))
+    handler = ContextQueueHandler(log_queue)
+    for log_filter in filters:
+        handler.addFilter(log_filter)
+    logger = logging.getLogger("tests.logging_pipeline")
+    logger.handlers, logger.propagate = [handler], False
+    logger.setLevel(logging.DEBUG)
+    return logger, QueueListener(log_queue, sink), sink
+
+
+def test_queue_pipeline_keeps_context_and_exceptions():
+    logger, listener, sink = _pipeline(ContextFilter())
+    listener.start()
+    with request_context(request_id="req-123", user_id="u-1"):
+        logger.info("export %s", "ok", extra={"gdpr_operation": "export", "data_subject_id": "u-1"})
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("failed")
+    logger.info("outside")
+    listener.stop()
+
+    first, second, third = (json.loads(line) for line in sink.lines)
+    assert first["message"] == "export ok" and first["service"] == "test"
+    assert first["request_id"] == "req-123" and first["user_id"] == "u-1" and first["gdpr_operation"] == "export"
+    assert "ValueError: boom" in second["exception"] and second["request_id"] == "req-123"
+    assert "request_id" not in third
+    assert first["timestamp"].startswith("20") and len(first["timestamp"]) == 26
+
+
+def test_sampling_never_drops_warnings():
+    logger, listener, sink = _pipeline(SamplingFilter(debug_rate=0.0, security_rate=0.0))
+    listener.start()
+    for _ in range(50):
+        logger.debug("noise")
+        logger.info("login", extra={"security_event": "login_ok"})
+    logger.info("kept")
+    logger.warning("blocked", extra={"security_event": "brute_force"})
+    listener.stop()
+    assert [json.loads(line)["message"] for line in sink.lines] == ["kept", "blocked"]
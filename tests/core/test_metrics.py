@@ -0,0 +1,48 @@
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from core import metrics
+
+
+def _app():
+    app = FastAPI()
+    users = APIRouter()
+
+    @users.get("/users/{user_id}")
+    async def get_user(user_id: int):
+        return {"id": user_id}
+
+    app.include_router(users, prefix="/api/v1")
+    app.add_middleware(metrics.MetricsMiddleware)
+    app.add_route("/metrics", metrics.metrics_endpoint, include_in_schema=False)
+    return app
+
+
+def test_route_template_uses_route_pattern_not_raw_path():
+    seen = []
+    app = _app()
+
+    @app.middleware("http")
+    async def spy(request, call_next):
+        response = await call_next(request)
+        seen.append(metrics.route_template(request.scope))
+        return response
+
+    client = TestClient(app)
+    client.get("/api/v1/users/1")
+    client.get("/api/v1/users/2")
+    client.get("/does-not-exist")
+    assert seen == ["/api/v1/users/{user_id}", "/api/v1/users/{user_id}", metrics.UNMATCHED_ROUTE]
+
+
+def test_metrics_endpoint_exposes_route_histograms():
+    pytest.importorskip("prometheus_client")
+    client = TestClient(_app())
+    client.get("/api/v1/users/7")
+    metrics.record_security_block("bot")
+
+    body = client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/v1/users/{user_id}",status="200"}' in body
+    assert 'security_blocked_requests_total{reason="bot"}' in body
+    assert "/api/v1/users/7" not in body
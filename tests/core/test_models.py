@@ -9,3 +9,13 @@ def test_content_model():
 def test_organization_model():
     # Test organization model creation and fields
     pass
+
+
+def test_core_models_do_not_load_plugins():
+    # EncryptedString vive nel core: importare i modelli non carica il plugin GDPR
+    import subprocess
+    import sys
+    code = ("import sys, core.models.user; "
+            "print(sorted(m for m in sys.modules if m.startswith(('plugins', 'core.config'))))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,105 @@
+import asyncio
+import datetime
+import json
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.models.content import Content
+from core.services.content_service import iter_contents, list_contents
+from core.utils.pagination import decode_cursor, encode_cursor, ndjson_response
+
+TENANT, OTHER = uuid.uuid4(), uuid.uuid4()
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Content.__table__.create(engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    start = datetime.datetime(2024, 1, 1)
+    # Timestamp duplicati: l'ordinamento (created_at, id) resta totale
+    db.add_all(
+        Content(tenant_id=TENANT, title=f"t{i}", body="x" * 100, created_at=start + datetime.timedelta(minutes=i // 3))
+        for i in range(25)
+    )
+    db.add(Content(tenant_id=OTHER, title="other", body="", created_at=start))
+    db.commit()
+    db.close()
+    return factory
+
+
+def test_keyset_pages_cover_tenant_rows_once(session_factory):
+    db = session_factory()
+    seen, cursor = [], None
+    while True:
+        page = list_contents(db, TENANT, cursor=cursor, limit=10, fields="id,title")
+        assert all(set(item) == {"id", "title"} for item in page.items)
+        seen.extend(item["title"] for item in page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted(f"t{i}" for i in range(25)) and len(seen) == 25
+
+    assert set(list_contents(db, TENANT, limit=1).items[0]) == {"id", "title", "body"}
+    for bad in ({"fields": "id,tenant_id"}, {"cursor": "not-a-cursor"}):
+        with pytest.raises(ValueError):
+            list_contents(db, TENANT, **bad)
+
+
+def test_ndjson_stream_uses_own_session_and_validates_upfront(session_factory):
+    closed = []
+
+    def factory():
+        db = session_factory()
+        db.close = lambda: closed.append(True)
+        return db
+
+    with pytest.raises(ValueError):
+        ndjson_response(factory, lambda db: iter_contents(db, TENANT, fields="password"))
+    assert closed == [True]
+
+    response = ndjson_response(factory, lambda db: iter_contents(db, TENANT, fields="title", chunk_size=7))
+
+    async def read():
+        return b"".join([chunk async for chunk in response.body_iterator])
+
+    lines = asyncio.run(read()).splitlines()
+    assert response.media_type == "application/x-ndjson"
+    titles = [json.loads(line)["title"] for line in lines]
+    # Ordine per created_at: i primi tre condividono il primo minuto
+    assert sorted(titles[:3]) == ["t0", "t1", "t2"] and sorted(titles) == sorted(f"t{i}" for i in range(25))
+    assert closed == [True, True]
+
+
+def test_cursor_values_must_match_column_types(session_factory):
+    from sqlalchemy import Column, DateTime, Integer, String
+    created, ident = Content.__table__.c.created_at, Content.__table__.c.id
+    now, row_id = datetime.datetime(2024, 1, 1), uuid.uuid4()
+    assert decode_cursor(encode_cursor([now, row_id]), [created, ident]) == [now, row_id]
+    for bad in ([123, 1], [now.isoformat(), 1], [now.isoformat(), "xyz"], [None, str(row_id)], ["ieri", str(row_id)]):
+        with pytest.raises(ValueError, match="Cursore non valido"):
+            decode_cursor(encode_cursor(bad), [created, ident])
+
+    columns = [Column("at", DateTime), Column("id", Integer), Column("name", String)]
+    assert decode_cursor(encode_cursor([now, 7, "a"]), columns) == [now, 7, "a"]
+    for bad in ([now, "7", "a"], [now, True, "a"], [now, 7.5, "a"], [now, 7, 1]):
+        with pytest.raises(ValueError, match="Cursore non valido"):
+            decode_cursor(encode_cursor(bad), columns)
+
+    db = session_factory()
+    with pytest.raises(ValueError):
+        list_contents(db, TENANT, cursor=encode_cursor([123, 1]))
+
+
+def test_created_at_is_never_null(session_factory):
+    from sqlalchemy.exc import IntegrityError
+
+    assert not Content.__table__.c.created_at.nullable
+    db = session_factory()
+    with pytest.raises(IntegrityError):
+        db.execute(Content.__table__.insert().values(id=uuid.uuid4(), tenant_id=TENANT, title="null", created_at=None))
@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from core.request_context import (
+    RequestContextMiddleware,
+    _enter_task_context,
+    _exit_task_context,
+    _inject_task_headers,
+    get_context,
+    get_request_id,
+    request_context,
+)
+
+
+def _client():
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware)
+
+    @app.get("/ctx")
+    async def ctx(request: Request):
+        return {**get_context(), "state": request.state.request_id}
+
+    return TestClient(app)
+
+
+def test_middleware_propagates_or_generates_request_id():
+    client = _client()
+
+    response = client.get("/ctx", headers={"X-Request-ID": "abc-123", "user-id": "42"})
+    assert response.headers["X-Request-ID"] == "abc-123"
+    assert response.json() == {"request_id": "abc-123", "user_id": "42", "state": "abc-123"}
+
+    # ID non valido (spazi, troppo lungo) → ne viene generato uno nuovo
+    for bad in ("not valid!", "x" * 200):
+        response = client.get("/ctx", headers={"X-Request-ID": bad})
+        generated = response.headers["X-Request-ID"]
+        assert generated != bad and len(generated) == 32
+        assert response.json()["request_id"] == generated
+    assert get_request_id() is None
+
+
+def test_celery_headers_round_trip():
+    headers = {}
+    with request_context(request_id="req-9", user_id="u-9"):
+        _inject_task_headers(headers=headers)
+    assert headers == {"request_id": "req-9", "user_id": "u-9"}
+
+    # Il worker vede gli header custom come attributi di task.request
+    task = SimpleNamespace(request=SimpleNamespace(**headers))
+    _enter_task_context(task_id="task-1", task=task)
+    assert get_context() == {"request_id": "req-9", "user_id": "u-9"}
+    _exit_task_context(task=task)
+    assert get_context() == {}
+
+    # Task senza richiesta d'origine: il task id fa da correlation ID
+    task = SimpleNamespace(request=SimpleNamespace())
+    _enter_task_context(task_id="task-2", task=task)
+    assert get_request_id() == "task-2"
+    _exit_task_context(task=task)
+    assert get_request_id() is None
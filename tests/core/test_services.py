@@ -5,3 +5,30 @@ def test_user_service():
 def test_content_service():
     # Test content service logic
     pass
+
+
+def test_get_user_by_email_uses_blind_index():
+    import uuid
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from core.database import types
+    from core.models.user import User
+    from core.services.user_service import get_user_by_email
+
+    engine = create_engine("sqlite:///:memory:")
+    User.__table__.create(bind=engine)
+    types.set_encryption_service(types.FieldEncryptionService(
+        {"m1": types.derive_master_key("test-master-key", "m1")}, "m1", types.MemoryKeyStore()))
+    types.set_blind_index(types.BlindIndex("test-bidx-key"))
+    try:
+        with sessionmaker(bind=engine)() as db:
+            tenant = uuid.uuid4()
+            db.add_all([User(email="Ada@Example.com", name="Ada", tenant_id=tenant),
+                        User(email="grace@example.com", name="Grace", tenant_id=uuid.uuid4())])
+            db.commit()
+            assert get_user_by_email(db, " ada@example.COM ").name == "Ada"
+            assert get_user_by_email(db, "grace@example.com").email == "grace@example.com"
+            assert get_user_by_email(db, "nobody@example.com") is None
+    finally:
+        types.set_encryption_service(None)
+        types.set_blind_index(None)
@@ -0,0 +1,81 @@
+import asyncio
+import builtins
+import json
+import sys
+import textwrap
+
+from core.startup_profiler import StartupProfiler
+
+
+def test_spans_nest_across_tasks_and_record_errors():
+    profiler = StartupProfiler()
+
+    async def load(name):
+        with profiler.span(f"plugin.{name}"):
+            with profiler.span("checksum"):
+                await asyncio.sleep(0)
+
+    async def boot():
+        with profiler.span("lifespan"):
+            await asyncio.gather(load("a"), load("b"))
+            try:
+                with profiler.span("db.connect"):
+                    raise ConnectionError("refused")
+            except ConnectionError:
+                pass
+
+    asyncio.run(boot())
+    (lifespan,) = profiler.report()["spans"]
+    names = [child["name"] for child in lifespan["children"]]
+    assert sorted(names[:2]) == ["plugin.a", "plugin.b"] and names[2] == "db.connect"
+    assert [c["name"] for c in lifespan["children"][0]["children"]] == ["checksum"]
+    assert lifespan["children"][2]["attrs"]["error"] == "ConnectionError: refused"
+    assert not lifespan["running"] and lifespan["duration_ms"] >= 0
+
+
+def test_import_tracking_builds_tree_and_report_artifact(tmp_path, monkeypatch):
+    package = tmp_path / "boot_pkg"
+    package.mkdir()
+    (package / "__init__.py").write_text("from . import child\n")
+    (package / "child.py").write_text(textwrap.dedent("""
+        import time
+        time.sleep(0.01)
+    """))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    original_import = builtins.__import__
+
+    profiler = StartupProfiler()
+    profiler.start_import_tracking()
+    try:
+        import boot_pkg  # noqa: F401
+    finally:
+        profiler.mark_ready()
+        for name in ("boot_pkg", "boot_pkg.child"):
+            sys.modules.pop(name, None)
+    assert builtins.__import__ is original_import
+
+    report = profiler.report(min_import_ms=0)
+    (root,) = [r for r in report["imports"]["tree"] if r["module"] == "boot_pkg"]
+    (child,) = root["children"]
+    assert child["module"] == "boot_pkg.child" and child["duration_ms"] >= 10
+    assert root["self_ms"] < child["duration_ms"]
+    assert report["imports"]["slowest_self"][0]["module"] == "boot_pkg.child"
+    assert report["ready"]
+
+    path = profiler.write_report(tmp_path / "out" / "startup.json")
+    assert json.loads(path.read_text())["imports"]["count"] == report["imports"]["count"]
+
+
+def test_import_tracking_stops_on_timeout_without_lifespan():
+    original_import = builtins.__import__
+    profiler = StartupProfiler()
+    profiler.start_import_tracking(timeout=0.2)
+    timer = profiler._stop_timer
+    try:
+        assert profiler.tracking_imports and builtins.__import__ is not original_import
+        timer.join(2)
+        assert not profiler.tracking_imports and builtins.__import__ is original_import
+        assert profiler.report()["ready"] is False
+    finally:
+        profiler.stop_import_tracking()
+        builtins.__import__ = original_import
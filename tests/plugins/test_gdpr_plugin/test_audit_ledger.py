@@ -0,0 +1,122 @@
+import os
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from plugins.gdpr_plugin.models.audit import Base, GENESIS_HASH
+from plugins.gdpr_plugin.services import audit_service
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'audit.db'}")
+    event.listen(engine, "connect", lambda conn, _: conn.execute("PRAGMA journal_mode=WAL"))
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def _fill(engine, batches=6, size=7, tenant_id=None):
+    SessionLocal = sessionmaker(bind=engine)
+    for b in range(batches):
+        events = [{"event_type": "consent_given", "user_id": uuid.uuid4(), "details": {"batch": b, "n": n}}
+                  for n in range(size)]
+        audit_service.append_with_retry(SessionLocal, events, tenant_id)
+
+
+def test_chain_is_persistent_and_linked(engine):
+    SessionLocal = sessionmaker(bind=engine)
+    with SessionLocal() as db:
+        first = audit_service.log_audit_event("data_export", uuid.uuid4(), {"format": "json"}, db=db)
+    with SessionLocal() as db:  # "riavvio": la catena riprende dalla testa salvata
+        second = audit_service.log_audit_event("data_erasure", None, "manual", db=db)
+        other = audit_service.log_audit_event("data_export", None, None, tenant_id="acme", db=db)
+    assert first["sequence"] == 1 and first["previous_hash"] == GENESIS_HASH
+    assert second["sequence"] == 2 and second["previous_hash"] == first["entry_hash"]
+    assert other["sequence"] == 1
+    assert audit_service.verify_audit_chain(engine, max_workers=1).valid
+
+
+def test_non_uuid_subject_ids_are_stored_as_text(engine):
+    SessionLocal = sessionmaker(bind=engine)
+    with SessionLocal() as db:
+        entry = audit_service.log_audit_event("data_erasure", 42, {"rows": 1}, db=db)
+        subject = uuid.uuid4()
+        audit_service.log_audit_event("data_export", str(subject), None, db=db)
+        rows = db.execute(text("SELECT user_id, subject_ref FROM gdpr_audit_logs ORDER BY sequence")).all()
+    assert entry["subject_ref"] == "42" and entry["user_id"] is None
+    assert rows[0] == (None, "42") and rows[1][1] is None
+    assert audit_service.verify_audit_chain(engine, max_workers=1).valid
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_parallel_verification_detects_tampering(engine, workers):
+    _fill(engine)
+    result = audit_service.verify_audit_chain(engine, max_workers=workers, segment_size=10)
+    assert result.valid, result.errors
+    assert (result.entries, result.batches, result.segments) == (42, 6, 3)
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE gdpr_audit_logs SET details = '{\"batch\": 9}' WHERE sequence = 17"))
+        conn.execute(text("DELETE FROM gdpr_audit_logs WHERE sequence = 30"))
+    errors = audit_service.verify_audit_chain(engine, max_workers=workers, segment_size=10).errors
+    assert any(e.startswith("sequence 17: entry_hash") for e in errors)
+    assert any(e.startswith("sequence 30: voce mancante") for e in errors)
+
+
+def test_batch_writer_groups_events_per_tenant(engine):
+    writer = audit_service.AuditBatchWriter(sessionmaker(bind=engine), max_batch=50, max_delay=0.05)
+    for n in range(120):
+        writer.submit("page_view", details={"n": n}, tenant_id="acme" if n % 2 else None)
+    writer.close()
+    with engine.connect() as conn:
+        counts = dict(conn.execute(text("SELECT tenant_id, count(*) FROM gdpr_audit_logs GROUP BY tenant_id")).all())
+        batches = conn.execute(text("SELECT count(*) FROM gdpr_audit_batches")).scalar()
+    assert counts == {"acme": 60, "default": 60}
+    assert batches < 20
+    for tenant in ("acme", None):
+        assert audit_service.verify_audit_chain(engine, tenant, max_workers=1).valid
+
+
+def test_checkpoint_inclusion_proofs(engine):
+    from plugins.gdpr_plugin.services import audit_checkpoint_service as checkpoints
+    from plugins.gdpr_plugin.utils.merkle import merkle_root, verify_inclusion
+
+    signer = checkpoints.AuditSigner.from_secret("test-signing-key")
+    SessionLocal = sessionmaker(bind=engine)
+    _fill(engine, batches=5, size=9)
+    with SessionLocal() as db:
+        first = checkpoints.create_checkpoint(db, signer=signer)
+        assert first.tree_size == 45
+        _fill(engine, batches=4, size=10)  # checkpoint incrementale
+        second = checkpoints.create_checkpoint(db, signer=signer)
+        assert checkpoints.create_checkpoint(db, signer=signer).id == second.id
+
+        hashes = db.execute(text("SELECT entry_hash FROM gdpr_audit_logs ORDER BY sequence")).scalars().all()
+        assert second.tree_size == 85 and second.root_hash == merkle_root(hashes)
+        assert first.root_hash == merkle_root(hashes[:45])
+        assert checkpoints.verify_checkpoint_signature(signer.public_key_pem(), checkpoints.checkpoint_to_dict(second))
+
+        ids = [uuid.UUID(str(value)) for value in
+               db.execute(text("SELECT id FROM gdpr_audit_logs ORDER BY sequence")).scalars()]
+        for sequence in (1, 16, 17, 44, 45, 64, 85):
+            proof = checkpoints.get_inclusion_proof(db, ids[sequence - 1])
+            assert len(proof["proof"]) <= 7
+            assert verify_inclusion(proof["leaf_index"], 85, proof["entry"]["entry_hash"], proof["proof"], second.root_hash)
+            assert not verify_inclusion(proof["leaf_index"], 85, hashes[sequence % 85], proof["proof"], second.root_hash)
+        old = checkpoints.get_inclusion_proof(db, ids[10], tree_size=45)
+        assert verify_inclusion(10, 45, hashes[10], old["proof"], first.root_hash)
+
+        tampered = dict(checkpoints.checkpoint_to_dict(second), root_hash=first.root_hash)
+        assert not checkpoints.verify_checkpoint_signature(signer.public_key_pem(), tampered)
+
+
+def test_signer_derived_from_encryption_key_is_not_raw_seed():
+    from plugins.gdpr_plugin.services import audit_checkpoint_service as checkpoints
+
+    master = os.urandom(32).hex()
+    raw = checkpoints.AuditSigner.from_secret(master)
+    derived = checkpoints.AuditSigner.derived_from(master)
+    assert derived.public_key_pem() != raw.public_key_pem()
+    assert derived.public_key_pem() == checkpoints.AuditSigner.derived_from(master).public_key_pem()
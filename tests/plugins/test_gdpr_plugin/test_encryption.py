@@ -0,0 +1,332 @@
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine, text
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from plugins.gdpr_plugin.models.audit import Base as AuditBase
+from plugins.gdpr_plugin.models.encryption_key import Base as KeyBase
+from plugins.gdpr_plugin.utils import encryption
+from plugins.gdpr_plugin.utils.encryption import (
+    BlindIndex, EncryptedString, EncryptionError, FieldEncryptionService, MemoryKeyStore, SQLKeyStore,
+    blind_index_for, derive_master_key,
+)
+
+MASTER = {"m1": derive_master_key("test-master-key", "m1")}
+
+Base = declarative_base()
+
+
+class Patient(Base):
+    __tablename__ = "patients"
+    id = Column(Integer, primary_key=True)
+    email = Column(EncryptedString())
+
+
+class Account(Base):
+    __tablename__ = "accounts"
+    id = Column(Integer, primary_key=True)
+    tenant_id = Column(String)
+    email = Column(EncryptedString())
+    note = Column(EncryptedString())
+
+
+class Member(Base):
+    __tablename__ = "members"
+    id = Column(Integer, primary_key=True)
+    email = Column(EncryptedString(blind_index="email_bidx"))
+    email_bidx = Column(String(64), unique=True, index=True)
+
+
+@pytest.fixture
+def service():
+    return FieldEncryptionService(MASTER, "m1", MemoryKeyStore())
+
+
+def test_round_trip_and_batch(service):
+    token = service.encrypt("mario@example.com", tenant_id="acme")
+    assert token.startswith("v1:") and "mario" not in token
+    assert service.encrypt("mario@example.com", tenant_id="acme") != token  # nonce casuale
+    assert service.decrypt(token) == "mario@example.com"
+
+    values = ["a@b.c", None, "x" * 500, "àèì"]
+    tokens = service.encrypt_batch(values, tenant_id="acme")
+    assert tokens[1] is None
+    assert service.decrypt_batch(tokens) == values
+
+
+def test_tenant_data_keys_are_wrapped_and_cached(service):
+    kid_a, _ = service.active_key("acme")
+    kid_b, _ = service.active_key("globex")
+    assert kid_a != kid_b
+    assert service.active_key("acme")[0] == kid_a
+    assert len(service.key_store._keys) == 2
+
+    # Un secondo processo con la stessa master key riusa le data key salvate
+    other = FieldEncryptionService(MASTER, "m1", service.key_store)
+    assert other.decrypt(service.encrypt("dato", tenant_id="acme")) == "dato"
+    assert other.active_key("acme")[0] == kid_a
+
+    wrong_master = FieldEncryptionService({"m1": derive_master_key("altra", "m1")}, "m1", service.key_store)
+    with pytest.raises(EncryptionError):
+        wrong_master.decrypt(service.encrypt("dato", tenant_id="acme"))
+
+
+def test_tampered_ciphertext_rejected(service):
+    token = service.encrypt("segreto")
+    version, kid, payload = token.split(":", 2)
+    tampered = f"{version}:{kid}:{payload[:-4]}AAAA"
+    with pytest.raises(EncryptionError):
+        service.decrypt(tampered)
+    with pytest.raises(EncryptionError):
+        service.decrypt("not-a-token")
+
+
+def test_encrypted_column_with_sql_key_store(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'enc.db'}")
+    Base.metadata.create_all(bind=engine)
+    KeyBase.metadata.create_all(bind=engine)
+    AuditBase.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    encryption.set_encryption_service(FieldEncryptionService(MASTER, "m1", SQLKeyStore(SessionLocal)))
+    try:
+        with SessionLocal() as db:
+            db.add(Patient(id=1, email="paziente@example.com"))
+            db.commit()
+        with SessionLocal() as db:
+            raw = db.execute(text("SELECT email FROM patients")).scalar_one()
+            assert raw.startswith("v2:") and "paziente" not in raw
+            assert db.get(Patient, 1).email == "paziente@example.com"
+            assert db.execute(text("SELECT count(*) FROM gdpr_data_keys")).scalar_one() == 1
+    finally:
+        encryption.set_encryption_service(None)
+
+
+def test_rotation_keeps_old_versions_readable(service):
+    old_token = service.encrypt("dato", tenant_id="acme")
+    new_kid = service.rotate_data_key("acme")
+    assert service.active_key("acme")[0] == new_kid
+    assert service.key_id(service.encrypt("dato", tenant_id="acme")) == new_kid
+    assert service.decrypt(old_token) == "dato"
+
+    # Rotazione della master key: le DEK vengono ri-wrappate, i ciphertext restano validi
+    rotated = FieldEncryptionService({**MASTER, "m2": derive_master_key("nuova", "m2")}, "m2", service.key_store)
+    assert rotated.rewrap_data_keys() == 2
+    only_new_master = FieldEncryptionService({"m2": derive_master_key("nuova", "m2")}, "m2", service.key_store)
+    assert only_new_master.decrypt(old_token) == "dato"
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_reencryption_job_is_resumable(tmp_path, max_workers):
+    from plugins.gdpr_plugin.services.key_rotation_service import (
+        EncryptedColumn, find_encrypted_columns, run_key_rotation_job, start_key_rotation,
+    )
+    engine = create_engine(f"sqlite:///{tmp_path / 'rotation.db'}")
+    Base.metadata.create_all(bind=engine)
+    KeyBase.metadata.create_all(bind=engine)
+    AuditBase.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    service = FieldEncryptionService(MASTER, "m1", SQLKeyStore(SessionLocal))
+    encryption.set_encryption_service(service)
+    try:
+        with SessionLocal() as db:
+            db.add_all([Patient(id=i, email=f"p{i}@example.com") for i in range(1, 26)])
+            db.commit()
+            old_kid = service.active_key()[0]
+            columns = find_encrypted_columns([Patient.__table__])
+            assert [c.key for c in columns] == ["patients.email"]
+
+            job = start_key_rotation(db, service=service)
+            # Simula un worker morto a metà: checkpoint dopo la riga 10
+            job.checkpoint = '{"column": "patients.email", "last_pk": 10}'
+            db.commit()
+            job = run_key_rotation_job(db, job.id, service=service, columns=columns,
+                                       chunk_size=4, max_workers=max_workers)
+
+            assert job.status == "completed" and job.rows_reencrypted == 15
+            kids = {service.key_id(raw) for (raw,) in db.execute(text("SELECT email FROM patients ORDER BY id"))}
+            assert kids == {old_kid, job.target_kid}
+            assert [p.email for p in db.query(Patient).order_by(Patient.id)] == [f"p{i}@example.com" for i in range(1, 26)]
+
+            job.status, job.checkpoint = "pending", None
+            db.commit()
+            job = run_key_rotation_job(db, job.id, service=service, columns=[EncryptedColumn(Patient.__table__, "email")])
+            assert job.rows_reencrypted == 25
+            raw = db.execute(text("SELECT email FROM patients")).scalars().all()
+            assert {service.key_id(token) for token in raw} == {job.target_kid}
+    finally:
+        encryption.set_encryption_service(None)
+
+
+def _rotate_in_worker(db_path, job_id):
+    # Eseguito in un processo del pool billiard (daemon, come un worker Celery prefork)
+    from plugins.gdpr_plugin.services.key_rotation_service import EncryptedColumn, run_key_rotation_job
+    SessionLocal = sessionmaker(bind=create_engine(f"sqlite:///{db_path}"))
+    service = FieldEncryptionService(MASTER, "m1", SQLKeyStore(SessionLocal))
+    encryption.set_encryption_service(service)
+    with SessionLocal() as db:
+        job = run_key_rotation_job(db, job_id, service=service, chunk_size=4, max_workers=2,
+                                   columns=[EncryptedColumn(Patient.__table__, "email")])
+        return job.status, job.rows_reencrypted
+
+
+def test_reencryption_in_celery_prefork_worker(tmp_path):
+    billiard = pytest.importorskip("billiard")
+    from plugins.gdpr_plugin.services.key_rotation_service import start_key_rotation
+    db_path = tmp_path / "prefork.db"
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    KeyBase.metadata.create_all(bind=engine)
+    AuditBase.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    service = FieldEncryptionService(MASTER, "m1", SQLKeyStore(SessionLocal))
+    encryption.set_encryption_service(service)
+    try:
+        with SessionLocal() as db:
+            db.add_all([Patient(id=i, email=f"p{i}@example.com") for i in range(1, 11)])
+            db.commit()
+            job_id = start_key_rotation(db, service=service).id
+        engine.dispose()
+        with billiard.Pool(1) as pool:
+            assert pool.apply(_rotate_in_worker, (db_path, job_id)) == ("completed", 10)
+    finally:
+        encryption.set_encryption_service(None)
+
+
+def test_blind_index_lookup(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bidx.db'}")
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    encryption.set_encryption_service(FieldEncryptionService(MASTER, "m1", MemoryKeyStore()))
+    encryption.set_blind_index(BlindIndex("test-bidx-key"))
+    try:
+        with SessionLocal() as db:
+            db.add_all([Member(id=i, email=f"member{i}@example.com") for i in range(50)])
+            db.commit()
+            member = db.get(Member, 7)
+            member.email = "New.Address@Example.com"
+            db.commit()
+
+            found = db.query(Member).filter(Member.email_bidx == blind_index_for(Member.email, " new.address@example.com")).one()
+            assert found.id == 7 and found.email == "New.Address@Example.com"
+            assert db.query(Member).filter(Member.email_bidx == blind_index_for(Member.email, "member7@example.com")).first() is None
+            plan = " ".join(str(row) for row in db.execute(text(
+                "EXPLAIN QUERY PLAN SELECT id FROM members WHERE email_bidx = 'x'")))
+            assert "SEARCH members USING" in plan and "INDEX" in plan
+            # Indice diverso per colonne/chiavi diverse: niente correlazione tra tabelle
+            assert blind_index_for(Member.email, "a@b.c") != BlindIndex("altra").compute("a@b.c", "*:members.email")
+    finally:
+        encryption.set_encryption_service(None)
+        encryption.set_blind_index(None)
+
+
+def test_plaintext_looking_like_ciphertext_is_encrypted(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'prefix.db'}")
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    service = FieldEncryptionService(MASTER, "m1", MemoryKeyStore())
+    encryption.set_encryption_service(service)
+    encryption.set_blind_index(BlindIndex("test-bidx-key"))
+    try:
+        assert not service.is_encrypted("v1:hello") and not service.is_valid_token("v1:abc:aGVsbG8=")
+        forged = "v1:unknown:" + service.encrypt("x").split(":", 2)[2]  # formato valido, kid sconosciuto
+        with SessionLocal() as db:
+            db.add_all([Member(id=1, email="v1:hello"), Member(id=2, email=forged)])
+            db.commit()
+            raw = db.execute(text("SELECT email, email_bidx FROM members ORDER BY id")).all()
+            assert all(service.is_valid_token(token) and bidx for token, bidx in raw)
+            db.expire_all()
+            assert [m.email for m in db.query(Member).order_by(Member.id)] == ["v1:hello", forged]
+            # Un ciphertext valido copiato da un'altra riga è un testo come un altro: viene cifrato
+            db.add(Member(id=3, email=raw[0][0]))
+            db.flush()
+            assert db.execute(text("SELECT email FROM members WHERE id = 3")).scalar() != raw[0][0]
+            db.expire_all()
+            assert db.get(Member, 3).email == raw[0][0]
+    finally:
+        encryption.set_encryption_service(None)
+        encryption.set_blind_index(None)
+
+
+def test_row_tenant_keys_and_column_bound_aad(tmp_path):
+    from plugins.gdpr_plugin.services.key_rotation_service import (
+        find_encrypted_columns, run_key_rotation_job, start_key_rotation,
+    )
+    engine = create_engine(f"sqlite:///{tmp_path / 'tenants.db'}")
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    service = FieldEncryptionService(MASTER, "m1", MemoryKeyStore())
+    encryption.set_encryption_service(service)
+    try:
+        with SessionLocal() as db:
+            db.add_all([Account(id=1, tenant_id="acme", email="a@acme.io"),
+                        Account(id=2, tenant_id="globex", email="b@globex.io"),
+                        Account(id=3, email="c@example.com")])
+            db.flush()
+            assert db.get(Account, 1).email == "a@acme.io"  # in chiaro anche prima del commit
+            db.commit()
+            raw = dict(db.execute(text("SELECT id, email FROM accounts")).all())
+            kids = {i: service.key_id(token) for i, token in raw.items()}
+            assert kids == {1: service.active_key("acme")[0], 2: service.active_key("globex")[0],
+                            3: service.active_key()[0]}
+
+            # Ciphertext spostato in un'altra colonna: l'AAD (tabella.colonna) non corrisponde
+            db.execute(text("UPDATE accounts SET note = email WHERE id = 1"))
+            db.commit()
+            with pytest.raises(EncryptionError):
+                db.get(Account, 1).note
+            db.rollback()
+            db.execute(text("UPDATE accounts SET note = NULL"))
+            db.commit()
+
+        # La rotazione di un tenant tocca solo le sue righe
+        with SessionLocal() as db:
+            KeyBase.metadata.create_all(bind=engine)
+            AuditBase.metadata.create_all(bind=engine)
+            assert {c.key for c in find_encrypted_columns([Account.__table__], "acme")} == {"accounts.email", "accounts.note"}
+            job = start_key_rotation(db, "acme", service=service)
+            job = run_key_rotation_job(db, job.id, service=service, max_workers=1,
+                                       columns=find_encrypted_columns([Account.__table__], "acme")[:1])
+            assert job.rows_reencrypted == 1
+            after = dict(db.execute(text("SELECT id, email FROM accounts")).all())
+            assert service.key_id(after[1]) == job.target_kid and after[2] == raw[2] and after[3] == raw[3]
+            assert db.get(Account, 1).email == "a@acme.io"
+            events = db.execute(text("SELECT event_type FROM gdpr_audit_logs WHERE tenant_id = 'acme' ORDER BY sequence"))
+            assert events.scalars().all() == ["key_rotation_started", "key_rotation_completed"]
+    finally:
+        encryption.set_encryption_service(None)
+
+
+def test_rotation_backfills_missing_blind_index(tmp_path):
+    from plugins.gdpr_plugin.services.key_rotation_service import (
+        EncryptedColumn, run_key_rotation_job, start_key_rotation,
+    )
+    engine = create_engine(f"sqlite:///{tmp_path / 'backfill.db'}")
+    Base.metadata.create_all(bind=engine)
+    KeyBase.metadata.create_all(bind=engine)
+    AuditBase.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    service = FieldEncryptionService(MASTER, "m1", SQLKeyStore(SessionLocal))
+    encryption.set_encryption_service(service)
+    encryption.set_blind_index(BlindIndex("test-bidx-key"))
+    try:
+        with SessionLocal() as db:
+            # Righe legacy in chiaro senza blind index + una già cifrata dall'ORM
+            for i in range(1, 6):
+                db.execute(text("INSERT INTO members (id, email) VALUES (:id, :email)"),
+                           {"id": i, "email": f"Legacy{i}@Example.com"})
+            db.commit()
+            db.add(Member(id=6, email="orm@example.com"))
+            db.commit()
+            orm_bidx = db.execute(text("SELECT email_bidx FROM members WHERE id = 6")).scalar()
+
+            job = start_key_rotation(db, service=service)
+            run_key_rotation_job(db, job.id, service=service, chunk_size=2, max_workers=2,
+                                 columns=[EncryptedColumn(Member.__table__, "email")])
+
+            rows = db.execute(text("SELECT email, email_bidx FROM members ORDER BY id")).all()
+            assert all(service.key_id(token) == job.target_kid and bidx for token, bidx in rows)
+            assert rows[-1][1] == orm_bidx
+            found = db.query(Member).filter(Member.email_bidx == blind_index_for(Member.email, "legacy3@example.com")).one()
+            assert found.id == 3 and found.email == "Legacy3@Example.com"
+    finally:
+        encryption.set_encryption_service(None)
+        encryption.set_blind_index(None)
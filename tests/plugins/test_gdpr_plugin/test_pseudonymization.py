@@ -0,0 +1,55 @@
+import ipaddress
+
+import pytest
+
+from plugins.gdpr_plugin.utils.pseudonymization import Pseudonymizer, get_pseudonymizer, pseudonymize_values
+
+KEY = "test-master-key"
+
+
+def test_tokens_are_deterministic_and_keyed():
+    p = Pseudonymizer(KEY)
+    assert p.token(42) == p.token("42") == Pseudonymizer(KEY).token(42)
+    assert p.token(42) != Pseudonymizer("other-key").token(42)
+    assert p.token(42).startswith("anon_") and p.token(None) is None
+
+
+def test_format_preserving_email_and_ip():
+    p = Pseudonymizer(KEY)
+    email = p.email("Mario.Rossi@Example.com")
+    assert email == p.email("mario.rossi@example.com")
+    assert email.endswith("@example.com") and email != "mario.rossi@example.com"
+    assert Pseudonymizer(KEY, keep_email_domain=False).email("a@example.com").endswith(".invalid")
+
+    ip = p.ip("192.168.1.77", keep_prefix=24)
+    assert ip.startswith("192.168.1.") and ip == p.ip("192.168.1.77", keep_prefix=24)
+    assert isinstance(ipaddress.ip_address(p.ip("2001:db8::1")), ipaddress.IPv6Address)
+
+
+def test_batch_matches_single_values():
+    p = Pseudonymizer(KEY)
+    values = ["a@b.c", None, "a@b.c", "x@y.z"] * 100
+    assert p.batch(values, "email") == [p.email(v) for v in values]
+    with pytest.raises(ValueError):
+        p.batch(values, "phone")
+
+
+def test_batch_memo_is_per_call_and_type_aware():
+    p = Pseudonymizer(KEY)
+    values = [1, True, 1.0, ["a", "b"], {"k": 1}, 1]
+    assert p.batch(values) == [p.token(v) for v in values]
+    assert not [name for name, value in vars(p).items() if isinstance(value, dict)]  # nessun memo sull'istanza
+
+
+def test_records_stream():
+    p = Pseudonymizer(KEY)
+    rows = [{"user_id": i % 3, "event": "view"} for i in range(10)]
+    out = list(p.records(iter(rows), {"user_id": "token"}, chunk_size=4))
+    assert [r["user_id"] for r in out] == [p.token(i % 3) for i in range(10)]
+    assert rows[0]["user_id"] == 0  # input non modificato
+
+
+def test_tenant_keys_are_cached_and_isolated():
+    assert get_pseudonymizer("t1", KEY) is get_pseudonymizer("t1", KEY)
+    assert get_pseudonymizer("t1", KEY).token(1) != get_pseudonymizer("t2", KEY).token(1)
+    assert pseudonymize_values([1, 1], tenant_id="t1", master_key=KEY) == [get_pseudonymizer("t1", KEY).token(1)] * 2
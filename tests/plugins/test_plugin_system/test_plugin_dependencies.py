@@ -1,3 +1,80 @@
+import asyncio
+import time
+
+from plugins.secure_plugin_manager import (
+    PluginManifest,
+    PluginStatus,
+    SecurePluginManager,
+    build_dependency_levels,
+)
+
+
 def test_plugin_dependencies():
     # Test plugin dependencies logic
     pass
+
+
+def _manifest(name, dependencies=()):
+    return PluginManifest(name=name, version="1.0.0", description="", author="", permissions=[],
+                          dependencies=list(dependencies), min_python_version="3.11", checksum="")
+
+
+def test_dependency_levels_and_errors():
+    manifests = {
+        "core": _manifest("core"),
+        "audit": _manifest("audit", ["core"]),
+        "mail": _manifest("mail"),
+        "reports": _manifest("reports", ["audit", "mail"]),
+        "orphan": _manifest("orphan", ["missing"]),
+        "child": _manifest("child", ["orphan"]),
+        "a": _manifest("a", ["b"]),
+        "b": _manifest("b", ["a"]),
+    }
+    levels, errors = build_dependency_levels(manifests)
+    assert levels == [["core", "mail"], ["audit"], ["reports"]]
+    assert set(errors) == {"orphan", "child", "a", "b"}
+    assert "missing" in errors["orphan"] and "orphan" in errors["child"]
+
+
+class _FakeIOManager(SecurePluginManager):
+    """Manifest in memoria e load simulato con I/O (sleep) al posto dell'import"""
+
+    def __init__(self, manifests, delay=0.1, broken=()):
+        super().__init__(app=None)
+        self._fake_manifests, self.delay, self.broken = manifests, delay, set(broken)
+
+    async def _load_plugin_manifest(self, plugin_name):
+        return self._fake_manifests[plugin_name]
+
+    async def _load_single_plugin(self, plugin_name, manifest=None):
+        await asyncio.sleep(self.delay)
+        if plugin_name in self.broken:
+            raise RuntimeError("boom")
+        self.plugins[plugin_name] = object()
+        self.plugin_status[plugin_name] = PluginStatus.LOADED
+
+
+def test_independent_plugins_load_concurrently_and_dependents_wait():
+    manifests = {
+        "gdpr_plugin": _manifest("gdpr_plugin"),
+        "security_plugin": _manifest("security_plugin"),
+        "analytics_plugin": _manifest("analytics_plugin"),
+        "reports_plugin": _manifest("reports_plugin", ["gdpr_plugin"]),
+        "alerts_plugin": _manifest("alerts_plugin", ["security_plugin"]),
+    }
+    manager = _FakeIOManager(manifests, broken={"security_plugin"})
+    start = time.perf_counter()
+    asyncio.run(manager.load_enabled_plugins(list(manifests)))
+    elapsed = time.perf_counter() - start
+
+    # 2 livelli da 0.1s ciascuno, non 5 load sequenziali
+    assert elapsed < 0.35
+    status = manager.get_plugin_status()
+    assert status["reports_plugin"] == "loaded" and status["security_plugin"] == "failed"
+    assert status["alerts_plugin"] == "failed"
+
+    timeline = {r["name"]: r for r in manager.get_startup_timeline()}
+    assert timeline["reports_plugin"]["started_at"] >= timeline["gdpr_plugin"]["finished_at"]
+    assert timeline["reports_plugin"]["level"] == 1 and timeline["gdpr_plugin"]["level"] == 0
+    assert "security_plugin" in timeline["alerts_plugin"]["error"]
+    assert timeline["alerts_plugin"]["started_at"] is None
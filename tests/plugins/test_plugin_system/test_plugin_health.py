@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+from fastapi import FastAPI
+
+from core.health_prober import HealthProber
+from plugins.base_plugin import BasePlugin
+from plugins.secure_plugin_manager import PluginLoadRecord, PluginStatus, SecurePluginManager
+
+
+class _ProbePlugin(BasePlugin):
+    def __init__(self, delay=0.0, result=None, timeout=None):
+        super().__init__(None)
+        self.delay, self.result, self.health_check_timeout = delay, result, timeout
+
+    async def health_check(self):
+        await asyncio.sleep(self.delay)
+        return self.result or {}
+
+
+def test_plugin_health_checks_run_concurrently_with_per_plugin_timeouts():
+    manager = SecurePluginManager(FastAPI())
+    plugins = {
+        "fast_plugin": _ProbePlugin(0.1, {"rows": 1}),
+        "slow_plugin": _ProbePlugin(5, timeout=0.2),
+        "redis_plugin": _ProbePlugin(0.1, {"status": "degraded", "redis": "unavailable"}),
+        "base_plugin": BasePlugin(None),
+    }
+    for name, plugin in plugins.items():
+        manager.plugins[name] = plugin
+        manager.plugin_status[name] = PluginStatus.LOADED
+    manager.plugin_status["broken_plugin"] = PluginStatus.FAILED
+    manager.startup_timeline["broken_plugin"] = PluginLoadRecord("broken_plugin", error="checksum mismatch")
+    manager.plugin_status["lazy_plugin"] = PluginStatus.LAZY
+
+    prober = HealthProber(checks={}, interval=30, timeout=1.0)
+    prober.add_provider(manager.health_checks)
+
+    async def scenario():
+        start = time.perf_counter()
+        snapshot = await prober.check_now()
+        # In parallelo: il totale è il timeout più lungo, non la somma dei probe
+        assert time.perf_counter() - start < 0.6
+        return snapshot
+
+    results = asyncio.run(scenario())["plugins"]
+    assert results["fast_plugin"]["status"] == "healthy" and results["fast_plugin"]["rows"] == 1
+    assert results["slow_plugin"] == {"status": "unhealthy", "error": "timeout (0.2s)",
+                                      "latency_ms": results["slow_plugin"]["latency_ms"]}
+    assert results["redis_plugin"]["status"] == "degraded"
+    assert results["base_plugin"]["status"] == "healthy"
+    assert results["broken_plugin"]["status"] == "unhealthy" and "checksum mismatch" in results["broken_plugin"]["error"]
+    assert results["lazy_plugin"]["status"] == "lazy"
@@ -1,3 +1,75 @@
+import hashlib
+import os
+
+import pytest
+
+from plugins import plugin_checksum
+from plugins.plugin_checksum import ChecksumCache, legacy_checksum
+from plugins.plugin_sandbox import PluginSandbox
+
+
 def test_plugin_loading():
     # Test plugin loading logic
     pass
+
+
+def _plugin_tree(root):
+    (root / "api").mkdir(parents=True)
+    (root / "plugin.py").write_text("class DemoPlugin: pass\n")
+    (root / "api" / "routes.py").write_text("ROUTES = []\n")
+    return root
+
+
+def test_checksum_cache_rehashes_only_changed_files(tmp_path, monkeypatch):
+    plugin_dir = _plugin_tree(tmp_path / "demo_plugin")
+    hashed = []
+    real_hash = plugin_checksum.hash_file
+    monkeypatch.setattr(plugin_checksum, "hash_file", lambda p: hashed.append(p.name) or real_hash(p))
+
+    cache_file = tmp_path / "cache" / "checksums.json"
+    first = ChecksumCache(cache_file).plugin_checksum(plugin_dir)
+    assert sorted(hashed) == ["plugin.py", "routes.py"] and cache_file.exists()
+
+    # Nuovo processo (cache riletta da disco): nessun file rihashato
+    hashed.clear()
+    assert ChecksumCache(cache_file).plugin_checksum(plugin_dir) == first
+    assert hashed == []
+
+    # Modifica di un file: rihashato solo quello, checksum diverso
+    routes = plugin_dir / "api" / "routes.py"
+    routes.write_text("ROUTES = ['/x']\n")
+    os.utime(routes, ns=(1, 1))
+    second = ChecksumCache(cache_file).plugin_checksum(plugin_dir)
+    assert hashed == ["routes.py"] and second != first
+
+    # Un rename cambia il checksum anche a contenuto identico
+    routes.rename(plugin_dir / "api" / "urls.py")
+    assert ChecksumCache(cache_file).plugin_checksum(plugin_dir) != second
+
+
+def test_legacy_checksum_matches_concatenated_content(tmp_path):
+    plugin_dir = _plugin_tree(tmp_path / "demo_plugin")
+    expected = hashlib.sha256(b"ROUTES = []\n" + b"class DemoPlugin: pass\n").hexdigest()
+    assert legacy_checksum(plugin_dir) == f"sha256:{expected}"
+
+
+def test_sandbox_reports_all_modules_and_caches_by_content(tmp_path):
+    plugin_dir = _plugin_tree(tmp_path / "demo_plugin")
+    (plugin_dir / "api" / "routes.py").write_text(
+        "from fastapi import APIRouter\nfrom .schemas import Out\nimport os\n\neval('1')\n"
+    )
+    cache_dir = tmp_path / "sandbox"
+    report = PluginSandbox(cache_dir=cache_dir).analyze_plugin(plugin_dir)
+
+    assert report.files == ["api/routes.py", "plugin.py"]
+    assert report.imports["api/routes.py"] == [".schemas", "fastapi", "os"]
+    assert [(v.kind, v.name, v.file, v.line) for v in report.violations] == [
+        ("import", "os", "api/routes.py", 3),
+        ("call", "eval", "api/routes.py", 5),
+    ]
+    with pytest.raises(ImportError, match="api/routes.py:3"):
+        report.raise_for_violations()
+
+    # Nuova istanza (worker riavviato): tutto dalla cache su disco
+    again = PluginSandbox(cache_dir=cache_dir).analyze_plugin(plugin_dir)
+    assert again.cached_files == 2 and again.violations == report.violations
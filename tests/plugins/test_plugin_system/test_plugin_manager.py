@@ -1,3 +1,106 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from plugins.secure_plugin_manager import LazyPluginMiddleware, PluginManifest, PluginStatus, SecurePluginManager
+
+
 def test_plugin_manager_load():
     # Test plugin manager loading
     pass
+
+
+def _manifest(name, route_prefixes=(), dependencies=()):
+    return PluginManifest(name=name, version="1.0.0", description="", author="", permissions=[],
+                          dependencies=list(dependencies), min_python_version="3.11", checksum="",
+                          route_prefixes=list(route_prefixes))
+
+
+class _RouteManager(SecurePluginManager):
+    """Load simulato: ogni plugin registra `GET <prefix>/ping` come farebbe register_routes"""
+
+    def __init__(self, app, manifests, broken=()):
+        super().__init__(app)
+        self._fake_manifests, self.broken, self.imported = manifests, set(broken), []
+
+    async def _load_plugin_manifest(self, plugin_name):
+        return self._fake_manifests[plugin_name]
+
+    async def _load_single_plugin(self, plugin_name, manifest=None):
+        await asyncio.sleep(0.01)
+        self.imported.append(plugin_name)
+        if plugin_name in self.broken:
+            self.plugin_status[plugin_name] = PluginStatus.FAILED
+            raise RuntimeError("import fallito")
+        router = APIRouter(prefix=(manifest.route_prefixes or ["/" + plugin_name])[0])
+        router.add_api_route("/ping", lambda: {"plugin": plugin_name}, methods=["GET"])
+        self.app.include_router(router)
+        self.plugins[plugin_name] = object()
+        self.plugin_status[plugin_name] = PluginStatus.LOADED
+
+
+def _app(manifests, broken=()):
+    @asynccontextmanager
+    async def lifespan(app):
+        manager = _RouteManager(app, manifests, broken)
+        await manager.load_enabled_plugins(list(manifests), lazy=True)
+        app.state.plugin_manager = manager
+        yield
+
+    app = FastAPI(lifespan=lifespan)
+    app.add_middleware(LazyPluginMiddleware)
+    return app
+
+
+def test_lazy_plugins_import_on_first_request():
+    manifests = {
+        "core_plugin": _manifest("core_plugin", ["/core"]),
+        "gdpr_plugin": _manifest("gdpr_plugin", ["/api/gdpr"]),
+        "audit_plugin": _manifest("audit_plugin", dependencies=["core_plugin"]),
+        "reports_plugin": _manifest("reports_plugin", ["/reports"], dependencies=["gdpr_plugin"]),
+        "broken_plugin": _manifest("broken_plugin", ["/broken"]),
+    }
+    with TestClient(_app(manifests, broken={"broken_plugin"})) as client:
+        manager = client.app.state.plugin_manager
+        # core_plugin serve a un plugin eager: niente lazy per lui
+        assert manager.imported == ["core_plugin", "audit_plugin"]
+        assert manager.get_plugin_status()["gdpr_plugin"] == "lazy"
+        assert client.get("/api/gdpr").status_code == 404 and manager.imported[-1] == "gdpr_plugin"
+
+        # Le dipendenze lazy vengono caricate prima del dipendente
+        assert client.get("/reports/ping").json() == {"plugin": "reports_plugin"}
+        assert manager.imported == ["core_plugin", "audit_plugin", "gdpr_plugin", "reports_plugin"]
+        assert client.get("/api/gdpr/ping").json() == {"plugin": "gdpr_plugin"}
+        assert manager.imported.count("gdpr_plugin") == 1
+
+        assert client.get("/broken/ping").status_code == 503
+        assert client.get("/broken/ping").status_code == 503
+        assert manager.imported.count("broken_plugin") == 1
+        assert client.get("/other").status_code == 404
+
+
+def test_core_route_under_lazy_prefix_survives_failed_load():
+    manifests = {"gdpr_plugin": _manifest("gdpr_plugin", ["/api/gdpr"])}
+    app = _app(manifests, broken={"gdpr_plugin"})
+    app.add_api_route("/api/gdpr/ops/monitoring/performance", lambda: {"core": True}, methods=["GET"])
+    with TestClient(app) as client:
+        manager = client.app.state.plugin_manager
+        # Route core: servita senza importare il plugin lazy
+        assert client.get("/api/gdpr/ops/monitoring/performance").json() == {"core": True}
+        assert manager.imported == []
+        assert client.get("/api/gdpr/ping").status_code == 503
+        assert manager.get_plugin_status()["gdpr_plugin"] == "failed"
+        # Il prefisso resta del plugin fallito, la route core continua a rispondere
+        assert client.get("/api/gdpr/ops/monitoring/performance").status_code == 200
+        assert client.post("/api/gdpr/ops/monitoring/performance").status_code == 405
+
+
+def test_warm_up_loads_remaining_lazy_plugins():
+    manifests = {"gdpr_plugin": _manifest("gdpr_plugin", ["/api/gdpr"])}
+    with TestClient(_app(manifests)) as client:
+        manager = client.app.state.plugin_manager
+        client.portal.call(manager.warm_up)
+        assert manager.get_plugin_status() == {"gdpr_plugin": "loaded"} and not manager.has_lazy_routes
+        assert client.get("/api/gdpr/ping").status_code == 200
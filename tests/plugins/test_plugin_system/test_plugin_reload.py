@@ -0,0 +1,95 @@
+import asyncio
+
+import httpx
+from fastapi import APIRouter, FastAPI
+
+from plugins.plugin_slots import PluginMiddlewareDispatcher
+from plugins.secure_plugin_manager import PluginManifest, SecurePluginManager
+
+
+class _DemoPlugin:
+    """Plugin con una route lenta (per le richieste in corso) e un middleware"""
+
+    def __init__(self, app, version, release):
+        self.app, self.version, self.release, self.cleaned = app, version, release, False
+
+    async def initialize(self):
+        version = self.version
+
+        @self.app.middleware("http")
+        async def stamp(request, call_next):
+            response = await call_next(request)
+            response.headers["X-Demo-Version"] = version
+            return response
+
+    def register_routes(self):
+        router = APIRouter(prefix="/demo")
+        router.add_api_route("/version", lambda: {"version": self.version}, methods=["GET"])
+
+        async def slow():
+            await self.release.wait()
+            return {"version": self.version}
+
+        router.add_api_route("/slow", slow, methods=["GET"])
+        self.app.include_router(router)
+
+    async def cleanup(self):
+        self.cleaned = True
+
+
+class _DemoManager(SecurePluginManager):
+    def __init__(self, app):
+        super().__init__(app)
+        self.security_validator.validate_plugin = lambda name, manifest: True
+        self.next_version, self.release, self.instances = "1", asyncio.Event(), []
+
+    async def _load_plugin_manifest(self, plugin_name):
+        return PluginManifest(name=plugin_name, version=self.next_version, description="", author="",
+                              permissions=["network"], dependencies=[], min_python_version="3.11", checksum="")
+
+    async def _import_plugin_safely(self, plugin_name, manifest, generation=None):
+        from plugins.plugin_slots import PluginAppProxy
+        plugin = _DemoPlugin(PluginAppProxy(self.app, generation), manifest.version, self.release)
+        self.instances.append(plugin)
+        return plugin
+
+
+def test_reload_swaps_routes_and_middleware_while_inflight_requests_finish():
+    async def scenario():
+        app = FastAPI()
+        app.add_middleware(PluginMiddlewareDispatcher)
+        manager = app.state.plugin_manager = _DemoManager(app)
+        await manager._load_single_plugin("demo_plugin")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.get("/demo/version")
+            assert first.json() == {"version": "1"} and first.headers["X-Demo-Version"] == "1"
+
+            routes_before = len(app.router.routes)
+            slow = asyncio.create_task(client.get("/demo/slow"))
+            while manager.generations["demo_plugin"].inflight == 0:
+                await asyncio.sleep(0.01)
+
+            manager.next_version = "2"
+            reload = asyncio.create_task(manager.reload_plugin("demo_plugin"))
+            while manager.generations["demo_plugin"].version != "2":
+                await asyncio.sleep(0.01)
+            swapped = await client.get("/demo/version")
+            assert swapped.json() == {"version": "2"} and swapped.headers["X-Demo-Version"] == "2"
+            assert len(app.router.routes) == routes_before
+            assert "/demo/version" in app.openapi()["paths"]
+
+            # La vecchia istanza resta viva finché la richiesta lenta non finisce
+            assert not reload.done() and not manager.instances[0].cleaned
+            manager.release.set()
+            old_response = await slow
+            await reload
+            assert old_response.json() == {"version": "1"} and old_response.headers["X-Demo-Version"] == "1"
+            assert manager.instances[0].cleaned and not manager.instances[1].cleaned
+
+            await manager.unload_plugin("demo_plugin")
+            gone = await client.get("/demo/version")
+            assert gone.status_code == 404 and "X-Demo-Version" not in gone.headers
+            assert manager.get_plugin_status() == {"demo_plugin": "disabled"}
+
+    asyncio.run(scenario())
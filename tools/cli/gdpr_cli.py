@@ -1,9 +1,47 @@
 # CLI per GDPR operations
+import argparse
+import json
 import sys
 
-def main():
-    print("GDPR CLI - Operazioni disponibili: consensi, export, audit")
-    # Placeholder per logica CLI
+
+def verify_audit(args) -> int:
+    """Verifica le catene dell'audit ledger (in parallelo su più processi)"""
+    from sqlalchemy import create_engine
+    from plugins.gdpr_plugin.services.audit_service import list_audit_tenants, verify_audit_chain
+
+    if args.database_url:
+        database_url = args.database_url
+    else:
+        from core.config import settings
+        database_url = settings.DATABASE_URL
+    engine = create_engine(database_url)
+    tenants = [args.tenant] if args.tenant else list_audit_tenants(engine)
+    results = [verify_audit_chain(engine, tenant, max_workers=args.workers, segment_size=args.segment_size)
+               for tenant in tenants]
+    print(json.dumps([result.to_dict() for result in results], indent=2))
+    return 0 if all(result.valid for result in results) else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="GDPR CLI - Operazioni disponibili: consensi, export, audit")
+    commands = parser.add_subparsers(dest="command")
+
+    verify = commands.add_parser("verify-audit", help="Verifica l'integrità della catena di audit")
+    verify.add_argument("--tenant", help="Solo questo tenant (default: tutti)")
+    verify.add_argument("--workers", type=int, default=None, help="Processi worker (default: CPU disponibili)")
+    verify.add_argument("--segment-size", type=int, default=100_000, help="Voci per segmento")
+    verify.add_argument("--database-url", help="Database da verificare (default: DATABASE_URL)")
+    verify.set_defaults(handler=verify_audit)
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not getattr(args, "handler", None):
+        parser.print_help()
+        return 0
+    return args.handler(args)
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())